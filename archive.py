@@ -0,0 +1,118 @@
+import os
+import tempfile
+import numpy as np
+from process import Process
+
+
+ARCHIVE_DTYPE = np.dtype([
+    ('pid', '<i8'), ('priority', 'i1'), ('outcome', 'i1'), ('arrival', '<i8'),
+    ('completion', '<i8'), ('progress', '<i4'), ('execution_time', '<i4'),
+])
+OUTCOMES = ('completed', 'terminated')
+
+
+# BOUNDED ARCHIVE OF THE SUMMARIES OF REAPED PROCESSES
+class ProcessArchive:
+    """
+    Summaries are kept in a fixed-size ring buffer of fixed-width records. When the buffer is
+    full, the oldest records are dropped, or, if a spill file is given, the whole buffer is
+    appended to it so no summary is lost while memory stays bounded.
+
+    A copy restored from a pickle (e.g. a checkpoint) spills to a new file of its own next to
+    the original one, starting with a copy of the records spilled so far, so neither archive
+    ever writes into or reads back the records of the other.
+    """
+
+    def __init__(self, capacity=10000, spill_path=None):
+        """
+        :param capacity: Number of summaries kept in memory
+        :param spill_path: File receiving the summaries that no longer fit in memory, or None to drop them
+        """
+        self.buffer = np.zeros(capacity, dtype=ARCHIVE_DTYPE)
+        self.start = 0        # Index of the oldest summary in the ring
+        self.size = 0         # Number of summaries in the ring
+        self.total = 0        # Number of summaries ever archived
+        self.spilled = 0      # Number of summaries written to the spill file
+        self.spill_path = spill_path
+        self.spill = open(spill_path, 'wb') if spill_path else None
+
+
+    def __len__(self):
+        return self.size
+
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        if self.spill is not None:
+            self.spill.flush()
+        state['spill'] = None  # Copied to a new file when restored
+        return state
+
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.spill_path:
+            source = self.spill_path
+            with open(source, 'rb') as original:
+                descriptor, self.spill_path = tempfile.mkstemp(prefix=os.path.basename(source) + '.',
+                                                               dir=os.path.dirname(source) or None)
+                self.spill = os.fdopen(descriptor, 'wb')
+                remaining = self.spilled * ARCHIVE_DTYPE.itemsize
+                while remaining:
+                    chunk = original.read(min(remaining, 1 << 20))
+                    if not chunk:
+                        raise ValueError(f"Spill file {source} holds fewer than {self.spilled} records")
+                    self.spill.write(chunk)
+                    remaining -= len(chunk)
+
+
+    def append(self, process, completion):
+        """
+        Archive the summary of a terminated process.
+
+        :param process: TERMINATED process, still attached to its store row
+        :param completion: Tick at which it terminated
+        """
+        capacity = len(self.buffer)
+        if self.size == capacity:
+            if self.spill is not None:
+                self.spill.write(self.records().tobytes())
+                self.spilled += capacity
+                self.start, self.size = 0, 0
+            else:
+                self.start = (self.start + 1) % capacity
+                self.size -= 1
+
+        arrival = process.arrival
+        outcome = 0 if process.progress >= process.execution_time else 1
+        self.buffer[(self.start + self.size) % capacity] = (
+            process.pid, Process.PRIORITIES.index(process.priority), outcome,
+            completion if arrival is None else arrival, completion, process.progress, process.execution_time)
+        self.size += 1
+        self.total += 1
+
+
+    def records(self):
+        """
+        Return a copy of the summaries held in memory, oldest first.
+        """
+        end = self.start + self.size
+        if end <= len(self.buffer):
+            return self.buffer[self.start:end].copy()
+        return np.concatenate([self.buffer[self.start:], self.buffer[:end - len(self.buffer)]])
+
+
+    def all_records(self):
+        """
+        Return the spilled summaries (memory-mapped) followed by the ones held in memory.
+        """
+        if not self.spilled:
+            return self.records()
+        self.spill.flush()
+        spilled = np.memmap(self.spill_path, ARCHIVE_DTYPE, mode='r', shape=(self.spilled,))
+        return np.concatenate([spilled, self.records()])
+
+
+    def close(self):
+        if self.spill is not None:
+            self.spill.close()
@@ -0,0 +1,296 @@
+import asyncio
+from collections import namedtuple
+from clock import TICK_SECONDS, VirtualClock
+from os_simulator import OS
+
+
+# STATE CHANGE DELIVERED TO THE SUBSCRIBERS OF AN ASYNCOS
+StateChange = namedtuple('StateChange', ('tick', 'pid', 'old_state', 'new_state', 'cause'))
+
+_CLOSED = object()  # Put in the queue of a subscription once the simulator stops
+
+
+
+# ASYNC ITERATOR OVER THE STATE CHANGES OF ONE SIMULATOR
+class Subscription:
+    def __init__(self, driver, maxsize):
+        """
+        :param driver: AsyncOS publishing the events
+        :param maxsize: Number of events buffered before the simulator waits for this subscriber
+        """
+        self.driver = driver
+        self.queue = asyncio.Queue(maxsize)
+        self.closed = False
+
+
+    def __aiter__(self):
+        return self
+
+
+    async def __anext__(self):
+        if self.closed and self.queue.empty():
+            raise StopAsyncIteration
+        event = await self.queue.get()
+        if event is _CLOSED:
+            self.closed = True
+            raise StopAsyncIteration
+        return event
+
+
+    async def __aenter__(self):
+        return self
+
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+
+    def close(self):
+        """
+        Stop receiving events. The simulator no longer waits for this subscriber.
+        """
+        self.closed = True
+        self.driver.unsubscribe(self)
+        while not self.queue.empty():
+            self.queue.get_nowait()  # Frees a simulator waiting to put an event
+
+
+
+# DRIVER RUNNING AN OS AS A TASK OF AN ASYNCIO EVENT LOOP
+class AsyncOS:
+    """
+    Runs the tick loop of an OS as an asyncio task instead of a thread. Between two state
+    changes the task sleeps on a single loop timer (set to the next deadline given by
+    OS.idle_ticks), and it is woken early when a command is submitted, so many simulators
+    can share one event loop without any thread of their own.
+
+    The OS runs on a VirtualClock that the driver paces against the loop time. Commands
+    are applied at the next tick boundary, like OS.submit does for the GUI thread.
+    """
+
+    def __init__(self, tick_seconds=TICK_SECONDS, realtime=True, **os_options):
+        """
+        :param tick_seconds: Length of one tick in seconds of loop time
+        :param realtime: Pace the ticks against the loop time (False runs as fast as possible,
+                         still yielding to the other tasks after every tick)
+        :param os_options: Keyword arguments passed to OS (scheduler, publish_snapshots, ...)
+        """
+        self.os = OS(clock=VirtualClock(tick_seconds), **os_options)
+        self.realtime = realtime
+        self.task = None
+        self.subscribers = []
+        self._events = []      # State changes of the current tick, delivered once it is over
+        self._waiter = None    # Future the run task sleeps on between ticks
+        self._origin = None    # Loop time of tick 0
+        self.os.add_listener(self._on_transition)
+
+
+    @property
+    def running(self):
+        return self.task is not None and not self.task.done()
+
+
+    # LIFECYCLE
+    async def start(self):
+        """
+        Start the tick loop as a task of the running event loop.
+        """
+        if self.running:
+            return
+        loop = asyncio.get_running_loop()
+        self._origin = loop.time() - self.os.clock.now * self.os.clock.tick_seconds
+        self.os.running = True
+        self.os.killed = False
+        self.task = loop.create_task(self._run())
+
+
+    async def stop(self):
+        """
+        Stop the tick loop, apply the commands still queued and end every subscription.
+        """
+        self.os.running = False
+        if self.task is not None:
+            self._wake()
+            await self.task
+            self.task = None
+        self.os.process_commands()
+        self.os.publish()
+        await self._deliver()
+        for subscription in self.subscribers:
+            if subscription.queue.full():
+                subscription.closed = True  # The iterator ends once the buffered events are read
+            else:
+                subscription.queue.put_nowait(_CLOSED)
+        self.subscribers = []
+
+
+    async def kill(self):
+        """Move every non-terminated process to ZOMBIE state at the next tick."""
+        await self.submit(self.os.kill)
+
+
+    async def resume(self):
+        """Restore the zombie processes at the next tick."""
+        await self.submit(self.os.resume)
+
+
+    # COMMANDS
+    async def submit(self, command, *args):
+        """
+        Call an OS method at the next tick boundary and return its result.
+        If the tick loop is not running, the call is made right away.
+        """
+        if not self.running:
+            result = command(*args)
+            self.os.publish()
+            return result
+
+        future = asyncio.get_running_loop().create_future()
+
+        def apply():
+            try:
+                result = command(*args)
+            except Exception as error:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+        self.os.commands.append((apply, ()))
+        self._wake()
+        return await future
+
+
+    async def add_process(self, priority, execution_time=None):
+        """Add a process at the next tick and return it."""
+        return await self.submit(self.os.add_process, priority, execution_time)
+
+
+    async def change_process_state(self, pid, new_state):
+        """Manually change the state of a process at the next tick."""
+        await self.submit(self.os.change_process_state, pid, new_state)
+
+
+    def call_later(self, delay, callback, *args):
+        """
+        Call a function after a delay in seconds (counted from the current loop time), from the
+        timer queue of the OS.
+
+        :return: asyncio.Future resolved with the result of the callback once it has run
+        """
+        future = asyncio.get_running_loop().create_future()
+
+        def fire():
+            if future.cancelled():
+                return
+            try:
+                future.set_result(callback(*args))
+            except Exception as error:
+                future.set_exception(error)
+
+        self.os.timers.schedule(self.current_tick() + self.os.clock.ticks(delay), fire)
+        self._wake()
+        return future
+
+
+    def change_state_later(self, delay, pid, new_state):
+        """
+        Manually change the state of a process after a delay in seconds.
+
+        :return: asyncio.Future resolved once the change has been made
+        """
+        return self.call_later(delay, self.os.change_process_state, pid, new_state)
+
+
+    # EVENTS
+    def subscribe(self, maxsize=1024):
+        """
+        Return an async iterator over the state changes of the simulator. When the subscriber
+        falls maxsize events behind, the simulator waits for it before the next tick.
+        """
+        subscription = Subscription(self, maxsize)
+        self.subscribers.append(subscription)
+        return subscription
+
+
+    def unsubscribe(self, subscription):
+        if subscription in self.subscribers:
+            self.subscribers.remove(subscription)
+
+
+    def _on_transition(self, process, old_state, new_state):
+        if self.subscribers:
+            self._events.append(StateChange(self.os.clock.now, process.pid, old_state, new_state, self.os.cause))
+
+
+    async def _deliver(self):
+        events, self._events = self._events, []
+        for event in events:
+            for subscription in list(self.subscribers):
+                if subscription.queue.full():
+                    await subscription.queue.put(event)  # Backpressure: wait for the subscriber
+                else:
+                    subscription.queue.put_nowait(event)
+
+
+    # TICK LOOP
+    def current_tick(self):
+        """
+        Return the tick matching the current loop time (the last tick stepped if not pacing in real time).
+        """
+        if not self.realtime or not self.running:
+            return self.os.clock.now
+        elapsed = int((asyncio.get_running_loop().time() - self._origin) / self.os.clock.tick_seconds)
+        return max(elapsed, self.os.clock.now)
+
+
+    async def _run(self):
+        os_ = self.os
+        clock = os_.clock
+        while os_.running:
+            os_.step()
+            await self._deliver()
+
+            target = self._next_target()
+            if os_.commands:
+                target = clock.now + 1
+            elif self.realtime:
+                await self._sleep(None if target is None else self._origin + target * clock.tick_seconds)
+                # Woken by the deadline or by a command: step the tick matching the loop time,
+                # unless a deadline (possibly one added while sleeping) comes first
+                deadline = self._next_target()
+                target = max(self.current_tick(), clock.now + 1)
+                if deadline is not None:
+                    target = min(target, deadline)
+            elif target is None:
+                await self._sleep(None)
+                target = clock.now + 1
+            else:
+                await asyncio.sleep(0)  # Let the other tasks of the loop run
+
+            os_.skip_ticks(target - clock.now - 1)
+            clock.advance()
+
+
+    def _next_target(self):
+        # Tick of the next state change, or None if nothing will change without a command
+        quiet = self.os.idle_ticks()
+        return None if quiet is None else self.os.clock.now + quiet + 1
+
+
+    async def _sleep(self, when):
+        loop = asyncio.get_running_loop()
+        self._waiter = loop.create_future()
+        timer = None
+        if when is not None:
+            timer = loop.call_at(when, self._wake)
+        try:
+            await self._waiter
+        finally:
+            self._waiter = None
+            if timer is not None:
+                timer.cancel()
+
+
+    def _wake(self):
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
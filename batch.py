@@ -0,0 +1,202 @@
+import argparse
+import csv
+import json
+import os
+import sys
+from clock import VirtualClock
+from metrics import Metrics
+from os_simulator import OS
+from process import Process, ProcessState
+from profiling import Profiler, format_report
+from scheduler import SCHEDULERS
+from trace_log import TraceWriter
+
+
+# MANUAL ACTIONS THAT A WORKLOAD LINE CAN SCHEDULE FOR ITS PROCESS
+ACTIONS = {
+    'block': ProcessState.BLOCKED,
+    'unblock': ProcessState.READY,
+    'terminate': ProcessState.TERMINATED,
+}
+
+RESULT_FIELDS = ['pid', 'priority', 'arrival', 'completion', 'turnaround', 'progress', 'execution_time', 'outcome']
+
+
+# READ A WORKLOAD FILE ONE LINE AT A TIME
+def read_workload(path):
+    """
+    Stream the arrivals of a JSONL or CSV workload file, ordered by arrival time.
+
+    JSONL lines look like {"arrival": 1.5, "priority": "High", "execution_time": 120,
+    "events": [{"action": "block", "at": 2}, {"action": "unblock", "at": 4}]}.
+    CSV files have the columns arrival, priority, execution_time and events, where events
+    is written as "block@2;unblock@4". Times are in seconds, event times are relative to
+    the arrival and execution_time (optional) is in ticks.
+
+    :param path: Path of the workload file
+    :return: Generator of (arrival, priority, execution_time, events) tuples
+    """
+    with open(path, newline='') as file:
+        if path.endswith('.csv'):
+            rows = (parse_csv_row(row) for row in csv.DictReader(file))
+        else:
+            rows = (parse_json_line(line) for line in file if line.strip())
+
+        last_arrival = 0.0
+        for number, row in enumerate(rows, start=1):
+            arrival, priority, execution_time, events = row
+            if priority not in Process.PRIORITY_EXECUTION_TIMES:
+                raise ValueError(f"Line {number}: unknown priority {priority!r}")
+            if arrival < last_arrival:
+                raise ValueError(f"Line {number}: arrivals must be sorted by time")
+            for action, _ in events:
+                if action not in ACTIONS:
+                    raise ValueError(f"Line {number}: unknown action {action!r}")
+            last_arrival = arrival
+            yield row
+
+
+def parse_json_line(line):
+    """
+    Parse one JSONL workload line into an arrival tuple.
+    """
+    entry = json.loads(line)
+    events = [(event['action'], float(event['at'])) for event in entry.get('events', [])]
+    return float(entry['arrival']), entry['priority'], entry.get('execution_time'), events
+
+
+def parse_csv_row(row):
+    """
+    Parse one CSV workload row into an arrival tuple.
+    """
+    events = []
+    for event in filter(None, (row.get('events') or '').split(';')):
+        action, at = event.split('@')
+        events.append((action.strip(), float(at)))
+    execution_time = int(row['execution_time']) if row.get('execution_time') else None
+    return float(row['arrival']), row['priority'].strip(), execution_time, events
+
+
+
+# WRITER THAT STREAMS THE RESULT OF EACH PROCESS AS SOON AS IT TERMINATES
+class ResultWriter:
+    def __init__(self, file, csv_format):
+        """
+        :param file: Open text file receiving the results
+        :param csv_format: Write CSV rows instead of JSON lines
+        """
+        self.file = file
+        self.csv = csv.DictWriter(file, RESULT_FIELDS) if csv_format else None
+        if self.csv:
+            self.csv.writeheader()
+
+
+    def write(self, result):
+        if self.csv:
+            self.csv.writerow(result)
+        else:
+            self.file.write(json.dumps(result) + '\n')
+
+
+
+# RUN A WORKLOAD ON A VIRTUAL CLOCK
+def run_batch(workload, writer=None, num_cores=1, until=None, scheduler=None, metrics_path=None, trace_path=None, profile=False):
+    """
+    Feed a stream of arrivals into a headless simulator and write one result per process.
+    Arrivals are pulled from the stream only when the clock reaches them, so the whole
+    workload never has to be in memory at once.
+
+    :param workload: Iterable of (arrival, priority, execution_time, events) tuples
+    :param writer: ResultWriter receiving the results, or None to only compute the summary
+    :param num_cores: Number of CPU cores of the simulated machine
+    :param until: Tick at which to stop the simulation, or None to run it to the end
+    :param scheduler: Scheduling policy (see scheduler.py), or None for the default priority policy
+    :param metrics_path: File receiving the scheduling metrics at the end of the run (Prometheus text
+                         if it ends with .prom, JSON otherwise), or None to not collect them
+    :param trace_path: File receiving a binary trace of every state transition (see trace_log.py), or None
+    :param profile: Time the phases of the simulator and add the report (see profiling.py) to the summary
+    :return: Summary of the run
+    """
+    os_ = OS(clock=VirtualClock(), scheduler=scheduler)
+    os_.set_num_cores(num_cores)
+    metrics = Metrics(os_) if metrics_path else None
+    recorder = TraceWriter(os_, trace_path) if trace_path else None
+    profiler = Profiler(os_) if profile else None
+    if profiler is not None:
+        profiler.enable(sample_interval=0.005)
+    arrivals = {}  # Arrival tick of each process that has not terminated yet
+    summary = {'processes': 0, 'completed': 0, 'terminated': 0, 'transitions': 0}
+
+    def record(process, old_state, new_state):
+        summary['transitions'] += 1
+        if new_state != ProcessState.TERMINATED or process.pid not in arrivals:
+            return
+        arrival = arrivals.pop(process.pid)
+        completed = process.progress >= process.execution_time
+        summary['completed' if completed else 'terminated'] += 1
+        if writer is None:
+            return
+        writer.write({
+            'pid': process.pid,
+            'priority': process.priority,
+            'arrival': arrival,
+            'completion': os_.clock.now,
+            'turnaround': os_.clock.now - arrival,
+            'progress': process.progress,
+            'execution_time': process.execution_time,
+            'outcome': 'completed' if completed else 'terminated',
+        })
+
+    os_.add_listener(record)
+    for arrival, priority, execution_time, events in workload:
+        tick = os_.clock.ticks(arrival)
+        if until is not None and tick >= until:
+            break
+        os_.run_until(tick)
+        process = os_.add_process(priority, execution_time)
+        arrivals[process.pid] = os_.clock.now
+        summary['processes'] += 1
+        for action, at in events:
+            os_.call_later(at, os_.change_process_state, process.pid, ACTIONS[action])
+    os_.run_until(until)
+
+    summary['ticks'] = os_.clock.now
+    summary['unfinished'] = len(arrivals)
+    if profiler is not None:
+        profiler.disable()
+        summary['profile'] = profiler.report()
+    if recorder is not None:
+        recorder.close()
+    if metrics is not None:
+        with open(metrics_path, 'w') as file:
+            file.write(metrics.to_prometheus() if metrics_path.endswith('.prom') else metrics.to_json())
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a workload file on the OS emulator without the GUI.")
+    parser.add_argument('workload', help="JSONL or CSV workload file")
+    parser.add_argument('-o', '--output', default='results.jsonl', help="Results file (.jsonl or .csv), '-' for standard output")
+    parser.add_argument('-c', '--cores', type=int, default=1, help="Number of CPU cores (default: 1)")
+    parser.add_argument('-m', '--metrics', help="Write scheduling metrics to this file (.prom for Prometheus text, JSON otherwise)")
+    parser.add_argument('-t', '--trace', help="Record every state transition to this binary trace file")
+    parser.add_argument('-s', '--scheduler', choices=list(SCHEDULERS), default='Priority', help="Scheduling policy (default: Priority)")
+    parser.add_argument('-p', '--profile', action='store_true', help="Time the phases of the simulator and print the cost report")
+    args = parser.parse_args(argv)
+
+    out = sys.stdout if args.output == '-' else open(args.output, 'w', newline='')
+    try:
+        writer = ResultWriter(out, csv_format=os.path.splitext(args.output)[1] == '.csv')
+        summary = run_batch(read_workload(args.workload), writer, args.cores, scheduler=SCHEDULERS[args.scheduler](),
+                            metrics_path=args.metrics, trace_path=args.trace, profile=args.profile)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    report = summary.pop('profile', None)
+    print(json.dumps(summary), file=sys.stderr)
+    if report is not None:
+        print(format_report(report), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
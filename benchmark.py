@@ -0,0 +1,210 @@
+import argparse
+import gc
+import itertools
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+import numpy as np
+from batch import run_batch
+
+
+# RELATIVE WEIGHTS OF THE PRIORITY LEVELS IN A GENERATED WORKLOAD
+PRIORITY_MIXES = {
+    'uniform': {'High': 1, 'Medium High': 1, 'Medium Low': 1, 'Low': 1},
+    'high': {'High': 6, 'Medium High': 2, 'Medium Low': 1, 'Low': 1},
+    'low': {'High': 1, 'Medium High': 1, 'Medium Low': 2, 'Low': 6},
+}
+
+# PARAMETER GRIDS: EVERY COMBINATION OF THE LISTED VALUES IS ONE BENCHMARK CASE
+PRESETS = {
+    'quick': {
+        'processes': [100, 1000],
+        'cores': [1, 8],
+        'mix': ['uniform'],
+        'interventions': [0.0, 0.1],
+    },
+    'scaling': {
+        'processes': [100, 1000, 10000, 100000, 1000000],
+        'cores': [1, 4, 16, 64, 256],
+        'mix': ['uniform', 'high', 'low'],
+        'interventions': [0.0, 0.01, 0.1],
+    },
+}
+
+CASE_KEYS = ('processes', 'cores', 'mix', 'interventions', 'max_ticks', 'seed')
+
+
+# GENERATE A SYNTHETIC WORKLOAD
+def generate_workload(processes, mix, interventions, seed):
+    """
+    Generate a reproducible workload in which every process arrives at time 0.
+
+    :param processes: Number of processes
+    :param mix: Name of the priority mix (key of PRIORITY_MIXES)
+    :param interventions: Fraction of processes that are manually blocked/unblocked or terminated
+    :param seed: Seed of the random generator
+    :return: Generator of (arrival, priority, execution_time, events) tuples, as read by batch.run_batch
+    """
+    rng = random.Random(seed)
+    priorities = list(PRIORITY_MIXES[mix])
+    weights = list(PRIORITY_MIXES[mix].values())
+    for _ in range(processes):
+        events = []
+        if rng.random() < interventions:
+            at = rng.uniform(0, 30)
+            if rng.random() < 0.2:
+                events.append(('terminate', at))
+            else:
+                events.append(('block', at))
+                events.append(('unblock', at + rng.uniform(1, 10)))
+        yield 0.0, rng.choices(priorities, weights)[0], None, events
+
+
+# RUN ONE BENCHMARK CASE
+def run_case(case, repeat=3, measure_memory=True):
+    """
+    Simulate one workload and measure throughput and, optionally, peak memory.
+    The fastest of several timed runs is kept, and memory is measured in a separate
+    run so that tracing does not slow down the timed ones.
+
+    :param case: Dict with the keys of CASE_KEYS
+    :param repeat: Number of timed runs
+    :param measure_memory: Whether to also measure the peak traced memory
+    :return: Dict with the case parameters and the measured metrics
+    """
+    def simulate():
+        workload = generate_workload(case['processes'], case['mix'], case['interventions'], case['seed'])
+        return run_batch(workload, num_cores=case['cores'], until=case['max_ticks'])
+
+    elapsed = None
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        summary = simulate()
+        duration = time.perf_counter() - started
+        elapsed = duration if elapsed is None else min(elapsed, duration)
+
+    result = dict(case)
+    result.update({
+        'wall_seconds': round(elapsed, 4),
+        'ticks': summary['ticks'],
+        'transitions': summary['transitions'],
+        'completed': summary['completed'],
+        'ticks_per_second': round(summary['ticks'] / elapsed, 1),
+        'transitions_per_second': round(summary['transitions'] / elapsed, 1),
+        'peak_memory_bytes': None,
+    })
+
+    if measure_memory:
+        gc.collect()
+        tracemalloc.start()
+        simulate()
+        result['peak_memory_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result
+
+
+def build_cases(grid, max_ticks, seed):
+    """
+    Expand a parameter grid into the list of benchmark cases.
+    """
+    cases = []
+    for processes, cores, mix, interventions in itertools.product(
+            grid['processes'], grid['cores'], grid['mix'], grid['interventions']):
+        cases.append({
+            'processes': processes,
+            'cores': cores,
+            'mix': mix,
+            'interventions': interventions,
+            'max_ticks': max_ticks,
+            'seed': seed,
+        })
+    return cases
+
+
+# COMPARE A RUN AGAINST A SAVED BASELINE
+def find_regressions(results, baseline, tolerance):
+    """
+    List the cases that got slower or use more memory than in the baseline.
+
+    :param results: Results of the current run
+    :param baseline: Results of a previous run (same JSON format)
+    :param tolerance: Allowed relative change before a case counts as a regression (0.1 = 10%)
+    :return: List of dicts describing each regression
+    """
+    def key(result):
+        return tuple(result[name] for name in CASE_KEYS)
+
+    previous = {key(result): result for result in baseline['results']}
+    regressions = []
+    for result in results:
+        before = previous.get(key(result))
+        if before is None:
+            continue
+        for metric, worse in (('ticks_per_second', -1), ('transitions_per_second', -1), ('peak_memory_bytes', 1)):
+            old, new = before.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if change * worse > tolerance:
+                regressions.append({'case': dict(zip(CASE_KEYS, key(result))), 'metric': metric,
+                                    'baseline': old, 'current': new, 'change': round(change, 4)})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the throughput and memory use of the OS simulator.")
+    parser.add_argument('--preset', choices=sorted(PRESETS), default='quick', help="Parameter grid to run (default: quick)")
+    parser.add_argument('--processes', type=int, nargs='+', help="Override the process counts of the preset")
+    parser.add_argument('--cores', type=int, nargs='+', help="Override the core counts of the preset")
+    parser.add_argument('--mix', choices=sorted(PRIORITY_MIXES), nargs='+', help="Override the priority mixes of the preset")
+    parser.add_argument('--interventions', type=float, nargs='+', help="Override the manual intervention rates of the preset")
+    parser.add_argument('--max-ticks', type=int, default=20000, help="Simulated ticks per case (default: 20000)")
+    parser.add_argument('--seed', type=int, default=1, help="Seed of the generated workloads (default: 1)")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per case, the fastest is kept (default: 3)")
+    parser.add_argument('--no-memory', action='store_true', help="Skip the peak memory measurement")
+    parser.add_argument('-o', '--output', default='benchmark.json', help="JSON results file (default: benchmark.json)")
+    parser.add_argument('--baseline', help="Previous results file to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed relative regression (default: 0.2)")
+    args = parser.parse_args(argv)
+
+    grid = dict(PRESETS[args.preset])
+    for name in ('processes', 'cores', 'mix', 'interventions'):
+        if getattr(args, name):
+            grid[name] = getattr(args, name)
+
+    cases = build_cases(grid, args.max_ticks, args.seed)
+    run_case(dict(cases[0], processes=min(cases[0]['processes'], 100)), repeat=1, measure_memory=False)  # Warm up
+
+    results = []
+    for case in cases:
+        result = run_case(case, args.repeat, measure_memory=not args.no_memory)
+        results.append(result)
+        print(json.dumps(result), file=sys.stderr)
+
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+    if args.baseline:
+        with open(args.baseline) as file:
+            report['regressions'] = find_regressions(results, json.load(file), args.tolerance)
+
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+
+    if report.get('regressions'):
+        print(f"{len(report['regressions'])} regression(s) against {args.baseline}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+import gc
+import heapq
+import itertools
+import os
+import pickle
+from collections import deque
+import numpy as np
+from clock import RealTimeClock, VirtualClock
+from os_simulator import OS
+from process import NO_VALUE, STATE_CODES, STATES, Process, ProcessState, ProcessStore
+from process_table import PidAllocator
+
+
+FORMAT_VERSION = 3
+STATE_FILE = 'state.pkl'     # Header and pickled objects, written last
+BITMAP_FILE = 'pids.npy'     # Bitmap of the PID allocator
+TIMERS_FILE = 'timers.npy'   # Pending timers, in the order they fire
+
+# OS METHODS THAT A CHECKPOINTED TIMER MAY CALL, AS (NAME, TAKES A PROCESS, TAKES A STATE)
+TIMER_CALLBACKS = (
+    ('set_process_state', True, True),
+    ('release_ready_state', True, False),
+    ('change_process_state', False, True),
+)
+TIMER_DTYPE = np.dtype([('due', '<i8'), ('callback', 'i1'), ('pid', '<i8'), ('state', 'i1')])
+PRIORITY_VALUES = np.array([Process.PRIORITY_VALUES[priority] for priority in Process.PRIORITIES])  # By priority code
+
+
+# STAND-IN FOR A PROCESS THAT HAD LEFT THE OS WHEN THE CHECKPOINT WAS TAKEN
+class DetachedProcess:
+    table = None  # Makes the stale queue entries that still refer to it invalid
+
+    def __init__(self, pid):
+        self.pid = pid
+
+
+
+class _Pickler(pickle.Pickler):
+    def __init__(self, file, table):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.table = table
+
+
+    def persistent_id(self, obj):
+        # Processes are saved by PID; their attributes are in the column files
+        if isinstance(obj, Process):
+            return ('process' if obj.table is self.table else 'detached', obj.pid)
+        return None
+
+
+
+class _Unpickler(pickle.Unpickler):
+    def __init__(self, file, table):
+        super().__init__(file)
+        self.table = table
+
+
+    def persistent_load(self, pid):
+        kind, pid = pid
+        return self.table.by_pid[pid] if kind == 'process' else DetachedProcess(pid)
+
+
+
+# WRITES CHECKPOINTS OF ONE OS TO A DIRECTORY, REWRITING ONLY WHAT CHANGED
+class Checkpointer:
+    """
+    A checkpoint is a directory holding one .npy file per column of the process store, the
+    bitmap of the PID allocator, the pending timers as fixed-width records, and a pickle of
+    everything else: clock, flags, scheduler queues, cores, devices, reap queue and archive. Column files that are unchanged since the
+    previous save (PIDs, priorities, execution times of a stable population...) are not
+    rewritten, and the state file is replaced last.
+
+    Save only at a tick boundary: from the simulator thread (e.g. with OS.submit) or while
+    the OS is stopped. Listeners such as metrics collectors and trace writers are not saved.
+    """
+
+    def __init__(self, os_, directory):
+        """
+        :param os_: OS to checkpoint
+        :param directory: Directory receiving the checkpoint (created if needed)
+        """
+        self.os = os_
+        self.directory = directory
+        self.saved = {}  # Copy of every array as last written, to skip the unchanged ones
+        os.makedirs(directory, exist_ok=True)
+
+
+    def save(self):
+        """
+        Write a checkpoint of the current state of the OS.
+
+        :return: Number of array files written
+        """
+        os_ = self.os
+        store = os_.store
+        arrays = {f'{name}.npy': store.column(name) for name in store.COLUMNS}
+        arrays[BITMAP_FILE] = os_.pids.used
+        arrays[TIMERS_FILE] = self._encode_timers()
+        written = 0
+        for filename, array in arrays.items():
+            previous = self.saved.get(filename)
+            if previous is not None and previous.shape == array.shape and np.array_equal(previous, array):
+                continue
+            self._replace(filename, lambda file, array=array: np.save(file, array))
+            self.saved[filename] = array.copy()
+            written += 1
+
+        table_order = next(os_.table._order)
+        os_.table._order = itertools.count(table_order)
+        header = {
+            'version': FORMAT_VERSION,
+            'virtual': os_.clock.virtual,
+            'tick_seconds': os_.clock.tick_seconds,
+            'now': os_.clock.now,
+            'num_cores': os_.num_cores,
+            'killed': os_.killed,
+            'cause': os_.cause,
+            'publish_snapshots': os_.publish_snapshots,
+            'size': store.size,
+            'free_rows': list(store.free_rows),
+            'table_order': table_order,
+            'pid_max': os_.pids.pid_max,
+            'pid_last': os_.pids.last,
+            'pid_count': os_.pids.count,
+            'reap_delay': os_.reap_delay,
+            'reap_backlog': os_.reap_backlog,
+        }
+        objects = {
+            'scheduler': os_.scheduler,
+            'cores': os_.cores,
+            'devices': os_.devices,
+            'reap_queue': list(os_.reap_queue),
+            'archive': os_.archive,
+        }
+
+        def write_state(file):
+            pickle.dump(header, file, protocol=pickle.HIGHEST_PROTOCOL)
+            _Pickler(file, os_.table).dump(objects)
+
+        self._replace(STATE_FILE, write_state)
+        return written
+
+
+    def _encode_timers(self):
+        names = [name for name, _, _ in TIMER_CALLBACKS]
+        records = []
+        for handle in self.os.timers.pending():
+            callback = handle.callback
+            name = getattr(callback, '__name__', None)
+            if getattr(callback, '__self__', None) is not self.os or name not in names:
+                raise ValueError(f"Timer callback {callback!r} cannot be checkpointed")
+            code = names.index(name)
+            _, takes_process, takes_state = TIMER_CALLBACKS[code]
+            target = handle.args[0]
+            if takes_process and target.table is not self.os.table:
+                continue  # The process left the OS, the timer would have no effect
+            pid = target.pid if takes_process else target
+            state = STATE_CODES[handle.args[1]] if takes_state else NO_VALUE
+            records.append((handle.due, code, pid, state))
+        return np.array(records, dtype=TIMER_DTYPE)
+
+
+    def _replace(self, filename, write):
+        # Write to a temporary file first so a reader never sees a partly written file
+        path = os.path.join(self.directory, filename)
+        with open(path + '.tmp', 'wb') as file:
+            write(file)
+        os.replace(path + '.tmp', path)
+
+
+
+def save_checkpoint(os_, directory):
+    """
+    Write a full checkpoint of an OS (see Checkpointer for repeated, incremental saves).
+    """
+    Checkpointer(os_, directory).save()
+
+
+def restore_checkpoint(directory, clock=None, mmap=True):
+    """
+    Rebuild an OS from a checkpoint. Restoring the same checkpoint several times gives
+    independent simulators, e.g. to fork "what-if" experiments from a common warm state.
+
+    The columns are mapped, not read, but every live process still gets its Python view and
+    its entries in the process table, so a restore takes time proportional to the number of
+    processes: about a second per million.
+
+    :param directory: Directory written by Checkpointer.save
+    :param clock: Clock of the restored OS (by default a clock of the saved kind, at the saved tick)
+    :param mmap: Map the column files copy-on-write instead of reading them, so only the
+                 pages that are used get loaded and the files are never modified
+    :return: Stopped OS in the saved state
+    """
+    with open(os.path.join(directory, STATE_FILE), 'rb') as file:
+        header = pickle.load(file)
+        if header['version'] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported checkpoint version {header['version']}")
+
+        if clock is None:
+            clock = (VirtualClock if header['virtual'] else RealTimeClock)(header['tick_seconds'])
+        clock.now = header['now']
+        os_ = OS(clock=clock, publish_snapshots=header['publish_snapshots'], pid_max=header['pid_max'],
+                 reap_delay=header['reap_delay'], reap_backlog=header['reap_backlog'])
+        os_.num_cores = header['num_cores']
+        os_.killed = header['killed']
+        os_.cause = header['cause']
+
+        # Process store and PID allocator
+        store = ProcessStore(capacity=0)
+        for name in store.COLUMNS:
+            store.columns[name] = np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='c' if mmap else None)
+        store.size = header['size']
+        store.free_rows = list(header['free_rows'])
+        store.views = [None] * store.size
+        os_.store = store
+        os_.pids = PidAllocator(header['pid_max'])
+        os_.pids.used = np.load(os.path.join(directory, BITMAP_FILE))
+        os_.pids.last = header['pid_last']
+        os_.pids.count = header['pid_count']
+
+        # Views and process table, in the order the processes were added
+        table = os_.table
+        _restore_table(store, table)
+        table._order = itertools.count(header['table_order'])
+
+        objects = _Unpickler(file, table).load()
+
+    _restore_timers(os_, np.load(os.path.join(directory, TIMERS_FILE)))
+    os_.scheduler = objects['scheduler']
+    os_.cores = objects['cores']
+    os_.devices = objects['devices']
+    os_.reap_queue = deque(objects['reap_queue'])
+    os_.archive = objects['archive']
+    os_.snapshot = None
+    os_.publish()
+    return os_
+
+
+def _restore_table(store, table):
+    # The views are the only per-process Python objects; the indices and heaps are built from
+    # whole columns. The garbage collector is paused meanwhile: its passes over the millions of
+    # objects being created would otherwise take most of the time of a large restore
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        rows = np.flatnonzero(store.column('pid') != NO_VALUE)
+        rows = rows[np.argsort(store.column('order')[rows], kind='stable')]
+        views = [Process.view(store, row) for row in rows.tolist()]
+        for process in views:
+            process.table = table
+        table.by_pid = dict(zip(store.column('pid')[rows].tolist(), views))
+
+        states = store.column('state')[rows]
+        members = {code: np.flatnonzero(states == code).tolist() for code in range(len(STATES))}
+        for code, state in enumerate(STATES):
+            table.by_state[state] = set(map(views.__getitem__, members[code]))
+
+        orders = store.column('order')[rows]
+        tokens = store.column('token')[rows]
+        running = members[STATE_CODES[ProcessState.RUNNING]]
+        values = PRIORITY_VALUES[store.column('priority')[rows[running]]]
+        table._running_heap = list(zip(values.tolist(), orders[running].tolist(), tokens[running].tolist(),
+                                       map(views.__getitem__, running)))
+        heapq.heapify(table._running_heap)
+        suspended = members[STATE_CODES[ProcessState.BLOCKED_SUSPENDED]]
+        table._suspended_heap = list(zip(orders[suspended].tolist(), tokens[suspended].tolist(),
+                                         map(views.__getitem__, suspended)))  # Sorted by order, so already a heap
+    finally:
+        if collecting:
+            gc.enable()
+
+
+def _restore_timers(os_, records):
+    timers = []
+    by_pid = os_.table.by_pid
+    callbacks = [getattr(os_, name) for name, _, _ in TIMER_CALLBACKS]
+    for due, code, pid, state in records.tolist():
+        _, takes_process, takes_state = TIMER_CALLBACKS[code]
+        args = (by_pid[pid] if takes_process else pid,) + ((STATES[state],) if takes_state else ())
+        timers.append((due, callbacks[code], args))
+    for handle in os_.timers.schedule_many(timers):
+        if handle.callback.__name__ == 'set_process_state':
+            handle.args[0].transition = handle
+        elif handle.callback.__name__ == 'release_ready_state':
+            handle.args[0].release = handle
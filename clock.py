@@ -0,0 +1,202 @@
+import heapq
+import itertools
+import threading
+import time
+
+
+TICK_SECONDS = 0.1  # Length of one simulator tick in seconds
+
+
+# CLOCK THAT PACES EACH TICK AGAINST WALL-CLOCK TIME (USED WITH THE GUI)
+class RealTimeClock:
+    virtual = False
+
+    def __init__(self, tick_seconds=TICK_SECONDS):
+        """
+        Initialize a real-time clock.
+
+        :param tick_seconds: Wall-clock length of one tick in seconds
+        """
+        self.tick_seconds = tick_seconds
+        self.now = 0         # Current tick number
+        self.origin = None   # Wall-clock time (time.monotonic) of tick 0, set by start
+
+
+    def ticks(self, seconds):
+        """
+        Convert a delay in seconds to a whole number of ticks.
+        """
+        return int(round(seconds / self.tick_seconds))
+
+
+    def start(self):
+        """
+        Anchor the current tick to the current wall-clock time.
+        """
+        self.origin = time.monotonic() - self.now * self.tick_seconds
+
+
+    def elapsed(self):
+        """
+        Return the tick matching the current wall-clock time (the current tick if not started).
+        """
+        if self.origin is None:
+            return self.now
+        return int((time.monotonic() - self.origin) / self.tick_seconds)
+
+
+    def seconds_until(self, tick):
+        """
+        Return the wall-clock seconds left until a tick starts (0 if it already has).
+        """
+        if self.origin is None:
+            return max(tick - self.now, 0) * self.tick_seconds
+        return max(self.origin + tick * self.tick_seconds - time.monotonic(), 0.0)
+
+
+    def advance(self, ticks=1):
+        """
+        Move the clock forward, sleeping until the wall-clock time of the new tick.
+        Ticks are paced against the start time, so time spent working does not add up to drift.
+        """
+        delay = self.seconds_until(self.now + ticks)
+        if delay:
+            time.sleep(delay)
+        self.now += ticks
+
+
+
+# CLOCK THAT ONLY MOVES WHEN THE SIMULATOR ADVANCES IT (HEADLESS RUNS)
+class VirtualClock(RealTimeClock):
+    virtual = True
+
+    def advance(self, ticks=1):
+        """
+        Move the clock forward instantly.
+        """
+        self.now += ticks
+
+
+
+# HANDLE TO A CALLBACK SCHEDULED ON THE TIMER QUEUE
+class TimerHandle:
+    __slots__ = ("due", "seq", "callback", "args", "active")
+
+    def __init__(self, due, seq, callback, args):
+        self.due = due            # Tick at which the callback is due
+        self.seq = seq            # Identifies the live heap entry of this timer
+        self.callback = callback  # Function to call
+        self.args = args          # Arguments passed to the callback
+        self.active = True        # False once the timer has fired or been cancelled
+
+
+
+# CENTRAL TIMER FACILITY SERVICED BY THE SIMULATOR RUN LOOP (NO THREAD PER TIMER)
+class TimerQueue:
+    def __init__(self):
+        """
+        Initialize an empty timer queue. Timers live in a heap ordered by due tick;
+        cancelled and rescheduled entries are discarded lazily when they reach the top.
+        """
+        self._heap = []
+        self._counter = itertools.count()  # Keeps timers due on the same tick in FIFO order
+        self._lock = threading.Lock()      # Timers may be scheduled from the GUI thread
+        self._active = 0
+
+
+    def __len__(self):
+        return self._active
+
+
+    def schedule(self, due, callback, *args):
+        """
+        Schedule a callback to run at a given tick in O(log n).
+
+        :param due: Tick at which the callback is due
+        :param callback: Function to call
+        :param args: Arguments passed to the callback
+        :return: TimerHandle that can be cancelled or rescheduled
+        """
+        with self._lock:
+            handle = TimerHandle(due, next(self._counter), callback, args)
+            heapq.heappush(self._heap, (due, handle.seq, handle))
+            self._active += 1
+        return handle
+
+
+    def schedule_many(self, timers):
+        """
+        Schedule many callbacks at once, e.g. when restoring a checkpoint.
+
+        :param timers: Iterable of (due, callback, args) tuples, in the order they should fire on ties
+        :return: List of the TimerHandles
+        """
+        with self._lock:
+            handles = [TimerHandle(due, next(self._counter), callback, args) for due, callback, args in timers]
+            self._heap.extend((handle.due, handle.seq, handle) for handle in handles)
+            heapq.heapify(self._heap)
+            self._active += len(handles)
+        return handles
+
+
+    def cancel(self, handle):
+        """
+        Cancel a pending timer in O(1). Cancelling a timer that already fired does nothing.
+        """
+        with self._lock:
+            if handle.active:
+                handle.active = False
+                self._active -= 1
+
+
+    def reschedule(self, handle, due):
+        """
+        Move a pending timer to another tick in O(log n).
+        """
+        with self._lock:
+            if handle.active:
+                handle.due = due
+                handle.seq = next(self._counter)
+                heapq.heappush(self._heap, (due, handle.seq, handle))
+
+
+    def next_due(self):
+        """
+        Return the tick of the earliest pending timer, or None if there is none.
+        """
+        with self._lock:
+            self._discard_stale()
+            return self._heap[0][0] if self._heap else None
+
+
+    def pending(self):
+        """
+        Return the handles of the pending timers, in the order they will fire.
+        """
+        with self._lock:
+            entries = [entry for entry in self._heap if entry[2].active and entry[2].seq == entry[1]]
+        return [handle for _, _, handle in sorted(entries, key=lambda entry: entry[:2])]
+
+
+    def pop_due(self, now):
+        """
+        Yield every (callback, args) pair that is due at or before the given tick.
+        """
+        while True:
+            with self._lock:
+                self._discard_stale()
+                if not self._heap or self._heap[0][0] > now:
+                    return
+                _, _, handle = heapq.heappop(self._heap)
+                handle.active = False
+                self._active -= 1
+            yield handle.callback, handle.args
+
+
+    def _discard_stale(self):
+        # Drop entries of cancelled timers and the old entries of rescheduled ones
+        while self._heap:
+            _, seq, handle = self._heap[0]
+            if handle.active and handle.seq == seq:
+                return
+            heapq.heappop(self._heap)
@@ -0,0 +1,411 @@
+import argparse
+import heapq
+import itertools
+import json
+import random
+import sys
+from array import array
+import numpy as np
+from archive import ProcessArchive
+from batch import ACTIONS, read_workload
+from clock import VirtualClock
+from os_simulator import OS
+from process import Process, ProcessState
+from scheduler import SCHEDULERS
+
+
+BALANCE_INTERVAL = 10  # Seconds between two load balancing rounds
+IMBALANCE = 1.5        # Load ratio between two nodes above which suspended processes are migrated
+MIGRATION_BATCH = 8    # Processes moved at most between two nodes per balancing round
+ARCHIVE_CAPACITY = 256 # Reaped process summaries kept per node (the cluster keeps its own statistics)
+
+SUSPENDED_STATES = (ProcessState.READY_SUSPENDED, ProcessState.BLOCKED_SUSPENDED)
+
+
+# BASE CLASS OF THE PLACEMENT POLICIES: WHICH NODE RECEIVES AN ARRIVING PROCESS
+class Placement:
+    name = None
+
+    def __init__(self, seed=0):
+        """
+        :param seed: Seed of the random choices of the policy
+        """
+        self.random = random.Random(seed)
+
+
+    def choose(self, cluster, priority):
+        """
+        Return the index of the node that receives a new process of the given priority.
+        """
+        raise NotImplementedError
+
+
+
+# LEAST LOADED NODE
+class LeastLoadedPlacement(Placement):
+    """
+    Pick the node with the fewest live processes (first node on ties). Looks at every node,
+    in one vectorized pass.
+    """
+    name = "least-loaded"
+
+    def choose(self, cluster, priority):
+        return int(np.argmin(cluster.loads))
+
+
+
+# POWER OF TWO CHOICES
+class PowerOfTwoPlacement(Placement):
+    """
+    Pick the less loaded of two random nodes. O(1) per arrival, and the maximum load stays
+    close to the one of least-loaded placement without knowing the load of every node.
+    """
+    name = "power-of-two"
+
+    def choose(self, cluster, priority):
+        first = self.random.randrange(len(cluster.nodes))
+        second = self.random.randrange(len(cluster.nodes))
+        return first if cluster.loads[first] <= cluster.loads[second] else second
+
+
+
+# PRIORITY-AWARE PLACEMENT
+class PriorityAwarePlacement(Placement):
+    """
+    Under priority scheduling a process only waits for the live processes of the same or a
+    higher priority. Pick the node with the fewest of them, then the least loaded one.
+    """
+    name = "priority-aware"
+
+    def choose(self, cluster, priority):
+        level = Process.PRIORITIES.index(priority)
+        ahead = cluster.live[:, :level + 1].sum(axis=1)
+        return int(np.argmin(ahead * (int(cluster.loads.max()) + 1) + cluster.loads))
+
+
+
+# POLICIES SELECTABLE BY NAME (E.G. FROM THE COMMAND LINE)
+PLACEMENTS = {
+    placement.name: placement
+    for placement in (LeastLoadedPlacement, PowerOfTwoPlacement, PriorityAwarePlacement)
+}
+
+
+
+# MANY OS NODES ON ONE SHARED VIRTUAL CLOCK
+class Cluster:
+    """
+    Runs many OS nodes on one VirtualClock. Nodes are only stepped at the ticks where something
+    is due on them (their idle_ticks deadline, an arrival, a manual action or a migration); in
+    between, their RUNNING processes are caught up with OS.advance_progress. So a run costs in
+    proportion to the state changes of the cluster, not to its number of nodes.
+
+    Processes are identified by a job number (their position in the workload) since PIDs are
+    only unique within a node and change when a process migrates. Every BALANCE_INTERVAL,
+    suspended processes are moved from the most loaded nodes to the least loaded ones; a
+    migrated process keeps its progress and arrival time and starts over as NEW on its new node.
+    """
+
+    def __init__(self, num_nodes, cores_per_node=1, scheduler='Priority', placement=None,
+                 balance_interval=BALANCE_INTERVAL, imbalance=IMBALANCE, migration_batch=MIGRATION_BATCH,
+                 reap_delay=OS.REAP_DELAY):
+        """
+        :param num_nodes: Number of nodes
+        :param cores_per_node: Number of CPU cores of every node
+        :param scheduler: Name of the scheduling policy of the nodes (key of SCHEDULERS)
+        :param placement: Placement policy (LeastLoadedPlacement by default)
+        :param balance_interval: Seconds between two load balancing rounds, or None to never migrate
+        :param imbalance: Migrate when a node has more than imbalance times the live processes of
+                          another node, plus one per core
+        :param migration_batch: Processes moved at most between two nodes per round
+        :param reap_delay: Reap delay of the nodes (see OS)
+        """
+        self.clock = VirtualClock()
+        self.cores_per_node = cores_per_node
+        self.scheduler = scheduler
+        self.placement = placement or LeastLoadedPlacement()
+        self.balance_ticks = None if balance_interval is None else max(self.clock.ticks(balance_interval), 1)
+        self.imbalance = imbalance
+        self.migration_batch = migration_batch
+        self.nodes = []
+        for index in range(num_nodes):
+            node = OS(clock=self.clock, scheduler=SCHEDULERS[scheduler](), reap_delay=reap_delay,
+                      archive=ProcessArchive(capacity=ARCHIVE_CAPACITY))
+            node.set_num_cores(cores_per_node)
+            node.add_listener(lambda process, old_state, new_state, index=index: self._on_transition(index, process, old_state, new_state))
+            self.nodes.append(node)
+
+        # Live (non-terminated) processes of each node, per priority and in total
+        self.live = np.zeros((num_nodes, len(Process.PRIORITIES)), dtype=np.int64)
+        self.loads = np.zeros(num_nodes, dtype=np.int64)
+
+        # Where every job is, by job number and by (node, PID)
+        self.jobs = {}
+        self.job_of = [{} for _ in range(num_nodes)]
+
+        # Event-driven stepping
+        self.synced = [-1] * num_nodes      # Last tick whose progress was applied to each node
+        self.next_due = [None] * num_nodes  # Next tick at which each node is stepped
+        self.due = []                       # Heap of (tick, node); entries that do not match next_due are stale
+        self.actions = []                   # Heap of (tick, sequence, job, state) of pending manual actions
+        self.sequence = itertools.count()   # Breaks the ties between actions due at the same tick
+        self.next_balance = self.balance_ticks
+
+        # Statistics
+        self.processes = 0
+        self.completed = 0
+        self.terminated = 0
+        self.migrations = 0
+        self.node_completed = np.zeros(num_nodes, dtype=np.int64)
+        self.turnarounds = array('q')       # Turnaround of every completed process, in ticks
+
+
+    # ARRIVALS AND MANUAL ACTIONS
+    def add_process(self, priority, execution_time=None, events=()):
+        """
+        Place a new process on a node at the current tick.
+
+        :param priority: Priority of the process
+        :param execution_time: Ticks of work (defaults to the time of the priority level)
+        :param events: (action, seconds after now) manual actions, with the actions of batch.ACTIONS
+        :return: Job number of the process
+        """
+        job = self.processes
+        self.processes += 1
+        node = self.placement.choose(self, priority)
+        process = self.nodes[node].add_process(priority, execution_time)
+        self._attach(job, node, process)
+        self._wake(node, self.clock.now)
+        for action, at in events:
+            heapq.heappush(self.actions, (self.clock.now + self.clock.ticks(at), next(self.sequence), job, ACTIONS[action]))
+        return job
+
+
+    def change_process_state(self, job, new_state):
+        """
+        Manually change the state of a job on the node where it currently is.
+        """
+        location = self.jobs.get(job)
+        if location is None:
+            return  # Already finished
+        node, pid = location
+        self._sync(node)  # A RUNNING process keeps the progress of the quiet ticks
+        self.nodes[node].change_process_state(pid, new_state)
+        self._wake(node, self.clock.now)
+
+
+    # MAIN LOOP
+    def run(self, workload=(), until=None):
+        """
+        Feed a stream of arrivals to the cluster and run it on the shared clock.
+
+        :param workload: Iterable of (arrival, priority, execution_time, events) tuples, as read by batch.read_workload
+        :param until: Tick at which to stop, or None to run until every process has finished
+        """
+        arrivals = iter(workload)
+        pending = next(arrivals, None)
+        while True:
+            candidates = [self._peek_due(), self.actions[0][0] if self.actions else None,
+                          None if pending is None else self.clock.ticks(pending[0])]
+            if self.next_balance is not None and (self.due or self.actions or pending is not None):
+                candidates.append(self.next_balance)
+            candidates = [tick for tick in candidates if tick is not None]
+            if not candidates:
+                break
+            tick = max(min(candidates), self.clock.now)
+            if until is not None and tick >= until:
+                break
+            self.clock.advance(tick - self.clock.now)
+
+            while pending is not None and self.clock.ticks(pending[0]) <= tick:
+                _, priority, execution_time, events = pending
+                self.add_process(priority, execution_time, events)
+                pending = next(arrivals, None)
+            while self.actions and self.actions[0][0] <= tick:
+                _, _, job, state = heapq.heappop(self.actions)
+                self.change_process_state(job, state)
+            if self.next_balance is not None and tick >= self.next_balance:
+                self.balance()
+                self.next_balance = tick + self.balance_ticks
+            while self.due and self.due[0][0] <= tick:
+                due, node = heapq.heappop(self.due)
+                if self.next_due[node] == due:
+                    self._step(node)
+
+        # Like OS.run_until, the clock ends past the last tick stepped
+        end = until if until is not None else max(self.synced) + 1
+        self.clock.advance(max(end - self.clock.now, 0))
+        for node in range(len(self.nodes)):
+            self._sync(node)
+
+
+    def _step(self, node):
+        # Step one node at the current tick and schedule its next step
+        os_ = self.nodes[node]
+        self._sync(node)
+        self.next_due[node] = None
+        os_.step()
+        self.synced[node] = self.clock.now
+        quiet = os_.idle_ticks()
+        if quiet is not None:
+            self._wake(node, self.clock.now + quiet + 1)
+
+
+    def _sync(self, node):
+        # Apply the progress of the quiet ticks since the last step of a node
+        self.nodes[node].advance_progress(self.clock.now - 1 - self.synced[node])
+        self.synced[node] = max(self.synced[node], self.clock.now - 1)
+
+
+    def _wake(self, node, tick):
+        # Make sure a node is stepped at a tick or earlier
+        if self.next_due[node] is None or tick < self.next_due[node]:
+            self.next_due[node] = tick
+            heapq.heappush(self.due, (tick, node))
+
+
+    def _peek_due(self):
+        while self.due and self.next_due[self.due[0][1]] != self.due[0][0]:
+            heapq.heappop(self.due)
+        return self.due[0][0] if self.due else None
+
+
+    # LOAD BALANCING
+    def balance(self):
+        """
+        Pair the most loaded nodes with the least loaded ones and move suspended processes
+        from the first to the second while the imbalance lasts.
+
+        :return: Number of processes migrated
+        """
+        order = np.argsort(self.loads, kind='stable')
+        moved = 0
+        for lightest, heaviest in zip(order[:len(order) // 2].tolist(), order[::-1].tolist()):
+            excess = int(self.loads[heaviest]) - int(self.loads[lightest])
+            if self.loads[heaviest] <= self.imbalance * self.loads[lightest] + self.cores_per_node:
+                break
+            candidates = [process for state in SUSPENDED_STATES for process in self.nodes[heaviest].table.by_state[state]
+                          if process.manual_state is None and self._has_device(process, heaviest, lightest)]
+            candidates.sort(key=lambda process: process.order)
+            for process in candidates[:min(self.migration_batch, excess // 2)]:
+                self.migrate(heaviest, process.pid, lightest)
+                moved += 1
+        return moved
+
+
+    def migrate(self, source, pid, target):
+        """
+        Move a process from one node to another. It keeps its progress, arrival time, affinity
+        mask and I/O profile; the target node needs the device of the profile (ValueError otherwise).
+
+        :return: The process on the target node
+        """
+        if not self._has_device(self.nodes[source].table.get(pid), source, target):
+            raise ValueError(f"Node {target} has no device for the I/O profile of PID {pid} of node {source}")
+        self._sync(source)
+        self._sync(target)
+        job = self.job_of[source].pop(pid)
+        record = self.nodes[source].detach_process(pid)
+        self._count(source, record['priority'], -1)
+        node = self.nodes[target]
+        process = node.add_process(record['priority'], record['execution_time'], record['io_profile'])
+        process.progress = record['progress']
+        process.arrival = record['arrival']
+        process.next_io = record['next_io']
+        process.affinity = node.cores.mask_id(record['affinity'])
+        self._attach(job, target, process)
+        self._wake(source, self.clock.now)
+        self._wake(target, self.clock.now)
+        self.migrations += 1
+        return process
+
+
+    def _has_device(self, process, source, target):
+        # Whether a target node has the device of the I/O profile of a process of a source node
+        if process.io_profile is None:
+            return True
+        return self.nodes[source].devices.profiles[process.io_profile].device in self.nodes[target].devices.devices
+
+
+    # ACCOUNTING
+    def _attach(self, job, node, process):
+        self.jobs[job] = (node, process.pid)
+        self.job_of[node][process.pid] = job
+        self._count(node, process.priority, 1)
+
+
+    def _count(self, node, priority, change):
+        self.live[node, Process.PRIORITIES.index(priority)] += change
+        self.loads[node] += change
+
+
+    def _on_transition(self, node, process, old_state, new_state):
+        if new_state == ProcessState.TERMINATED:
+            self._count(node, process.priority, -1)
+            job = self.job_of[node].pop(process.pid, None)
+            self.jobs.pop(job, None)
+            if process.progress >= process.execution_time:
+                self.completed += 1
+                self.node_completed[node] += 1
+                self.turnarounds.append(self.clock.now - process.arrival)
+            else:
+                self.terminated += 1
+
+
+    def report(self):
+        """
+        Return the cluster-wide results as a dict of plain numbers (JSON serializable).
+        """
+        now = self.clock.now
+        turnarounds = np.frombuffer(self.turnarounds, dtype=np.int64) if len(self.turnarounds) else np.empty(0, dtype=np.int64)
+        report = {
+            'tick': now,
+            'nodes': len(self.nodes),
+            'cores_per_node': self.cores_per_node,
+            'scheduler': self.scheduler,
+            'placement': self.placement.name,
+            'processes': self.processes,
+            'completed': self.completed,
+            'terminated': self.terminated,
+            'unfinished': int(self.loads.sum()),
+            'migrations': self.migrations,
+            'throughput': self.completed / now if now else 0.0,
+            'throughput_per_second': self.completed / (now * self.clock.tick_seconds) if now else 0.0,
+        }
+        if len(turnarounds):
+            report.update({
+                'mean_turnaround': round(float(turnarounds.mean()), 2),
+                'p50_turnaround': round(float(np.percentile(turnarounds, 50)), 2),
+                'p95_turnaround': round(float(np.percentile(turnarounds, 95)), 2),
+                'p99_turnaround': round(float(np.percentile(turnarounds, 99)), 2),
+                'max_turnaround': int(turnarounds.max()),
+            })
+        else:
+            report.update(dict.fromkeys(('mean_turnaround', 'p50_turnaround', 'p95_turnaround', 'p99_turnaround', 'max_turnaround')))
+        report['node_completed'] = {'min': int(self.node_completed.min()), 'max': int(self.node_completed.max()),
+                                    'mean': round(float(self.node_completed.mean()), 2)}
+        return report
+
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a workload file on a cluster of emulated machines.")
+    parser.add_argument('workload', help="JSONL or CSV workload file (see batch.py)")
+    parser.add_argument('-n', '--nodes', type=int, default=16, help="Number of nodes (default: 16)")
+    parser.add_argument('-c', '--cores', type=int, default=4, help="CPU cores per node (default: 4)")
+    parser.add_argument('-s', '--scheduler', choices=list(SCHEDULERS), default='Priority', help="Scheduling policy of the nodes (default: Priority)")
+    parser.add_argument('-p', '--placement', choices=list(PLACEMENTS), default='least-loaded', help="Placement policy (default: least-loaded)")
+    parser.add_argument('-b', '--balance-interval', type=float, default=BALANCE_INTERVAL, help="Seconds between load balancing rounds, 0 to never migrate")
+    parser.add_argument('--max-ticks', type=int, help="Stop the simulation at this tick")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the random placement choices")
+    args = parser.parse_args(argv)
+
+    cluster = Cluster(args.nodes, args.cores, args.scheduler, PLACEMENTS[args.placement](args.seed),
+                      balance_interval=args.balance_interval or None)
+    cluster.run(read_workload(args.workload), until=args.max_ticks)
+    json.dump(cluster.report(), sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+from process import NO_VALUE
+
+
+# CPU CORES OF AN OS: WHAT RUNS WHERE, WHICH CORES ARE FREE AND THE AFFINITY MASKS
+class CoreSet:
+    """
+    Gives every RUNNING process an explicit core. Free cores are the set bits of an integer
+    bitmask, so the lowest free core allowed by an affinity mask is found with a few word
+    operations whatever the number of cores.
+
+    Affinity masks are interned: a process stores the index of its mask in the 'affinity'
+    column of the process store (NO_VALUE for all cores), so thousands of processes pinned
+    the same way share one mask.
+
+    Counters: dispatches, migrations (dispatches to another core than the one the process
+    last ran on), warm dispatches (back on its last core with no other process run there in
+    between, i.e. with a warm cache) and steals (processes taken from the run queue of
+    another core by a per-core scheduler).
+    """
+
+    def __init__(self, num_cores=1):
+        """
+        :param num_cores: Number of cores
+        """
+        self.num_cores = 0
+        self.running = []        # Process running on each core, or None
+        self.last_pid = []       # PID of the last process each core ran (NO_VALUE if none), for cache warmth
+        self.free = 0            # Bitmask of the free cores
+        self.masks = []          # Interned affinity masks (bitmasks of cores)
+        self.mask_ids = {}       # Index of each interned mask
+        self.mask_cores = {}     # Cores of each interned mask, as a list (filled on demand)
+        self.dispatches = 0
+        self.migrations = 0
+        self.warm_dispatches = 0
+        self.steals = 0
+        self.resize(num_cores)
+
+
+    def resize(self, num_cores):
+        """
+        Change the number of cores. Processes running on removed cores keep them until they stop running.
+        """
+        while len(self.running) < num_cores:
+            self.running.append(None)
+            self.last_pid.append(NO_VALUE)
+        for core in range(num_cores, self.num_cores):
+            self.free &= ~(1 << core)
+        for core in range(self.num_cores, num_cores):
+            if self.running[core] is None:
+                self.free |= 1 << core
+        self.num_cores = num_cores
+
+
+    def mask_id(self, cores):
+        """
+        Intern the affinity mask of a set of cores.
+
+        :param cores: Iterable of core numbers, or None for all cores
+        :return: Index to store in the 'affinity' column (NO_VALUE for all cores)
+        """
+        if cores is None:
+            return NO_VALUE
+        mask = 0
+        for core in cores:
+            if core < 0:
+                raise ValueError(f"Invalid core {core}")
+            mask |= 1 << core
+        if not mask:
+            raise ValueError("An affinity mask needs at least one core")
+        if mask not in self.mask_ids:
+            self.mask_ids[mask] = len(self.masks)
+            self.masks.append(mask)
+        return self.mask_ids[mask]
+
+
+    def allowed(self, process):
+        """
+        Return the bitmask of the cores a process may run on (all current cores if it is not pinned).
+        """
+        affinity = process.affinity
+        return (1 << self.num_cores) - 1 if affinity is None else self.masks[affinity]
+
+
+    def allows(self, process, core):
+        """
+        Return whether the affinity of a process allows a core.
+        """
+        affinity = process.affinity
+        return core < self.num_cores if affinity is None else bool(self.masks[affinity] >> core & 1)
+
+
+    def allowed_cores(self, process):
+        """
+        Return the list of the existing cores a process may run on.
+        """
+        if process.affinity is None:
+            return range(self.num_cores)
+        return [core for core in self.mask_cores_of(process) if core < self.num_cores]
+
+
+    def mask_cores_of(self, process):
+        """
+        Return the list of the cores in the affinity mask of a process, including the ones that
+        do not exist (anymore), or None if it is not pinned.
+        """
+        affinity = process.affinity
+        if affinity is None:
+            return None
+        cores = self.mask_cores.get(affinity)
+        if cores is None:
+            mask = self.masks[affinity]
+            cores = self.mask_cores[affinity] = [core for core in range(mask.bit_length()) if mask >> core & 1]
+        return cores
+
+
+    def free_cores(self):
+        """
+        Return the free cores, lowest first.
+        """
+        cores = []
+        free = self.free
+        while free:
+            low = free & -free
+            cores.append(low.bit_length() - 1)
+            free ^= low
+        return cores
+
+
+    def choose(self, process):
+        """
+        Pick a free core for a process: the core it last ran on if it is free and allowed (warm
+        cache), else the lowest free allowed core, else the lowest free core.
+
+        :return: Core number, or None if every core is busy
+        """
+        if not self.free:
+            return None
+        last = process.core
+        if last is not None and self.free >> last & 1 and self.allows(process, last):
+            return last
+        free = self.free & self.allowed(process) or self.free
+        return (free & -free).bit_length() - 1
+
+
+    def take(self, process, core):
+        """
+        Record that a process starts running on a free core.
+        """
+        self.free &= ~(1 << core)
+        self.running[core] = process
+        self.dispatches += 1
+        last = process.core
+        if last is not None and last != core:
+            self.migrations += 1
+        elif last == core and self.last_pid[core] == process.pid:
+            self.warm_dispatches += 1
+        self.last_pid[core] = process.pid
+        process.core = core
+
+
+    def release(self, process):
+        """
+        Record that a process stopped running; its core becomes free.
+        """
+        core = process.core
+        if core is None or self.running[core] is not process:
+            return
+        self.running[core] = None
+        if core < self.num_cores:
+            self.free |= 1 << core
+
+
+    def summary(self):
+        """
+        Return the counters as a dict of plain numbers.
+        """
+        return {
+            'dispatches': self.dispatches,
+            'migrations': self.migrations,
+            'warm_dispatches': self.warm_dispatches,
+            'steals': self.steals,
+        }
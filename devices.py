@@ -0,0 +1,364 @@
+import heapq
+import math
+import random
+from collections import deque, namedtuple
+from process import ProcessState
+
+
+# I/O BEHAVIOUR OF A PROCESS: RUN cpu_burst TICKS, ISSUE ONE REQUEST OF size UNITS TO THE NAMED DEVICE, REPEAT
+BurstProfile = namedtuple('BurstProfile', ('cpu_burst', 'device', 'size'), defaults=(1,))
+
+
+# ONE OUTSTANDING I/O REQUEST
+class IORequest:
+    __slots__ = ('process', 'pid', 'size', 'track', 'submitted', 'sequence')
+
+    def __init__(self, process, size, submitted, sequence):
+        self.process = process
+        self.pid = process.pid
+        self.size = size
+        self.track = 0              # Track of the data, for disks
+        self.submitted = submitted  # Tick at which the request was issued
+        self.sequence = sequence    # Breaks ties in the queues in FIFO order
+
+
+
+# BASE CLASS OF THE SIMULATED DEVICES: A REQUEST QUEUE SERVED BY A FIXED NUMBER OF CHANNELS
+class Device:
+    """
+    Requests wait in the queue of the device until one of its channels is free, and are then
+    in service for service_ticks(request) ticks (rounded up, at least one). The base class
+    serves them in FIFO order.
+    """
+    kind = None
+
+    def __init__(self, name, channels=1):
+        """
+        :param name: Name of the device, used by the burst profiles
+        :param channels: Number of requests in service at once
+        """
+        self.name = name
+        self.channels = channels
+        self.queue = deque()
+        self.in_service = 0
+        self.submitted = 0
+        self.completed = 0
+        self.dropped = 0        # Requests whose process stopped waiting before they were served
+        self.busy_ticks = 0     # Service ticks of the completed requests
+        self.wait_ticks = 0     # Ticks the started requests spent in the queue
+        self.max_queue = 0
+
+
+    def __len__(self):
+        return len(self.queue)
+
+
+    def prepare(self, request, rng):
+        """
+        Fill in the device-specific fields of a new request (e.g. the track of a disk request).
+        """
+
+
+    def push(self, request):
+        self.queue.append(request)
+
+
+    def pop(self):
+        """
+        Remove and return the next request to serve, or None if the queue is empty.
+        """
+        return self.queue.popleft() if self.queue else None
+
+
+    def service_ticks(self, request):
+        """
+        Return the time a request takes once it is in service, in ticks (may be fractional).
+        """
+        raise NotImplementedError
+
+
+    def start(self, request, now):
+        """
+        Put a request in service.
+
+        :return: Tick at which it completes
+        """
+        self.in_service += 1
+        self.wait_ticks += now - request.submitted
+        return now + max(math.ceil(self.service_ticks(request)), 1)
+
+
+    def finish(self, ticks):
+        """
+        Record that a request that was in service for a number of ticks completed.
+        """
+        self.in_service -= 1
+        self.completed += 1
+        self.busy_ticks += ticks
+
+
+    def summary(self, now):
+        """
+        Return the counters of the device as a dict of plain numbers.
+        """
+        served = self.completed + self.in_service
+        return {
+            'kind': self.kind,
+            'queue': len(self.queue),
+            'in_service': self.in_service,
+            'max_queue': self.max_queue,
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'dropped': self.dropped,
+            'utilization': self.busy_ticks / (self.channels * now) if now else 0.0,
+            'mean_wait': self.wait_ticks / served if served else None,
+        }
+
+
+
+# DISK WITH A MOVING HEAD, SERVED IN ELEVATOR ORDER
+class Disk(Device):
+    """
+    A single-head disk. The service time of a request is a fixed overhead, plus the seek
+    from the current head position to its track, plus the transfer of its size.
+
+    Requests are served in elevator (SCAN/LOOK) order: the head keeps moving in one direction,
+    serving the nearest request ahead of it, and turns around when nothing is left ahead.
+    The requests ahead and behind the head are kept in two heaps, so each decision costs
+    O(log n) whatever the queue length.
+    """
+    kind = 'disk'
+
+    def __init__(self, name, tracks=1000, seek_ticks=0.01, overhead_ticks=1, transfer_ticks=0.25):
+        """
+        :param name: Name of the device
+        :param tracks: Number of tracks; requests go to a random track
+        :param seek_ticks: Ticks to move the head by one track
+        :param overhead_ticks: Fixed ticks per request (rotation, controller)
+        :param transfer_ticks: Ticks per unit of request size
+        """
+        super().__init__(name, channels=1)
+        self.tracks = tracks
+        self.seek_ticks = seek_ticks
+        self.overhead_ticks = overhead_ticks
+        self.transfer_ticks = transfer_ticks
+        self.head = 0
+        self.direction = 1      # 1 while the head moves to higher tracks, -1 otherwise
+        self.up = []            # (track, sequence, request) of the requests at or above the head
+        self.down = []          # (-track, sequence, request) of the requests below the head
+        self.seek_tracks = 0    # Total head movement
+
+
+    def __len__(self):
+        return len(self.up) + len(self.down)
+
+
+    def prepare(self, request, rng):
+        request.track = rng.randrange(self.tracks)
+
+
+    def push(self, request):
+        if request.track >= self.head:
+            heapq.heappush(self.up, (request.track, request.sequence, request))
+        else:
+            heapq.heappush(self.down, (-request.track, request.sequence, request))
+
+
+    def pop(self):
+        ahead, behind = (self.up, self.down) if self.direction > 0 else (self.down, self.up)
+        if not ahead:
+            self.direction = -self.direction
+            ahead = behind
+        return heapq.heappop(ahead)[-1] if ahead else None
+
+
+    def service_ticks(self, request):
+        return self.overhead_ticks + abs(request.track - self.head) * self.seek_ticks + request.size * self.transfer_ticks
+
+
+    def start(self, request, now):
+        due = super().start(request, now)
+        self.seek_tracks += abs(request.track - self.head)
+        self.head = request.track
+        return due
+
+
+    def summary(self, now):
+        summary = super().summary(now)
+        summary['queue'] = len(self)
+        summary['seek_tracks'] = self.seek_tracks
+        return summary
+
+
+
+# NETWORK INTERFACE: FIFO QUEUE, SEVERAL TRANSFERS IN FLIGHT AT ONCE
+class NetworkDevice(Device):
+    """
+    The service time of a request is the latency of the link plus its size divided by the bandwidth.
+    """
+    kind = 'network'
+
+    def __init__(self, name, channels=4, latency_ticks=2, bandwidth=8):
+        """
+        :param name: Name of the device
+        :param channels: Number of transfers in flight at once
+        :param latency_ticks: Fixed ticks per request
+        :param bandwidth: Units of request size transferred per tick and channel
+        """
+        super().__init__(name, channels)
+        self.latency_ticks = latency_ticks
+        self.bandwidth = bandwidth
+
+
+    def service_ticks(self, request):
+        return self.latency_ticks + request.size / self.bandwidth
+
+
+
+# DEVICES OF AN OS, THE BURST PROFILES OF ITS PROCESSES AND THE REQUESTS IN SERVICE
+class DeviceSet:
+    """
+    Holds the devices of an OS and delivers their completions. Only the requests in service
+    have an entry in the completion heap (at most one per channel), and all the requests that
+    complete at a tick are handed back in one batch, so thousands of outstanding I/Os need no
+    timer or thread of their own.
+
+    Burst profiles are interned: a process stores the index of its profile in the 'io_profile'
+    column of the process store and the progress at which it issues its next request in 'next_io'.
+
+    A request is only delivered if its process still waits for it (BLOCKED, not changed
+    manually since it blocked); requests whose process stopped waiting are dropped when they
+    reach the head of their queue, like the stale entries of the scheduler queues.
+    """
+
+    def __init__(self, seed=0):
+        """
+        :param seed: Seed of the random tracks of disk requests
+        """
+        self.devices = {}        # Devices by name
+        self.profiles = []       # Interned burst profiles
+        self.profile_ids = {}    # Index of each interned profile
+        self.in_service = []     # Heap of (completion tick, sequence, start tick, device name, request)
+        self.waiting = {}        # Request each process blocked on, keyed by PID
+        self.random = random.Random(seed)
+        self.sequence = 0
+
+
+    def __getitem__(self, name):
+        return self.devices[name]
+
+
+    def __iter__(self):
+        return iter(self.devices.values())
+
+
+    def add(self, device):
+        """
+        Add a device (replacing any device with the same name).
+
+        :return: The device
+        """
+        self.devices[device.name] = device
+        return device
+
+
+    def profile_id(self, profile):
+        """
+        Intern a burst profile.
+
+        :param profile: BurstProfile, or None for a CPU-bound process
+        :return: Index to store in the 'io_profile' column (None for no profile)
+        """
+        if profile is None:
+            return None
+        if profile.device not in self.devices:
+            raise ValueError(f"Unknown device {profile.device!r}")
+        if profile.cpu_burst < 1:
+            raise ValueError("A CPU burst lasts at least one tick")
+        if profile not in self.profile_ids:
+            self.profile_ids[profile] = len(self.profiles)
+            self.profiles.append(profile)
+        return self.profile_ids[profile]
+
+
+    def submit(self, process, profile, now):
+        """
+        Queue the request of a process that just blocked, and start it if its device is idle.
+        """
+        device = self.devices[profile.device]
+        request = IORequest(process, profile.size, now, self.sequence)
+        self.sequence += 1
+        device.prepare(request, self.random)
+        device.push(request)
+        device.submitted += 1
+        device.max_queue = max(device.max_queue, len(device))
+        self.waiting[process.pid] = request
+        self._start(device, now)
+
+
+    def forget(self, process):
+        """
+        Stop waiting for the request of a process, e.g. one that leaves the OS.
+        """
+        self.waiting.pop(process.pid, None)
+
+
+    def next_completion(self):
+        """
+        Return the tick of the next completion, or None if no request is in service.
+        """
+        return self.in_service[0][0] if self.in_service else None
+
+
+    def complete(self, now):
+        """
+        Finish the requests due at a tick and start the next ones on the freed channels.
+
+        :return: Processes whose request completed and that still wait for it, in table order
+        """
+        heap = self.in_service
+        if not heap or heap[0][0] > now:
+            return []
+        finished = []
+        freed = {}
+        while heap and heap[0][0] <= now:
+            due, _, started, name, request = heapq.heappop(heap)
+            device = self.devices[name]
+            device.finish(due - started)
+            freed[name] = device
+            if self.waiting.get(request.pid) is request:
+                del self.waiting[request.pid]
+                if self._valid(request):
+                    finished.append(request.process)
+        for device in freed.values():
+            self._start(device, now)
+        finished.sort(key=lambda process: process.order)
+        return finished
+
+
+    def _start(self, device, now):
+        # Fill the free channels of a device, dropping the requests nobody waits for anymore
+        while device.in_service < device.channels:
+            request = device.pop()
+            if request is None:
+                return
+            if self.waiting.get(request.pid) is not request or not self._valid(request):
+                device.dropped += 1
+                if self.waiting.get(request.pid) is request:
+                    del self.waiting[request.pid]
+                continue
+            due = device.start(request, now)
+            heapq.heappush(self.in_service, (due, request.sequence, now, device.name, request))
+
+
+    @staticmethod
+    def _valid(request):
+        process = request.process
+        return process.table is not None and process.state == ProcessState.BLOCKED and process.manual_state is None
+
+
+    def summary(self, now):
+        """
+        Return the counters of every device, by name.
+        """
+        return {name: device.summary(now) for name, device in self.devices.items()}
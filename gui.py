@@ -1,10 +1,231 @@
 import customtkinter as ctk
 import tkinter as tk
+from clock import TICK_SECONDS
+from devices import BurstProfile, Disk, NetworkDevice
+from metrics import Metrics
 from os_simulator import OS
 from process import ProcessState
+from profiling import Profiler
+from scheduler import SCHEDULERS
+from snapshot import RUNNING
+from timeline import Timeline
+
+ROW_HEIGHT = 46   # Height in pixels of one row of the process panel
+ROW_PADDING = 20  # Margin in pixels around the rows of the process panel
+MAX_BATCH = 100000  # Largest number of processes added with one click
+LANE_HEIGHT = 16    # Height in pixels of one core of the timeline
+TICK_PIXELS = 2     # Width in pixels of one tick of the timeline
+RULER_HEIGHT = 16   # Height in pixels of the tick ruler above the timeline
+RULER_TICKS = 100   # Ticks between two marks of the ruler
+VISIBLE_LANES = 8   # Cores shown without scrolling the timeline
+
+# COLORS OF THE PROCESSES IN THE TIMELINE, PICKED BY PID
+TIMELINE_COLORS = ["#1f77b4", "#ff7f0e", "#2ca02c", "#d62728", "#9467bd",
+                   "#8c564b", "#e377c2", "#7f7f7f", "#bcbd22", "#17becf"]
+
+# BACKGROUND COLOR OF A PROCESS ROW FOR EACH STATE
+STATE_COLORS = {
+    ProcessState.NEW: "gray",
+    ProcessState.READY: "#9a7d0a",
+    ProcessState.RUNNING: "#044b05",
+    ProcessState.BLOCKED: "#751901",
+    ProcessState.TERMINATED: "#032268",
+    ProcessState.ZOMBIE: "#7e4202",
+    ProcessState.BLOCKED_SUSPENDED: "#310451",
+    ProcessState.READY_SUSPENDED: "#5f4a05",
+}
+
+# STATE REQUESTED BY EACH ACTION OF THE STATE MENUS AND SELECTION BUTTONS
+ACTION_STATES = {
+    "Unblocked": ProcessState.READY,
+    "Blocked": ProcessState.BLOCKED,
+    "End": ProcessState.TERMINATED,
+}
+
+# CPU/I-O BEHAVIOUR OF THE ADDED PROCESSES FOR EACH OPTION OF THE WORKLOAD MENU
+IO_PROFILES = {
+    "CPU bound": None,
+    "Disk I/O": BurstProfile(cpu_burst=10, device='disk', size=4),
+    "Network I/O": BurstProfile(cpu_burst=15, device='network', size=16),
+}
+
+
+# REUSABLE WIDGETS SHOWING ONE PROCESS IN THE PROCESS PANEL
+class ProcessRow:
+    def __init__(self, ui):
+        """
+        Create the widgets of a row (label, progress bar, state menu) and place them on the canvas.
+        """
+        self.pid = None       # PID of the process currently shown by the row
+        self.rendered = None  # (state, progress, killed) drawn the last time the row was rendered
+
+        self.frame = ctk.CTkFrame(ui.process_canvas, height=ROW_HEIGHT - 10)
+
+        # Checkbox adding the process to the selection of the bulk actions
+        self.selected_var = tk.BooleanVar()
+        self.checkbox = ctk.CTkCheckBox(self.frame, text="", width=24, variable=self.selected_var,
+                                        command=lambda: ui.select_process(self.pid, self.selected_var.get()))
+        self.checkbox.pack(side=tk.LEFT, padx=(5, 0))
+
+        # Label for the process ID and priority
+        self.label = ctk.CTkLabel(self.frame, text="", width=180, anchor="w")
+        self.label.pack(side=tk.LEFT, padx=(5, 10))
+
+        # Progress bar for the process execution
+        self.progress_bar = ctk.CTkProgressBar(self.frame, width=200)
+        self.progress_bar.set(0)
+        self.progress_bar.pack(side=tk.LEFT, padx=(5, 10))
+
+        # Dropdown menu for changing the process state
+        self.state_var = tk.StringVar()
+        self.state_menu = ctk.CTkOptionMenu(self.frame, values=[], variable=self.state_var, width=100,
+                                            command=lambda new_state: ui.change_process_state(self.pid, new_state))
+        self.state_menu.pack(side=tk.LEFT, padx=(5, 10), pady=5)
+
+        self.window = ui.process_canvas.create_window(ROW_PADDING, ROW_PADDING, window=self.frame, anchor="nw")
+
+
+    def bind(self, pid, priority, selected):
+        """
+        Show another process in this row. The next render redraws every part of the row.
+        """
+        self.pid = pid
+        self.rendered = None
+        self.label.configure(text=f"Process {pid} (Priority: {priority})")
+        self.selected_var.set(selected)
+
+
+
+# PER-CORE GANTT CHART OF THE RUNNING PROCESSES
+class TimelinePanel:
+    def __init__(self, master):
+        """
+        Create the canvases of the timeline: core labels on the left, runs of the processes on the right.
+        Each refresh draws only the runs that changed (see timeline.py), so the chart never redraws its history.
+        """
+        self.timeline = Timeline()
+        self.num_lanes = 0
+        self.next_mark = 0      # Tick of the next ruler mark to draw
+        self.marks = []         # (tick, line, text) of the ruler marks, oldest first
+
+        self.frame = ctk.CTkFrame(master)
+        self.frame.grid_columnconfigure(1, weight=1)
+        self.labels = tk.Canvas(self.frame, bg='#2a2d2e', highlightthickness=0, width=50, height=RULER_HEIGHT)
+        self.labels.grid(row=0, column=0, sticky="ns")
+        self.canvas = tk.Canvas(self.frame, bg='#2a2d2e', highlightthickness=0, height=RULER_HEIGHT)
+        self.canvas.grid(row=0, column=1, sticky="ew")
+        self.xscrollbar = ctk.CTkScrollbar(self.frame, orientation="horizontal", command=self.canvas.xview)
+        self.xscrollbar.grid(row=1, column=1, sticky="ew")
+        self.yscrollbar = ctk.CTkScrollbar(self.frame, command=self.yview)
+        self.yscrollbar.grid(row=0, column=2, sticky="ns")
+        self.canvas.configure(xscrollcommand=self.xscrollbar.set, yscrollcommand=self.yscrollbar.set)
+
+
+    def yview(self, *args):
+        """
+        Scroll the cores of the timeline and their labels together.
+        """
+        self.canvas.yview(*args)
+        self.labels.yview(*args)
+
+
+    def update(self, snapshot):
+        """
+        Extend the timeline to the tick of a snapshot.
+        """
+        following = self.canvas.xview()[1] >= 0.999  # Keep following the current tick unless scrolled back
+        running = snapshot.state == RUNNING
+        changes = self.timeline.update(snapshot.tick, snapshot.pid[running].tolist(), snapshot.num_cores, snapshot.core[running].tolist())
+        canvas = self.canvas
+        now = snapshot.tick
+
+        if len(self.timeline.lanes) != self.num_lanes:
+            self.resize(len(self.timeline.lanes))
+        for segment in changes.aged:
+            canvas.delete(segment.item)
+        for cell in changes.expired:
+            if cell.item is not None:
+                canvas.delete(cell.item)
+        for segment in changes.opened:
+            segment.item = canvas.create_rectangle(*self.bounds(segment.lane, segment.start, now),
+                                                   fill=TIMELINE_COLORS[segment.pid % len(TIMELINE_COLORS)], width=0)
+        for segment in changes.closed:
+            canvas.coords(segment.item, *self.bounds(segment.lane, segment.start, segment.end))
+        for segment in self.timeline.open_segments():
+            canvas.coords(segment.item, *self.bounds(segment.lane, segment.start, now))
+        self.draw_cells(changes.cells.values())
+        self.draw_ruler(now)
+
+        first = max(self.timeline.kept_from, 0) * TICK_PIXELS
+        canvas.configure(scrollregion=(first, 0, max(now * TICK_PIXELS, first + 1), self.num_lanes * LANE_HEIGHT + RULER_HEIGHT))
+        if following:
+            canvas.xview_moveto(1.0)
+
+
+    def bounds(self, lane, start, end, fraction=1.0):
+        """
+        Return the rectangle of a lane between two ticks, filled from the bottom up to a fraction of its height.
+        """
+        bottom = RULER_HEIGHT + (lane + 1) * LANE_HEIGHT - 1
+        return start * TICK_PIXELS, bottom - (LANE_HEIGHT - 2) * fraction, end * TICK_PIXELS, bottom
+
+
+    def draw_cells(self, cells):
+        """
+        Draw the cells of the older history: the color of the process that ran the longest, and a
+        height showing how busy the core was.
+        """
+        size = self.timeline.bucket_ticks
+        for cell in cells:
+            bounds = self.bounds(cell.lane, cell.bucket * size, (cell.bucket + 1) * size, cell.busy() / size)
+            color = TIMELINE_COLORS[cell.dominant() % len(TIMELINE_COLORS)]
+            if cell.item is None:
+                cell.item = self.canvas.create_rectangle(*bounds, fill=color, width=0)
+            else:
+                self.canvas.coords(cell.item, *bounds)
+                self.canvas.itemconfigure(cell.item, fill=color)
+
+
+    def draw_ruler(self, now):
+        """
+        Add the ruler marks up to a tick and delete those that left the history.
+        """
+        self.next_mark = max(self.next_mark, -(-self.timeline.kept_from // RULER_TICKS) * RULER_TICKS)
+        while self.next_mark <= now:
+            x = self.next_mark * TICK_PIXELS
+            line = self.canvas.create_line(x, 0, x, RULER_HEIGHT + self.num_lanes * LANE_HEIGHT, fill="#555555")
+            text = self.canvas.create_text(x + 3, 2, text=str(self.next_mark), anchor="nw", fill="gray", font=("Arial", 8))
+            self.canvas.tag_lower(line)
+            self.marks.append((self.next_mark, line, text))
+            self.next_mark += RULER_TICKS
+        while self.marks and self.marks[0][0] < self.timeline.kept_from:
+            _, line, text = self.marks.pop(0)
+            self.canvas.delete(line, text)
+
+
+    def resize(self, num_lanes):
+        """
+        Show another number of cores.
+        """
+        for lane in range(self.num_lanes, num_lanes):
+            self.labels.create_text(45, RULER_HEIGHT + lane * LANE_HEIGHT + LANE_HEIGHT // 2, text=f"CPU {lane}",
+                                    anchor="e", fill="gray", font=("Arial", 8))
+        self.num_lanes = num_lanes
+        height = RULER_HEIGHT + min(num_lanes, VISIBLE_LANES) * LANE_HEIGHT
+        scrollregion = (0, 0, 50, RULER_HEIGHT + num_lanes * LANE_HEIGHT)
+        self.labels.configure(height=height, scrollregion=scrollregion)
+        self.canvas.configure(height=height)
+        for _, line, _ in self.marks:
+            coords = self.canvas.coords(line)
+            self.canvas.coords(line, coords[0], 0, coords[0], scrollregion[3])
+
+
 
 class UI(ctk.CTk):
-    def __init__(self):
+    def __init__(self, tick_seconds=TICK_SECONDS):
+        """
+        :param tick_seconds: Length of one simulator tick in seconds
+        """
         super().__init__()
 
         # Set appearance mode and color theme
@@ -15,8 +236,13 @@ class UI(ctk.CTk):
         self.title("OS Process Emulator")
         self.geometry("1000x800")
 
-        # Instance of the OS simulator
-        self.os = OS()
+        # Instance of the OS simulator. The GUI only reads the snapshots it publishes
+        # and sends every change through its command queue.
+        self.os = OS(publish_snapshots=True, tick_seconds=tick_seconds)
+        Metrics(self.os)  # Summarized in every snapshot for the metrics panel
+        self.os.devices.add(Disk('disk'))  # Devices used by the I/O workloads
+        self.os.devices.add(NetworkDevice('network'))
+        self.removal_scheduled = set() # PIDs whose rows are already scheduled for removal
 
         # Layout configuration
         self.grid_columnconfigure(0, weight=1)
@@ -27,7 +253,7 @@ class UI(ctk.CTk):
         self.main_frame = ctk.CTkFrame(self)
         self.main_frame.grid(row=0, column=0, padx=20, pady=20, sticky="nsew")
         self.main_frame.grid_columnconfigure(0, weight=1)
-        self.main_frame.grid_rowconfigure(2, weight=1)
+        self.main_frame.grid_rowconfigure(3, weight=1)
 
 
         # Error frame and label
@@ -53,16 +279,31 @@ class UI(ctk.CTk):
         
         # Core selection menu
         self.cores_var = tk.StringVar(value="Select CPU Cores")
-        self.cores_menu = ctk.CTkOptionMenu(self.control_frame, values=["1", "2", "4", "8"], variable=self.cores_var, command=self.update_cores)
+        self.cores_menu = ctk.CTkOptionMenu(self.control_frame, values=["1", "2", "4", "8", "16", "32", "64", "128", "256"], variable=self.cores_var, command=self.update_cores)
         self.cores_menu.pack(side=tk.LEFT, padx=5)
 
+        # Scheduling policy menu
+        self.scheduler_var = tk.StringVar(value=self.os.scheduler.name)
+        self.scheduler_menu = ctk.CTkOptionMenu(self.control_frame, values=list(SCHEDULERS), variable=self.scheduler_var, command=self.update_scheduler)
+        self.scheduler_menu.pack(side=tk.LEFT, padx=5)
+
         # Priority selection menu
         self.priority_var = tk.StringVar(value="Select Process Priority") 
         self.priority_menu = ctk.CTkOptionMenu(self.control_frame, values=["High", "Medium High", "Medium Low", "Low"], variable=self.priority_var)
         self.priority_menu.pack(side=tk.LEFT, padx=5)
 
-        # Add process button
-        self.add_process_button = ctk.CTkButton(self.control_frame, text="Add Process", command=self.add_process)
+        # CPU-bound or I/O-bound processes
+        self.workload_var = tk.StringVar(value="CPU bound")
+        self.workload_menu = ctk.CTkOptionMenu(self.control_frame, values=list(IO_PROFILES), variable=self.workload_var)
+        self.workload_menu.pack(side=tk.LEFT, padx=5)
+
+        # Number of processes added per click
+        self.count_var = tk.StringVar(value="1")
+        self.count_entry = ctk.CTkEntry(self.control_frame, textvariable=self.count_var, width=70)
+        self.count_entry.pack(side=tk.LEFT, padx=5)
+
+        # Add processes button
+        self.add_process_button = ctk.CTkButton(self.control_frame, text="Add Processes", command=self.add_process)
         self.add_process_button.pack(side=tk.LEFT, padx=5)
 
         # Start button
@@ -77,133 +318,373 @@ class UI(ctk.CTk):
         self.kill_button = ctk.CTkButton(self.control_frame, text="Kill", command=self.kill_simulation)
         self.kill_button.pack(side=tk.LEFT, padx=5)
 
+        # Profiling switch; the instrumentation costs nothing while it is off
+        self.profile_var = tk.BooleanVar(value=False)
+        self.profile_switch = ctk.CTkSwitch(self.control_frame, text="Profile", variable=self.profile_var, command=self.toggle_profiling)
+        self.profile_switch.pack(side=tk.LEFT, padx=5)
+
+
+        # Selection frame for changing many processes at once
+        self.selection_frame = ctk.CTkFrame(self.main_frame)
+        self.selection_frame.grid(row=2, column=0, padx=20, sticky="ew")
+
+        self.select_all_button = ctk.CTkButton(self.selection_frame, text="Select All", width=90, command=self.select_all)
+        self.select_all_button.pack(side=tk.LEFT, padx=5, pady=5)
+        self.clear_selection_button = ctk.CTkButton(self.selection_frame, text="Clear", width=70, command=self.clear_selection)
+        self.clear_selection_button.pack(side=tk.LEFT, padx=5, pady=5)
+        self.selection_buttons = []
+        for action in ACTION_STATES:
+            button = ctk.CTkButton(self.selection_frame, text=action, width=90,
+                                   command=lambda action=action: self.change_selected_states(action))
+            button.pack(side=tk.LEFT, padx=5, pady=5)
+            self.selection_buttons.append(button)
+        self.selection_label = ctk.CTkLabel(self.selection_frame, text="0 selected")
+        self.selection_label.pack(side=tk.LEFT, padx=10)
 
-        # Process frame with scrolling
+
+        # Process frame with scrolling. Only the rows visible in the canvas own widgets,
+        # and they are reused for other processes as the list scrolls.
         self.process_frame = ctk.CTkFrame(self.main_frame)
-        self.process_frame.grid(row=2, column=0, padx=20, pady=20, sticky="nsew")
+        self.process_frame.grid(row=3, column=0, padx=20, pady=20, sticky="nsew")
 
-        self.process_canvas = tk.Canvas(self.process_frame, bg='#2a2d2e')
+        self.process_canvas = tk.Canvas(self.process_frame, bg='#2a2d2e', highlightthickness=0, yscrollincrement=ROW_HEIGHT)
         self.process_canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
 
         self.scrollbar = ctk.CTkScrollbar(self.process_frame, command=self.process_canvas.yview)
         self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
 
-        self.process_canvas.configure(yscrollcommand=self.scrollbar.set)
-        self.process_canvas.bind('<Configure>', lambda e: self.process_canvas.configure(scrollregion=self.process_canvas.bbox("all")))
+        self.process_canvas.configure(yscrollcommand=self.on_view_changed)
+        self.process_canvas.bind('<Configure>', lambda e: self.layout_rows())
+        self.bind_all('<MouseWheel>', self.on_mousewheel)
+        self.bind_all('<Button-4>', self.on_mousewheel)
+        self.bind_all('<Button-5>', self.on_mousewheel)
+
+
+        # Per-core timeline of the running processes
+        self.timeline_panel = TimelinePanel(self.main_frame)
+        self.timeline_panel.frame.grid(row=4, column=0, padx=20, pady=(0, 20), sticky="ew")
+
 
-        self.inner_frame = ctk.CTkFrame(self.process_canvas)
-        self.process_canvas.create_window((20, 20), window=self.inner_frame, anchor="nw")
+        # Metrics summary panel
+        self.metrics_label = ctk.CTkLabel(self.main_frame, text="", anchor="w", justify=tk.LEFT)
+        self.metrics_label.grid(row=5, column=0, padx=20, pady=(0, 20), sticky="ew")
 
-        # Periodic updates to process display
-        self.after(100, self.update_processes)
+        # Per-phase cost report, shown while profiling
+        self.profiler = Profiler(self.os)
+        self.profile_label = ctk.CTkLabel(self.main_frame, text="", anchor="w", justify=tk.LEFT, font=("Courier", 12))
+        self.profile_label.grid(row=6, column=0, padx=20, pady=(0, 20), sticky="ew")
+        self.profile_label.grid_remove()
+
+        self.displayed = []            # PIDs listed in the process panel, in display order
+        self.store_rows = {}           # Row of each listed PID in the snapshots
+        self.rows = []                 # Pool of reusable row widgets
+        self.scrollregion = None       # Scroll region last applied to the canvas
+        self.snapshot = None           # Snapshot shown by the panel
+        self.selected = set()          # PIDs selected for the bulk actions
+
+        # Refresh the process display whenever the OS publishes a new snapshot
+        self.bind('<<SimulatorChanged>>', lambda e: self.update_processes())
+        self.os.add_publish_listener(self.notify_changed)
+        self.after_idle(self.update_processes)
 
 
     def add_process(self):
         """
-        Add a new process with the selected priority.
+        Add the requested number of processes with the selected priority.
         """
         priority = self.priority_var.get()  # Get the selected priority
         cores = self.cores_var.get()  # Get the selected number of cores
 
         # Check if the user has selected a valid option for both menus
         if priority == "Select Process Priority" or cores == "Select CPU Cores":
-            self.error_label.configure(text="Please select a valid option for cores and priority")
-            self.error_frame.grid()
+            self.show_error("Please select a valid option for cores and priority")
             return
 
-        # If valid options are selected, proceed with adding the process
-        try:
-            process = self.os.add_process(priority)  # Add a new process to the OS
-            self.create_process_widgets(process)  # Create the UI widgets for this process
-            self.error_frame.grid_remove()  # Hide the error message if it was visible
-        except ValueError as e:
-            self.error_label.configure(text=str(e))
-            self.error_frame.grid()
+        count = self.count_var.get().strip()
+        if not count.isdigit() or not 1 <= int(count) <= MAX_BATCH:
+            self.show_error(f"Please enter a number of processes between 1 and {MAX_BATCH}")
+            return
+
+        # If valid options are selected, ask the OS to add the processes in one batch; they show
+        # up in the process panel with the next published snapshot
+        self.os.submit(self.os.add_processes, [priority] * int(count), None, IO_PROFILES[self.workload_var.get()])
+        self.error_frame.grid_remove()  # Hide the error message if it was visible
 
 
-    def create_process_widgets(self, process):
+    def show_error(self, message):
         """
-        Create the UI widgets for each process (progress bar, state, etc.).
+        Show an error message above the controls.
         """
-        frame = ctk.CTkFrame(self.inner_frame)
-        frame.pack(pady=5, padx=10, fill=tk.X)
+        self.error_label.configure(text=message)
+        self.error_frame.grid()
 
-        # Label for the process ID and priority
-        label = ctk.CTkLabel(frame, text=f"Process {process.pid} (Priority: {process.priority})", width=180, anchor="w")
-        label.pack(side=tk.LEFT, padx=(5, 10))
 
-        # Progress bar for the process execution
-        progress_bar = ctk.CTkProgressBar(frame, width=200)
-        progress_bar.set(0)
-        progress_bar.pack(side=tk.LEFT, padx=(5, 10))  
-
-        # Dropdown menu for changing the process state based on current state
-        if process.state in [ProcessState.NEW, ProcessState.READY, ProcessState.RUNNING]:
-            options = ["Blocked", "End"]
-        elif process.state == ProcessState.BLOCKED:
-            options = ["Unblocked", "End"]
-        elif process.state == ProcessState.BLOCKED_SUSPENDED:
-            options = ["Unblocked", "End"]
-        elif process.state == ProcessState.READY_SUSPENDED:
-            options = ["Blocked", "End"]
+    def select_process(self, pid, selected):
+        """
+        Add a process to the selection of the bulk actions, or remove it.
+        """
+        if pid is None:
+            return
+        if selected:
+            self.selected.add(pid)
         else:
-            options = []
+            self.selected.discard(pid)
+        self.update_selection()
 
-        state_var = tk.StringVar(value=process.state.value) # Store the current state of the process
-        state_menu = ctk.CTkOptionMenu(frame, values=options, variable=state_var, command=lambda new_state, pid=process.pid: self.change_process_state(pid, new_state), width=100)
-        state_menu.pack(side=tk.LEFT, padx=(5, 10), pady=5)  
 
-        # Store UI widgets in the process object for future updates
-        process.widgets = {"frame": frame, "progress_bar": progress_bar, "state_var": state_var, "state_menu": state_menu}
+    def select_all(self):
+        """
+        Select every process listed in the panel.
+        """
+        self.selected = set(self.displayed)
+        self.update_selection()
+
+
+    def clear_selection(self):
+        """
+        Unselect every process.
+        """
+        self.selected.clear()
+        self.update_selection()
+
+
+    def update_selection(self):
+        """
+        Show the selection on the checkboxes of the rows on screen and in the selection counter.
+        """
+        for row in self.rows:
+            if row.pid is not None:
+                row.selected_var.set(row.pid in self.selected)
+        self.selection_label.configure(text=f"{len(self.selected)} selected")
+
+
+    def change_selected_states(self, action):
+        """
+        Apply a state menu action to every selected process with a single command.
+        """
+        if not self.selected:
+            return
+        new_state = ACTION_STATES[action]
+        self.os.submit(self.os.change_states, sorted(self.selected), new_state)
+        if new_state == ProcessState.TERMINATED:
+            self.clear_selection()
+
+
+    def on_view_changed(self, first, last):
+        """
+        Called by the canvas whenever its visible area changes (scrolling, resizing).
+        """
+        self.scrollbar.set(first, last)
+        self.layout_rows()
+
+
+    def on_mousewheel(self, event):
+        """
+        Scroll the process panel with the mouse wheel while the pointer is over it.
+        """
+        widget = self.winfo_containing(event.x_root, event.y_root)
+        if widget is None or not str(widget).startswith(str(self.process_frame)):
+            return
+        if event.num == 4 or event.delta > 0:
+            self.process_canvas.yview_scroll(-1, "units")
+        else:
+            self.process_canvas.yview_scroll(1, "units")
+
+
+    def layout_rows(self):
+        """
+        Bind the pooled row widgets to the processes in the visible part of the panel.
+        Rows are created only when the viewport grows and are otherwise moved and reused.
+        """
+        width = self.process_canvas.winfo_width()
+        height = self.process_canvas.winfo_height()
+        scrollregion = (0, 0, width, len(self.displayed) * ROW_HEIGHT + 2 * ROW_PADDING)
+        if scrollregion != self.scrollregion:
+            self.scrollregion = scrollregion
+            self.process_canvas.configure(scrollregion=scrollregion)
+
+        first = max(int(self.process_canvas.canvasy(0)) // ROW_HEIGHT, 0)
+        visible = height // ROW_HEIGHT + 2
+        while len(self.rows) < visible:
+            self.rows.append(ProcessRow(self))
+
+        for offset, row in enumerate(self.rows):
+            index = first + offset
+            if offset < visible and index < len(self.displayed):
+                self.process_canvas.coords(row.window, ROW_PADDING, ROW_PADDING + index * ROW_HEIGHT)
+                self.process_canvas.itemconfigure(row.window, state="normal", width=max(width - 2 * ROW_PADDING, 1))
+                pid = self.displayed[index]
+                if row.pid != pid:
+                    row.bind(pid, self.snapshot.process_priority(self.store_rows[pid]), pid in self.selected)
+                self.render_row(row)
+            elif row.pid is not None:
+                self.process_canvas.itemconfigure(row.window, state="hidden")
+                row.pid = None
+
+
+    def render_row(self, row):
+        """
+        Redraw the parts of a row whose process state or progress changed since it was last drawn.
+        """
+        snapshot = self.snapshot
+        store_row = self.store_rows[row.pid]
+        if not snapshot.holds(store_row, row.pid):
+            return  # The process is gone from the OS; its row is removed with the terminated ones
+        state = snapshot.process_state(store_row)
+        progress = round(int(snapshot.progress[store_row]) / int(snapshot.execution_time[store_row]), 3)
+        killed = snapshot.killed
+        if row.rendered == (state, progress, killed):
+            return
+
+        old_state, old_progress, old_killed = row.rendered or (None, None, None)
+        if progress != old_progress:
+            row.progress_bar.set(progress)
+        if state != old_state:
+            row.state_var.set(state.value)
+            row.state_menu.configure(values=self.state_options(state))
+            self.update_process_color(row, state)
+        if killed != old_killed:
+            row.state_menu.configure(state="normal" if not killed else "disabled")
+        row.rendered = (state, progress, killed)
+
+
+    def state_options(self, state):
+        """
+        Return the options of the dropdown menu for changing a process in the given state.
+        """
+        if state in [ProcessState.NEW, ProcessState.READY, ProcessState.RUNNING]:
+            return ["Blocked", "End"]
+        elif state == ProcessState.BLOCKED:
+            return ["Unblocked", "End"]
+        elif state == ProcessState.BLOCKED_SUSPENDED:
+            return ["Unblocked", "End"]
+        elif state == ProcessState.READY_SUSPENDED:
+            return ["Blocked", "End"]
+        return []
+
+
+    def notify_changed(self):
+        """
+        Called by the OS after it published a snapshot, possibly from the simulator thread.
+        The refresh itself runs in the Tk event loop.
+        """
+        try:
+            self.event_generate('<<SimulatorChanged>>', when='tail')
+        except (tk.TclError, RuntimeError):
+            pass  # The window is being destroyed
 
 
     def update_processes(self):
         """
-        Periodically update the UI to reflect the current state of each process.
+        Show the latest snapshot published by the OS, updating only the rows on screen
+        whose process changed since the last frame.
+        """
+        snapshot = self.os.snapshot
+        if snapshot is not self.snapshot:
+            added, terminated = snapshot.changes_since(self.snapshot)
+            self.snapshot = snapshot
+
+            # List the new processes at the end of the panel, in one pass however many were added
+            pids = snapshot.pid[added].tolist()
+            self.displayed.extend(pid for pid in pids if pid not in self.store_rows)
+            self.store_rows.update(zip(pids, added.tolist()))  # A reused PID takes over the row of its old process
+
+            # Remove the terminated processes from the panel after 3 seconds, in one batch per refresh
+            ended = [pid for pid in snapshot.pid[terminated].tolist() if pid not in self.removal_scheduled]
+            if ended:
+                self.removal_scheduled.update(ended)
+                self.after(3000, lambda pids=ended: self.remove_process_rows(pids))
+
+            if len(added):
+                self.layout_rows()
+            for row in self.rows:
+                if row.pid is not None:
+                    self.render_row(row)
+            self.timeline_panel.update(snapshot)
+            self.render_metrics(snapshot.metrics)
+
+
+    def render_metrics(self, metrics):
+        """
+        Show the metrics summary published with the snapshot.
+        """
+        if metrics is None:
+            return
+        turnaround = "-" if metrics['mean_turnaround'] is None else f"{metrics['mean_turnaround']:.0f} (p95 <= {metrics['p95_turnaround']})"
+        utilization = metrics['core_utilization']
+        if len(utilization) > 16:
+            cores = f"mean {sum(utilization) / len(utilization):.0%}, min {min(utilization):.0%}, max {max(utilization):.0%} over {len(utilization)} cores"
+        else:
+            cores = " ".join(f"{value:.0%}" for value in utilization) or "-"
+        text = (f"Tick {metrics['tick']}   Completed {metrics['completed']}   Terminated {metrics['terminated']}   "
+                f"Throughput {metrics['throughput'] / self.os.clock.tick_seconds:.2f}/s   Turnaround {turnaround} ticks\n"
+                f"Preemptions {metrics['preemptions']}   Context switches {metrics['context_switches']}   "
+                f"Run queue {metrics['run_queue_length']} (mean {metrics['mean_run_queue_length']:.1f})   "
+                f"Migrations {metrics['migrations']}   Steals {metrics['steals']}   Warm dispatches {metrics['warm_dispatches']}\n"
+                f"Core utilization {cores}")
+        if metrics['devices']:
+            text += "\nDevices " + "   ".join(f"{name} {device['utilization']:.0%} (queue {device['queue']})"
+                                              for name, device in metrics['devices'].items())
+        if text != self.metrics_label.cget("text"):
+            self.metrics_label.configure(text=text)
+
+
+    def toggle_profiling(self):
         """
-        for process in self.os.processes:
-            if hasattr(process, 'widgets'): 
-                # Update progress and state in the UI
-                if process.widgets["frame"].winfo_exists(): 
-                    process.widgets["progress_bar"].set(process.progress / process.execution_time) 
-                    process.widgets["state_var"].set(process.state.value)
-                    self.update_process_color(process)
-                    process.widgets["state_menu"].configure(state="normal" if not self.os.killed else "disabled")
+        Switch the profiler on or off. While it is on, the GUI refresh is timed along with the
+        phases of the OS, and the report below the metrics panel is refreshed every second.
+        """
+        if self.profile_var.get():
+            self.profiler.reset()
+            self.profiler.enable(sample_interval=0.005)
+            self.profiler.instrument(self, 'update_processes', 'gui.update_processes')
+            self.profiler.instrument(self, 'layout_rows', 'gui.layout_rows')
+            self.profiler.instrument(self, 'render_row', 'gui.render_row')
+            self.profiler.instrument(self.timeline_panel, 'update', 'gui.timeline')
+            self.profile_label.grid()
+            self.render_profile()
+        else:
+            self.profiler.disable()
+            self.profile_label.grid_remove()
 
-                    # If the process is terminated, remove its widget after 3 seconds
-                    if process.state == ProcessState.TERMINATED:
-                        if not hasattr(process, "scheduled_for_removal"):
-                            process.scheduled_for_removal = True  
-                            self.after(3000, lambda p=process: self.remove_process_widget(p))
-                else:
-                    del process.widgets
-        self.after(100, self.update_processes)
+
+    def render_profile(self):
+        """
+        Show the latest profiling report, once a second while profiling.
+        """
+        if not self.profiler.enabled:
+            return
+        self.profile_label.configure(text=self.profiler.format_report())
+        self.after(1000, self.render_profile)
 
 
-    def remove_process_widget(self, process):
+    def remove_process_rows(self, pids):
         """
-        Remove the widget for a process after it's been terminated.
+        Remove a batch of processes from the panel after they've been terminated, in a single
+        pass over the panel and with a single layout however many there are.
         """
-        if hasattr(process, 'widgets') and process.widgets and process.widgets["frame"].winfo_exists():
-            process.widgets["frame"].destroy()  # Destroy the widget frame
-            del process.widgets  # Remove the reference to the widgets
+        self.removal_scheduled.difference_update(pids)
+        removed = set()
+        for pid in pids:
+            store_row = self.store_rows.get(pid)
+            if store_row is not None and not (self.snapshot.holds(store_row, pid) and
+                                              self.snapshot.process_state(store_row) != ProcessState.TERMINATED):
+                removed.add(pid)
+                del self.store_rows[pid]
+        if not removed:
+            return
+        self.displayed = [pid for pid in self.displayed if pid not in removed]
+        if not self.selected.isdisjoint(removed):
+            self.selected -= removed
+            self.update_selection()
+        self.layout_rows()
 
 
-    def update_process_color(self, process):
+    def update_process_color(self, row, state):
         """
-        Update the color of a process widget based on its current state.
+        Update the color of a process row based on the state of its process.
         """
-        colors = {
-            ProcessState.NEW: "gray",
-            ProcessState.READY: "#9a7d0a",
-            ProcessState.RUNNING: "#044b05",
-            ProcessState.BLOCKED: "#751901",
-            ProcessState.TERMINATED: "#032268",
-            ProcessState.ZOMBIE: "#7e4202",
-            ProcessState.BLOCKED_SUSPENDED: "#310451",  
-            ProcessState.READY_SUSPENDED: "#5f4a05",    
-        }
-        process.widgets["frame"].configure(fg_color=colors[process.state])
+        row.frame.configure(fg_color=STATE_COLORS[state])
 
 
     def start_simulation(self):
@@ -211,7 +692,7 @@ class UI(ctk.CTk):
         Start or resume the OS process simulation.
         """
         if self.os.killed:  
-            self.os.resume()
+            self.os.submit(self.os.resume)
         else:  
             self.os.start()
         self.update_button_states(killed=False)
@@ -229,7 +710,7 @@ class UI(ctk.CTk):
         """
         Simulate killing the OS (zombie mode).
         """
-        self.os.kill()
+        self.os.submit(self.os.kill)
         self.update_button_states(killed=True)
 
 
@@ -237,32 +718,10 @@ class UI(ctk.CTk):
         """
         Change the state of a process based on the user's selection.
         """
-        if new_state == "Unblocked":
-            new_state = ProcessState.READY
-        elif new_state == "Blocked":
-            new_state = ProcessState.BLOCKED
-        elif new_state == "End":
-            new_state = ProcessState.TERMINATED
-        
-        
-        # Change the process state in the OS simulator
-        self.os.change_process_state(int(pid), new_state)
-        
-        # Find the process in the OS process list
-        process = next((p for p in self.os.processes if p.pid == pid), None)
-
-        if process:
-            # Handle TERMINATED state and remove widget after 3 seconds
-            if process.state == ProcessState.TERMINATED:
-                if hasattr(process, 'widgets') and process.widgets and process.widgets["frame"].winfo_exists():
-                    self.after(3000, lambda: self.remove_process_widget(process))
-            
-            # Update dropdown menu based on the new state
-            elif process.state == ProcessState.BLOCKED:
-                process.widgets["state_menu"].configure(values=["Unblocked", "End"])
-            elif process.state == ProcessState.READY:
-                process.widgets["state_menu"].configure(values=["Blocked", "End"])
-            
+        new_state = ACTION_STATES[new_state]
+
+        # Ask the OS simulator to change the process state; the panel shows it with the next snapshot
+        self.os.submit(self.os.change_process_state, int(pid), new_state)
 
 
     def update_button_states(self, killed):
@@ -271,22 +730,37 @@ class UI(ctk.CTk):
         """
         if killed:
             self.cores_menu.configure(state="disabled")
+            self.scheduler_menu.configure(state="disabled")
             self.priority_menu.configure(state="disabled")
+            self.workload_menu.configure(state="disabled")
             self.start_button.configure(state="normal")
             self.stop_button.configure(state="disabled")
             self.kill_button.configure(state="disabled")
             self.add_process_button.configure(state="disabled")
+            self.count_entry.configure(state="disabled")
+            for button in self.selection_buttons:
+                button.configure(state="disabled")
         else:
             self.cores_menu.configure(state="normal")
+            self.scheduler_menu.configure(state="normal")
             self.priority_menu.configure(state="normal")
+            self.workload_menu.configure(state="normal")
             self.start_button.configure(state="normal")
             self.stop_button.configure(state="normal")
             self.kill_button.configure(state="normal")
             self.add_process_button.configure(state="normal")
+            self.count_entry.configure(state="normal")
+            for button in self.selection_buttons:
+                button.configure(state="normal")
     
     
     def update_cores(self, num_cores):
         """Update the number of cores in the OS simulator."""
-        self.os.set_num_cores(int(num_cores))
+        self.os.submit(self.os.set_num_cores, int(num_cores))
         
-        
\ No newline at end of file
+        
+
+
+    def update_scheduler(self, name):
+        """Switch the OS simulator to the selected scheduling policy."""
+        self.os.submit(self.os.set_scheduler, SCHEDULERS[name]())
@@ -0,0 +1,323 @@
+import json
+import numpy as np
+from process import NO_VALUE, STATE_CODES, STATES, ProcessState
+
+
+TERMINATED = STATE_CODES[ProcessState.TERMINATED]
+WAITING_STATES = (ProcessState.READY, ProcessState.READY_SUSPENDED, ProcessState.BLOCKED_SUSPENDED)
+PREEMPTED_STATES = (ProcessState.READY, ProcessState.BLOCKED_SUSPENDED)
+
+
+# STREAMING HISTOGRAM WITH A FIXED NUMBER OF POWER-OF-TWO BUCKETS
+class LogHistogram:
+    def __init__(self, buckets=24):
+        """
+        :param buckets: Number of buckets. Bucket k counts values up to 2 ** k, the last one has no upper bound.
+        """
+        self.bounds = [2 ** k for k in range(buckets - 1)]
+        self.counts = np.zeros(buckets, dtype=np.int64)
+        self.count = 0
+        self.sum = 0
+
+
+    def observe(self, value):
+        """
+        Add one non-negative integer value (in O(1), without storing it).
+        """
+        bucket = (int(value) - 1).bit_length() if value > 1 else 0
+        self.counts[min(bucket, len(self.counts) - 1)] += 1
+        self.count += 1
+        self.sum += value
+
+
+    def mean(self):
+        return self.sum / self.count if self.count else None
+
+
+    def quantile(self, q):
+        """
+        Estimate a quantile as the upper bound of the bucket holding it (None if empty).
+        """
+        if not self.count:
+            return None
+        bucket = int(np.searchsorted(np.cumsum(self.counts), q * self.count))
+        return self.bounds[bucket] if bucket < len(self.bounds) else float('inf')
+
+
+    def to_dict(self):
+        return {'count': self.count, 'sum': self.sum, 'bounds': self.bounds, 'counts': self.counts.tolist()}
+
+
+
+# SCHEDULING METRICS OF AN OS, UPDATED FROM ITS STATE TRANSITIONS
+class Metrics:
+    """
+    Accounting is driven by the transition listener: every counter is updated with the tick
+    of the transition, so nothing is done per tick and fast-forwarded runs give the same
+    numbers as real-time ones. Per-process counters live in arrays indexed by store row;
+    system-wide counters and histograms have a fixed size whatever the number of processes.
+    """
+
+    def __init__(self, os_, buckets=24):
+        """
+        Start collecting the metrics of an OS (sets os_.metrics).
+
+        :param os_: OS to observe
+        :param buckets: Number of buckets of the histograms
+        """
+        self.os = os_
+        self.started = os_.clock.now
+        self.rows = 0
+
+        # Per-process counters, indexed by store row
+        self.pids = np.empty(0, dtype=np.int64)          # PID the row was last reset for (detects reused rows)
+        self.entered = np.empty(0, dtype=np.int64)       # Tick at which the process entered its current state
+        self.first_run = np.empty(0, dtype=np.int64)
+        self.preemptions = np.empty(0, dtype=np.int64)
+        self.switches = np.empty(0, dtype=np.int64)
+        self.core = np.empty(0, dtype=np.int64)          # Core of a RUNNING process
+        self.state_ticks = np.empty((0, len(STATES)), dtype=np.int64)
+        self._grow(len(os_.store.columns['pid']))
+
+        # System-wide counters
+        self.completed = 0
+        self.terminated = 0
+        self.total_preemptions = 0
+        self.total_switches = 0
+        self.finished_state_ticks = np.zeros(len(STATES), dtype=np.int64)  # Time in each state of finished processes
+        self.busy_ticks = []     # Busy ticks of each core
+        self.busy_since = []     # Tick at which each core became busy, or NO_VALUE if idle
+        self.core_counters = os_.cores.summary()  # Core counters of the OS when collection started
+        self.queue_length = sum(os_.table.count(state) for state in WAITING_STATES)
+        self.max_queue_length = self.queue_length
+        self.queue_area = 0      # Sum over ticks of the run queue length
+        self.queue_changed = self.started
+
+        self.turnaround = LogHistogram(buckets)  # Arrival to termination
+        self.response = LogHistogram(buckets)    # Arrival to first run
+        self.waiting = LogHistogram(buckets)     # Ticks spent waiting for a core
+
+        for process in os_.processes:
+            self._reset(process.row, process)
+            if process.state == ProcessState.RUNNING:
+                self._take_core(process, self.started)
+        os_.metrics = self
+        os_.add_listener(self.on_transition)
+
+
+    def on_transition(self, process, old_state, new_state):
+        now = self.os.clock.now
+        row = process.row
+        if row >= self.rows:
+            self._grow(len(self.os.store.columns['pid']))
+        if self.pids[row] != process.pid or old_state == ProcessState.NEW:
+            self._reset(row, process)  # First transition of a process (rows and PIDs are reused)
+
+        self.state_ticks[row, STATE_CODES[old_state]] += now - self.entered[row]
+        self.entered[row] = now
+
+        if old_state == ProcessState.RUNNING:
+            self._release_core(int(self.core[row]), now)
+            self.core[row] = NO_VALUE
+            if new_state in PREEMPTED_STATES:
+                self.preemptions[row] += 1
+                self.total_preemptions += 1
+        if new_state == ProcessState.RUNNING:
+            self._take_core(process, now)
+            self.switches[row] += 1
+            self.total_switches += 1
+            if self.first_run[row] == NO_VALUE:
+                self.first_run[row] = now
+
+        change = (new_state in WAITING_STATES) - (old_state in WAITING_STATES)
+        if change:
+            self.queue_area += self.queue_length * (now - self.queue_changed)
+            self.queue_changed = now
+            self.queue_length += change
+            self.max_queue_length = max(self.max_queue_length, self.queue_length)
+
+        if new_state == ProcessState.TERMINATED:
+            self._finish(process, row, now)
+
+
+    def _finish(self, process, row, now):
+        arrival = self._arrival(process)
+        if process.progress >= process.execution_time:
+            self.completed += 1
+        else:
+            self.terminated += 1
+        self.turnaround.observe(now - arrival)
+        if self.first_run[row] != NO_VALUE:
+            self.response.observe(int(self.first_run[row]) - arrival)
+        self.waiting.observe(int(sum(self.state_ticks[row, STATE_CODES[state]] for state in WAITING_STATES)))
+        self.finished_state_ticks += self.state_ticks[row]
+
+
+    def _reset(self, row, process):
+        self.pids[row] = process.pid
+        self.entered[row] = self._arrival(process)
+        self.first_run[row] = NO_VALUE
+        self.preemptions[row] = 0
+        self.switches[row] = 0
+        self.core[row] = NO_VALUE
+        self.state_ticks[row] = 0
+
+
+    def _arrival(self, process):
+        return process.arrival if process.arrival is not None else self.started
+
+
+    def _take_core(self, process, now):
+        core = process.core
+        if core is None:
+            return
+        while len(self.busy_ticks) <= core:
+            self.busy_ticks.append(0)
+            self.busy_since.append(NO_VALUE)
+        self.busy_since[core] = now
+        self.core[process.row] = core
+
+
+    def _release_core(self, core, now):
+        if core == NO_VALUE or self.busy_since[core] == NO_VALUE:
+            return
+        self.busy_ticks[core] += now - self.busy_since[core]
+        self.busy_since[core] = NO_VALUE
+
+
+    def _grow(self, capacity):
+        for name in ('pids', 'entered', 'first_run', 'preemptions', 'switches', 'core'):
+            column = getattr(self, name)
+            grown = np.full(capacity, NO_VALUE if name in ('pids', 'entered', 'first_run', 'core') else 0, column.dtype)
+            grown[:len(column)] = column
+            setattr(self, name, grown)
+        state_ticks = np.zeros((capacity, len(STATES)), dtype=np.int64)
+        state_ticks[:len(self.state_ticks)] = self.state_ticks
+        self.state_ticks = state_ticks
+        self.rows = capacity
+
+
+    def process_record(self, process):
+        """
+        Return the accounting of one process, including the time spent so far in its current state.
+        """
+        row = process.row
+        now = self.os.clock.now
+        tracked = row < self.rows and self.pids[row] == process.pid
+        state_ticks = self.state_ticks[row].copy() if tracked else np.zeros(len(STATES), dtype=np.int64)
+        entered = int(self.entered[row]) if tracked else self._arrival(process)
+        if process.state != ProcessState.TERMINATED:
+            state_ticks[STATE_CODES[process.state]] += now - entered
+        first_run = int(self.first_run[row]) if tracked and self.first_run[row] != NO_VALUE else None
+        return {
+            'pid': process.pid,
+            'arrival': self._arrival(process),
+            'first_run': first_run,
+            'completion': entered if process.state == ProcessState.TERMINATED else None,
+            'state_ticks': {state.value: int(ticks) for state, ticks in zip(STATES, state_ticks)},
+            'preemptions': int(self.preemptions[row]) if tracked else 0,
+            'context_switches': int(self.switches[row]) if tracked else 0,
+        }
+
+
+    def summary(self):
+        """
+        Return the system-wide metrics as a dict of plain numbers (JSON serializable).
+        """
+        now = self.os.clock.now
+        elapsed = now - self.started
+
+        # Time in each state: finished processes plus the live ones up to now
+        size = min(self.rows, self.os.store.size)
+        states = self.os.store.column('state')[:size]
+        live = (self.pids[:size] == self.os.store.column('pid')[:size]) & (states != TERMINATED) & (states != NO_VALUE)
+        state_ticks = self.finished_state_ticks + self.state_ticks[:size][live].sum(axis=0)
+        np.add.at(state_ticks, states[live], now - self.entered[:size][live])
+
+        busy = [ticks + (now - since if since != NO_VALUE else 0) for ticks, since in zip(self.busy_ticks, self.busy_since)]
+        queue_area = self.queue_area + self.queue_length * (now - self.queue_changed)
+        cores = {name: count - self.core_counters[name] for name, count in self.os.cores.summary().items()}
+        return {
+            'tick': now,
+            'elapsed_ticks': elapsed,
+            'completed': self.completed,
+            'terminated': self.terminated,
+            'throughput': self.completed / elapsed if elapsed else 0.0,
+            'mean_turnaround': self.turnaround.mean(),
+            'p50_turnaround': self.turnaround.quantile(0.5),
+            'p95_turnaround': self.turnaround.quantile(0.95),
+            'mean_response': self.response.mean(),
+            'mean_waiting': self.waiting.mean(),
+            'preemptions': self.total_preemptions,
+            'context_switches': self.total_switches,
+            'run_queue_length': self.queue_length,
+            'mean_run_queue_length': queue_area / elapsed if elapsed else float(self.queue_length),
+            'max_run_queue_length': self.max_queue_length,
+            'core_utilization': [ticks / elapsed if elapsed else 0.0 for ticks in busy],
+            'migrations': cores['migrations'],
+            'warm_dispatches': cores['warm_dispatches'],
+            'steals': cores['steals'],
+            'state_ticks': {state.value: int(ticks) for state, ticks in zip(STATES, state_ticks)},
+            'devices': self.os.devices.summary(now),
+        }
+
+
+    def to_json(self):
+        """
+        Dump the summary and the histograms as a JSON document.
+        """
+        report = self.summary()
+        report['histograms'] = {
+            'turnaround_ticks': self.turnaround.to_dict(),
+            'response_ticks': self.response.to_dict(),
+            'waiting_ticks': self.waiting.to_dict(),
+        }
+        return json.dumps(report, indent=2)
+
+
+    def to_prometheus(self, prefix='osemu'):
+        """
+        Dump the metrics in the Prometheus text exposition format.
+        """
+        summary = self.summary()
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{prefix}_{name}{labels} {value}")
+
+        metric('tick', 'gauge', "Current simulation tick.", [('', summary['tick'])])
+        metric('processes_completed_total', 'counter', "Processes that ran to completion.", [('', summary['completed'])])
+        metric('processes_terminated_total', 'counter', "Processes terminated manually.", [('', summary['terminated'])])
+        metric('throughput', 'gauge', "Completed processes per tick.", [('', summary['throughput'])])
+        metric('preemptions_total', 'counter', "RUNNING processes moved back to a waiting state.", [('', summary['preemptions'])])
+        metric('context_switches_total', 'counter', "Transitions into the RUNNING state.", [('', summary['context_switches'])])
+        metric('run_queue_length', 'gauge', "Processes waiting for a core.", [('', summary['run_queue_length'])])
+        metric('run_queue_length_mean', 'gauge', "Time-weighted mean run queue length.", [('', summary['mean_run_queue_length'])])
+        metric('migrations_total', 'counter', "Dispatches to another core than the last one.", [('', summary['migrations'])])
+        metric('warm_dispatches_total', 'counter', "Dispatches back to the last core with a warm cache.", [('', summary['warm_dispatches'])])
+        metric('steals_total', 'counter', "Processes stolen from the run queue of another core.", [('', summary['steals'])])
+        metric('core_utilization', 'gauge', "Fraction of the elapsed ticks each core was busy.",
+               [(f'{{core="{core}"}}', value) for core, value in enumerate(summary['core_utilization'])])
+        metric('state_ticks_total', 'counter', "Ticks spent by processes in each state.",
+               [(f'{{state="{state}"}}', ticks) for state, ticks in summary['state_ticks'].items()])
+        if summary['devices']:
+            devices = summary['devices'].items()
+            metric('device_utilization', 'gauge', "Fraction of the ticks each I/O device channel was busy.",
+                   [(f'{{device="{name}"}}', device['utilization']) for name, device in devices])
+            metric('device_queue_length', 'gauge', "I/O requests waiting for a device.",
+                   [(f'{{device="{name}"}}', device['queue']) for name, device in devices])
+            metric('device_requests_completed_total', 'counter', "I/O requests served by each device.",
+                   [(f'{{device="{name}"}}', device['completed']) for name, device in devices])
+
+        for name, histogram, help_text in (('turnaround_ticks', self.turnaround, "Ticks from arrival to termination."),
+                                           ('response_ticks', self.response, "Ticks from arrival to the first run."),
+                                           ('waiting_ticks', self.waiting, "Ticks spent waiting for a core.")):
+            cumulative = np.cumsum(histogram.counts)
+            samples = [(f'_bucket{{le="{bound}"}}', count) for bound, count in zip(histogram.bounds, cumulative)]
+            samples.append(('_bucket{le="+Inf"}', histogram.count))
+            samples += [('_sum', histogram.sum), ('_count', histogram.count)]
+            metric(name, 'histogram', help_text, samples)
+        return '\n'.join(lines) + '\n'
@@ -1,169 +1,727 @@
 import threading
-import time
-from process import Process, ProcessState
+from collections import deque
+import numpy as np
+from archive import ProcessArchive
+from clock import TICK_SECONDS, RealTimeClock, TimerQueue
+from cores import CoreSet
+from devices import DeviceSet
+from process import NO_VALUE, STATE_CODES, Process, ProcessState, ProcessStore
+from process_table import PID_MAX_LIMIT, PidAllocator, ProcessTable
+from scheduler import PriorityScheduler
+from snapshot import Snapshot
+
+
+# STATE CODES USED BY THE VECTORIZED PARTS OF THE MAIN LOOP
+NEW = STATE_CODES[ProcessState.NEW]
+READY = STATE_CODES[ProcessState.READY]
+RUNNING = STATE_CODES[ProcessState.RUNNING]
+BLOCKED = STATE_CODES[ProcessState.BLOCKED]
+TERMINATED = STATE_CODES[ProcessState.TERMINATED]
+ZOMBIE = STATE_CODES[ProcessState.ZOMBIE]
+BLOCKED_SUSPENDED = STATE_CODES[ProcessState.BLOCKED_SUSPENDED]
+READY_SUSPENDED = STATE_CODES[ProcessState.READY_SUSPENDED]
+
+# CAUSES OF STATE TRANSITIONS (OS.cause, READ BY LISTENERS SUCH AS THE TRACE RECORDER)
+CAUSES = ('schedule', 'timer', 'manual', 'complete', 'kill', 'resume', 'io')
 
 
 # CLASS TO EMULATE OS PROCESS MANAGEMENT
 class OS:
-    def __init__(self):
+    TRANSITION_DELAY = 3  # Seconds a process waits between scheduling states
+    REAP_DELAY = 3        # Seconds a TERMINATED process stays in the OS before it is archived
+    REFRESH_INTERVAL = 0.1  # Seconds between published snapshots while processes are RUNNING
+
+    def __init__(self, clock=None, publish_snapshots=False, scheduler=None, pid_max=PID_MAX_LIMIT,
+                 reap_delay=REAP_DELAY, reap_backlog=None, archive=None, tick_seconds=TICK_SECONDS):
         """
         Initialize the OS simulator with an empty process list and management flags.
+
+        :param clock: Clock driving the simulation (RealTimeClock by default, VirtualClock for headless runs)
+        :param publish_snapshots: Publish a Snapshot of the processes after every tick for other threads
+        :param scheduler: Scheduling policy (PriorityScheduler by default, see scheduler.py)
+        :param pid_max: Largest PID handed out before PIDs wrap around
+        :param reap_delay: Seconds after which a TERMINATED process is archived and removed, or None to keep them
+        :param reap_backlog: Number of TERMINATED processes kept before the oldest ones are reaped early, or None
+        :param archive: ProcessArchive receiving the summaries of reaped processes (a ring of 10000 by default)
+        :param tick_seconds: Length of one tick of the default real-time clock in seconds
         """
-        self.processes = []   # List of all processes in the OS
+        self.store = ProcessStore()  # Columnar storage of the process attributes
+        self.table = ProcessTable()  # Index of the processes by PID and by state
+        self.pids = PidAllocator(pid_max)  # Hands out the PIDs of new processes
         self.running = False  # Flag to indicate if the OS is running
         self.killed = False   # Flag for killing the OS (zombie mode)
         self.thread = None    # Thread for running the OS in the background
         self.num_cores = 1    # Default to 1 core  
+        self.cores = CoreSet(self.num_cores)  # Core of each RUNNING process and affinity masks
+        self.devices = DeviceSet()             # I/O devices, burst profiles and requests in service
+        self.clock = clock or RealTimeClock(tick_seconds)  # Source of the current tick
+        self.timers = TimerQueue()             # Delayed transitions, serviced by the run loop
+        self.commands = deque()                # Calls queued by other threads, applied at tick boundaries
+        self.wakeup = threading.Condition()    # Notified when a command arrives or the OS is stopped
+        self.scheduler = scheduler or PriorityScheduler()  # Decides which READY processes run
+        self.metrics = None                    # Metrics collector, set by metrics.Metrics(os)
+        self.cause = 'schedule'                # Cause of the state transitions being made (one of CAUSES)
+        self.reap_delay = reap_delay
+        self.reap_backlog = reap_backlog
+        self.reap_queue = deque()              # (tick, token, process, completion tick) of TERMINATED processes
+        self.archive = archive if archive is not None else ProcessArchive()
+        self.publish_snapshots = publish_snapshots
+        self.publish_listeners = []            # Called after every published snapshot
+        self.snapshot = Snapshot.take(self) if publish_snapshots else None  # Latest published snapshot
+        self.table.listeners.append(self.track_cores)  # First listener, so the others see the core of a process
+
+
+    @property
+    def processes(self):
+        """
+        All processes in the OS, in the order they were added (a live view of the process table).
+        """
+        return self.table.by_pid.values()
 
 
     def set_num_cores(self, num_cores):
         """Set the number of CPU cores."""
         self.num_cores = num_cores
-    
-    
+        self.cores.resize(num_cores)
+
+
+    def set_affinity(self, pid, cores):
+        """
+        Restrict the cores a process may run on, from its next dispatch. The per-core scheduler
+        never runs a process outside its mask; the policies with one global ready queue prefer
+        an allowed core but use any free core rather than leave the process waiting.
+
+        :param pid: PID of the process
+        :param cores: Iterable of core numbers, or None to allow every core
+        """
+        process = self.table.get(pid)
+        if process is not None:
+            process.affinity = self.cores.mask_id(cores)
+
+
+    def set_io_profile(self, pid, profile):
+        """
+        Give a process a CPU/I-O burst profile: after every profile.cpu_burst ticks of running it
+        issues a request to the device profile.device and stays BLOCKED until the request completes.
+
+        :param pid: PID of the process
+        :param profile: devices.BurstProfile, or None to make the process CPU bound
+        """
+        process = self.table.get(pid)
+        if process is not None:
+            process.io_profile = self.devices.profile_id(profile)
+            process.next_io = None if profile is None else process.progress + profile.cpu_burst
+
+
+    def track_cores(self, process, old_state, new_state):
+        """
+        Free the core of a process that stops running. A process that starts running without
+        being dispatched (restored from zombie state) takes a free core.
+        """
+        if old_state == ProcessState.RUNNING:
+            self.cores.release(process)
+        elif new_state == ProcessState.RUNNING and (process.core is None or self.cores.running[process.core] is not process):
+            core = self.cores.choose(process)
+            if core is not None:
+                self.cores.take(process, core)
+
+
+    def set_scheduler(self, scheduler):
+        """
+        Switch to another scheduling policy. Processes waiting in the ready queue of the old
+        policy go back to READY and are admitted by the new one after the transition delay.
+        """
+        for row in np.flatnonzero(self.store.column('queued') == 1):
+            process = self.store.views[row]
+            self.dequeue(process)
+            process.ready_time = None
+        self.scheduler = scheduler
+
+
+    def submit(self, command, *args):
+        """
+        Ask the simulator thread to call an OS method (e.g. os.add_process) at the next tick boundary.
+        This keeps the simulator thread the only writer of the processes. If the simulator
+        thread is not running, the call is made right away and a new snapshot is published.
+
+        :param command: Bound OS method to call
+        :param args: Arguments passed to the method
+        """
+        with self.wakeup:
+            if self.thread is not None and self.thread.is_alive():
+                self.commands.append((command, args))
+                self.wakeup.notify()  # Wake the simulator thread if it is waiting for its next deadline
+                return
+        command(*args)
+        self.publish()
+
+
+    def process_commands(self):
+        """
+        Apply, in order, the commands queued before this call.
+        """
+        for _ in range(len(self.commands)):
+            command, args = self.commands.popleft()
+            command(*args)
+
+
+    def publish(self):
+        """
+        Publish an immutable snapshot of the processes. Readers only ever see a complete
+        snapshot because publishing swaps a single reference.
+        """
+        if self.publish_snapshots:
+            self.snapshot = Snapshot.take(self)
+            # Once a stop is requested the simulator thread no longer notifies, so stop() never
+            # waits on a listener that needs the thread calling stop()
+            if self.running or threading.current_thread() is not self.thread:
+                for listener in self.publish_listeners:
+                    listener()
+
+
+    def add_publish_listener(self, listener):
+        """
+        Register a function called as listener() after every published snapshot. It is called
+        from the simulator thread while the simulation runs.
+        """
+        self.publish_listeners.append(listener)
+
+
+    def add_listener(self, listener):
+        """
+        Register a function called as listener(process, old_state, new_state) on every state change.
+        """
+        self.table.listeners.append(listener)
+
+
     # METHOD TO ADD A NEW PROCESS WITH A SPECIFIED PRIORITY
-    def add_process(self, priority):
+    def add_process(self, priority, execution_time=None, io_profile=None):
         """
         Add a new process to the OS with a specified priority.
         
         :param priority: Priority of the process ('High', 'Medium High', 'Medium Low', 'Low')
+        :param execution_time: Ticks of work needed to complete (defaults to the time of the priority level)
+        :param io_profile: devices.BurstProfile of the process, or None for a CPU-bound process
         :return: The newly created process
         """
-        pid = len(self.processes) + 1  # Assign a unique PID to the new process
-        process = Process(pid, priority)
-        self.processes.append(process)
+        profile_id = self.devices.profile_id(io_profile)  # Checked before anything is allocated
+        pid = self.pids.allocate()  # Assign a unique PID to the new process
+        process = Process(pid, priority, self.store, execution_time)
+        process.arrival = self.clock.now
+        if io_profile is not None:
+            process.io_profile = profile_id
+            process.next_io = io_profile.cpu_burst
+        self.table.add(process)
         return process
 
 
+    def add_processes(self, priorities, execution_times=None, io_profile=None):
+        """
+        Add many processes at once. PIDs and store rows are allocated and the columns filled
+        in one pass, so adding N processes costs much less than N calls to add_process. The
+        arguments are checked before anything is allocated (ValueError if they do not match).
+
+        :param priorities: Priority of each new process
+        :param execution_times: Ticks of work of each new process (None entries, or None for all, use the default)
+        :param io_profile: devices.BurstProfile given to every new process, or None for CPU-bound processes
+        :return: List of the newly created processes
+        """
+        priorities = list(priorities)
+        execution_times = [None] * len(priorities) if execution_times is None else list(execution_times)
+        if len(execution_times) != len(priorities):
+            raise ValueError(f"{len(execution_times)} execution times given for {len(priorities)} processes")
+        invalid = set(priorities).difference(Process.PRIORITIES)
+        if invalid:
+            raise ValueError(f"Invalid priorities: {', '.join(sorted(map(repr, invalid)))}")
+        codes = [Process.PRIORITIES.index(priority) for priority in priorities]
+        times = [time or Process.PRIORITY_EXECUTION_TIMES[priority] for priority, time in zip(priorities, execution_times)]
+        profile_id = self.devices.profile_id(io_profile)
+        if not priorities:
+            return []
+
+        pids = self.pids.allocate_many(len(priorities))
+        rows = self.store.allocate_many(len(priorities))
+        columns = self.store.columns
+        columns['pid'][rows] = pids
+        columns['state'][rows] = NEW
+        columns['priority'][rows] = codes
+        columns['execution_time'][rows] = times
+        for name in ('progress', 'token', 'order', 'queued'):
+            columns[name][rows] = 0
+        columns['arrival'][rows] = self.clock.now
+        if io_profile is not None:
+            columns['io_profile'][rows] = profile_id
+            columns['next_io'][rows] = io_profile.cpu_burst
+        processes = [Process.view(self.store, row) for row in rows.tolist()]
+        self.table.add_many(self.store, rows)
+        return processes
+
+
     # MAIN LOOP FOR PROCESS MANAGEMENT
     def run(self):
         """
         Main loop to manage and execute processes in the OS.
         This loop checks the state of each process and updates it accordingly.
         """
-        while self.running:
-            if not self.killed:
-                for process in self.processes:
-                    # Restore processes from zombie state if the OS is not killed
-                    if process.state == ProcessState.ZOMBIE:
-                        process.state = process.pre_zombie_state or ProcessState.READY
-                        process.pre_zombie_state = None
-                    
-                    # Skip terminated processes
-                    if process.manual_state == ProcessState.TERMINATED:
-                        continue
-
-                    # Handle manually blocked processes
-                    elif process.manual_state == ProcessState.BLOCKED:
-                        process.state = ProcessState.BLOCKED
-
-                    # Process ready or in its default state
-                    elif process.manual_state is None or process.manual_state == ProcessState.READY:
-                        self.update_process_state(process)  # Update the state based on current progress
-            
-            else:
-                # If the OS is killed, move non-terminated processes to zombie state
-                for process in self.processes:
-                    if process.state != ProcessState.TERMINATED:
-                        if process.state != ProcessState.ZOMBIE:
-                            process.pre_zombie_state = process.state
-                        process.state = ProcessState.ZOMBIE
+        if self.clock.virtual:
+            self.run_until()
+            return
+
+        self.clock.start()
+        while True:
+            while self.running:
+                self.step()
+
+                # Sleep until the next state change, or until a command arrives or the OS is stopped
+                deadline = self.next_wakeup()
+                with self.wakeup:
+                    if self.running and not self.commands:
+                        self.wakeup.wait(None if deadline is None else self.clock.seconds_until(deadline))
+
+                # Step the tick matching the wall-clock time, but no tick later than the deadline
+                target = max(self.clock.elapsed(), self.clock.now + 1)
+                if deadline is not None:
+                    target = min(target, deadline)
+                self.skip_ticks(target - self.clock.now - 1)
+                self.clock.advance()
+
+            # Apply the commands that arrived while the OS was stopping, unless start() was called
+            # again meanwhile. The thread lets go of the OS under the lock, so every command is
+            # either applied here or, once self.thread is None, by submit() itself
+            with self.wakeup:
+                self.process_commands()
+                if not self.running:
+                    self.publish()
+                    self.thread = None
+                    return
+
+
+    def next_wakeup(self):
+        """
+        Return the tick at which the real-time loop has to step next, or None to wait for a command.
+        While processes are RUNNING, snapshots are still published every REFRESH_INTERVAL so
+        their progress can be shown.
+        """
+        quiet = self.idle_ticks()
+        deadline = None if quiet is None else self.clock.now + quiet + 1
+        if self.publish_snapshots and self.table.count(ProcessState.RUNNING):
+            refresh = self.clock.now + max(self.clock.ticks(self.REFRESH_INTERVAL), 1)
+            deadline = refresh if deadline is None else min(deadline, refresh)
+        return deadline
+
+
+    # EVENT-DRIVEN LOOP FOR HEADLESS SIMULATIONS ON A VIRTUAL CLOCK
+    def run_until(self, until=None):
+        """
+        Run the simulation on a virtual clock, jumping straight from one state change to the next.
+        Ticks in which nothing but the progress of RUNNING processes changes are skipped in one step,
+        so the resulting state transitions are the same as in real-time mode.
+
+        :param until: Tick at which to stop, or None to run until no further state change can happen
+        """
+        self.running = True
+        while self.running and (until is None or self.clock.now < until):
+            self.step()
+            quiet = self.idle_ticks()
+            if quiet is None and until is None:
+                self.clock.advance()
+                break
+            if until is not None:
+                remaining = until - self.clock.now - 1
+                quiet = remaining if quiet is None else min(quiet, remaining)
+            self.skip_ticks(quiet)
+            self.clock.advance()
+        self.running = False
+
+
+    def step(self):
+        """
+        Execute a single tick: apply the queued commands, fire the due delayed transitions,
+        update the processes and publish a snapshot of the result.
+        """
+        self.process_commands()
+        self.reap()
+        self.fire_timers()
+        if self.killed:
+            self.zombify_processes()
+        else:
+            self.restore_processes()
+            self.complete_io()
+            self.update_processes()
+        self.cause = 'schedule'
+        self.publish()
+
+
+    def fire_timers(self):
+        """
+        Run the delayed transitions that are due at the current tick.
+        """
+        self.cause = 'timer'
+        for callback, args in self.timers.pop_due(self.clock.now):
+            callback(*args)
+
+
+    def zombify_processes(self):
+        """
+        Move the non-terminated processes to ZOMBIE state while the OS is killed.
+        """
+        self.cause = 'kill'
+        states = self.store.column('state')
+        for row in self.rows_in_order((states != NO_VALUE) & (states != TERMINATED) & (states != ZOMBIE)):
+            process = self.store.views[row]
+            process.pre_zombie_state = process.state
+            process.state = ProcessState.ZOMBIE
+            if process.queued:
+                # Leave the ready queue, the process is admitted again once restored
+                process.queued = False
+                process.ready_time = None
+
+
+    def restore_processes(self):
+        """
+        Restore the processes from ZOMBIE state once the OS is no longer killed. This happens
+        before the I/O completions of the tick, so a process that was BLOCKED on a request is
+        waiting for it again when the request is delivered.
+        """
+        self.cause = 'resume'
+        for row in self.rows_in_order(self.store.column('state') == ZOMBIE):
+            process = self.store.views[row]
+            process.state = process.pre_zombie_state or ProcessState.READY
+            process.pre_zombie_state = None
+
+
+    def update_processes(self):
+        """
+        Update every process for the current tick. RUNNING processes advance together in one
+        vectorized operation; the processes that are waiting to run are then updated one by one,
+        in the order they were added.
+        """
+        states = self.store.column('state')
+        manual = self.store.column('manual_state')
+
+        # Handle manually blocked processes
+        self.cause = 'manual'
+        for row in self.rows_in_order((manual == BLOCKED) & (states != BLOCKED)):
+            self.store.views[row].state = ProcessState.BLOCKED
+
+        # Only processes ready or in their default state are updated automatically
+        automatic = (manual == NO_VALUE) | (manual == READY)
+
+        # Increment the progress of every RUNNING process and terminate the ones that completed
+        running = automatic & (states == RUNNING)
+        progress = self.store.column('progress')
+        progress[running] += 1
+        self.cause = 'complete'
+        for row in self.rows_in_order(running & (progress >= self.store.column('execution_time'))):
+            self.complete_process(self.store.views[row])
+
+        # Processes at the end of a CPU burst issue their I/O request and block until it completes
+        if self.devices.profiles:
+            self.cause = 'io'
+            next_io = self.store.column('next_io')
+            for row in self.rows_in_order(running & (states == RUNNING) & (next_io != NO_VALUE) & (progress >= next_io)):
+                self.start_io(self.store.views[row])
+
+        # Update the state of the waiting processes that have something due this tick
+        self.cause = 'schedule'
+        for row in self.rows_in_order(automatic & self.due_mask(states)):
+            self.update_process_state(self.store.views[row])
+
+        # Let the scheduling policy preempt expired time slices and fill the free cores
+        self.run_scheduler()
+
+
+    def complete_io(self):
+        """
+        Move the processes whose I/O request completed at the current tick back to READY, in one batch.
+        """
+        self.cause = 'io'
+        for process in self.devices.complete(self.clock.now):
+            process.state = ProcessState.READY
+
 
-            time.sleep(0.1)  # Pause for a short time between each loop
+    def start_io(self, process):
+        """
+        Block a RUNNING process at the end of its CPU burst and queue its request on the device of its profile.
+        """
+        profile = self.devices.profiles[process.io_profile]
+        self.scheduler.block(self, process)
+        process.state = ProcessState.BLOCKED
+        process.next_io = process.progress + profile.cpu_burst
+        self.devices.submit(process, profile, self.clock.now)
+
+
+    def run_scheduler(self):
+        """
+        Let the scheduling policy make its end-of-tick decisions.
+        """
+        self.scheduler.schedule(self)
+
+
+    def rows_in_order(self, mask):
+        """
+        Return the rows selected by a mask in the order their processes were added. Rows of
+        reaped processes are reused, so the row order alone is not the order of the table.
+        """
+        rows = np.flatnonzero(mask)
+        if len(rows) > 1:
+            rows = rows[np.argsort(self.store.column('order')[rows], kind='stable')]
+        return rows
+
+
+    def due_mask(self, states):
+        """
+        Select the waiting processes for which update_process_state would do something this tick.
+        READY and READY_SUSPENDED processes still inside their transition delay are left out, and
+        so are READY processes waiting in the ready queue of the scheduler and BLOCKED_SUSPENDED
+        processes when no core is free (cores only fill up during a tick).
+        """
+        now = self.clock.now
+        delay = self.clock.ticks(self.TRANSITION_DELAY)
+        due = states == NEW
+        for code, column in ((READY, 'ready_time'), (READY_SUSPENDED, 'ready_suspended_time')):
+            since = self.store.column(column)
+            due |= (states == code) & ((since == NO_VALUE) | (now - since >= delay))
+        due &= self.store.column('queued') != 1
+        if self.table.count(ProcessState.RUNNING) < self.num_cores:
+            due |= states == BLOCKED_SUSPENDED
+        return due
+
+
+    def idle_ticks(self):
+        """
+        Count the ticks after the current one in which no process changes state.
+        During those ticks the only effect of the main loop is the progress of RUNNING processes.
+
+        :return: Number of quiet ticks, or None if no state change will ever happen again
+        """
+        now = self.clock.now
+        delay = self.clock.ticks(self.TRANSITION_DELAY)
+        deadlines = [self.timers.next_due(), self.scheduler.next_decision(self), self.next_reap()]
+        states = self.store.column('state')
+        manual = self.store.column('manual_state')
+
+        if self.killed:
+            if np.any((states != NO_VALUE) & (states != TERMINATED) & (states != ZOMBIE)):
+                return 0
+        else:
+            # Zombies are restored and manually blocked processes forced to BLOCKED on the next tick
+            if np.any(states == ZOMBIE) or np.any((manual == BLOCKED) & (states != BLOCKED)):
+                return 0
+
+            automatic = (manual == NO_VALUE) | (manual == READY)
+            if np.any(automatic & (states == NEW)):
+                return 0
+
+            # READY and READY_SUSPENDED processes move on once they have waited for the transition delay
+            for code, column in ((READY, 'ready_time'), (READY_SUSPENDED, 'ready_suspended_time')):
+                since = self.store.column(column)[automatic & (states == code) & (self.store.column('queued') != 1)]
+                if len(since):
+                    if np.any(since == NO_VALUE):
+                        return 0
+                    deadlines.append(int(since.min()) + delay)
+
+            # RUNNING processes terminate once their progress reaches their execution time
+            running = automatic & (states == RUNNING)
+            if np.any(running):
+                remaining = self.store.column('execution_time')[running] - self.store.column('progress')[running]
+                deadlines.append(now + int(remaining.min()))
+
+                # and issue an I/O request once their progress reaches the end of their CPU burst
+                if self.devices.profiles:
+                    next_io = self.store.column('next_io')[running]
+                    bursts = (next_io - self.store.column('progress')[running])[next_io != NO_VALUE]
+                    if len(bursts):
+                        deadlines.append(now + int(bursts.min()))
+
+            # Requests in service complete at a known tick
+            deadlines.append(self.devices.next_completion())
+
+            # BLOCKED_SUSPENDED processes schedule their resumption as soon as a core is free
+            if self.table.count(ProcessState.RUNNING) < self.num_cores:
+                for process in self.table.by_state[ProcessState.BLOCKED_SUSPENDED]:
+                    if process.manual_state != ProcessState.TERMINATED and process.transition is None:
+                        return 0
+
+        deadlines = [tick for tick in deadlines if tick is not None]
+        if not deadlines:
+            return None
+        return max(min(deadlines) - now - 1, 0)
+
+
+    def skip_ticks(self, ticks):
+        """
+        Fast-forward over quiet ticks by advancing every RUNNING process in one step.
+
+        :param ticks: Number of quiet ticks, as returned by idle_ticks
+        """
+        if ticks <= 0:
+            return
+        self.advance_progress(ticks)
+        self.clock.advance(ticks)
+
+
+    def advance_progress(self, ticks):
+        """
+        Add the progress that RUNNING processes make during quiet ticks, without moving the clock
+        (for a clock shared with other simulators, see cluster.py).
+        """
+        if ticks <= 0 or self.killed:
+            return
+        states = self.store.column('state')
+        manual = self.store.column('manual_state')
+        running = ((manual == NO_VALUE) | (manual == READY)) & (states == RUNNING)
+        self.store.column('progress')[running] += ticks
 
 
     def update_process_state(self, process):
         """
         Update the state of an individual process based on its progress and execution time.
         """
-        running_processes = [p for p in self.processes if p.state == ProcessState.RUNNING]
-
         # If process is NEW, move to READY state
         if process.state == ProcessState.NEW:
             process.state = ProcessState.READY
-            self.schedule_transition(process, ProcessState.READY, 3)  # Stay in READY state for 3 seconds
+            self.schedule_transition(process, ProcessState.READY, self.TRANSITION_DELAY)  # Stay in READY state for 3 seconds
 
-        # If process is in READY state, move to RUNNING or BLOCKED based on core availability
+        # If process is in READY state, let the scheduling policy decide what happens to it
         elif process.state == ProcessState.READY:
-            if not hasattr(process, 'ready_time'):
-                process.ready_time = time.time()
+            if process.ready_time is None:
+                process.ready_time = self.clock.now
             
-            # Transition to RUNNING or BLOCKED_SUSPENDED after 3 seconds
-            if time.time() - process.ready_time >= 3:
-                if len(running_processes) < self.num_cores:
-                    process.state = ProcessState.RUNNING
-                else:
-                    # Preempt a lower priority process if necessary
-                    lowest_priority_process = min(running_processes, key=lambda p: self.get_priority_value(p.priority))
-                    
-                    if self.get_priority_value(process.priority) > self.get_priority_value(lowest_priority_process.priority):
-                        lowest_priority_process.state = ProcessState.BLOCKED_SUSPENDED
-                        process.state = ProcessState.RUNNING
-                    else:
-                        process.state = ProcessState.BLOCKED_SUSPENDED
-                
-                delattr(process, 'ready_time')  # Remove the attribute after the state is changed
+            # Hand the process to the scheduling policy after 3 seconds (RUNNING, queued or BLOCKED_SUSPENDED)
+            if self.clock.now - process.ready_time >= self.clock.ticks(self.TRANSITION_DELAY):
+                process.ready_time = None  # Clear the time before the state is changed
+                self.scheduler.admit(self, process)
 
         # If process is RUNNING, increment its progress and check for completion
         elif process.state == ProcessState.RUNNING:
             process.progress += 1
             if process.progress >= process.execution_time:
-                process.state = ProcessState.TERMINATED
-                self.handle_process_completion()  # Handle process completion (free resources)
+                self.complete_process(process)
 
         # If the process is BLOCKED_SUSPENDED, schedule it to transition to READY_SUSPENDED
         elif process.state == ProcessState.BLOCKED_SUSPENDED:
-            if len(running_processes) < self.num_cores:
-                self.schedule_transition(process, ProcessState.READY_SUSPENDED, 3)
+            if self.table.count(ProcessState.RUNNING) < self.num_cores:
+                self.schedule_transition(process, ProcessState.READY_SUSPENDED, self.TRANSITION_DELAY)
 
         # If the process is in READY_SUSPENDED state, transition it to READY after delay
         elif process.state == ProcessState.READY_SUSPENDED:
-            if not hasattr(process, 'ready_suspended_time'):
-                process.ready_suspended_time = time.time()
+            if process.ready_suspended_time is None:
+                process.ready_suspended_time = self.clock.now
             
-            if time.time() - process.ready_suspended_time >= 3:
-                self.schedule_transition(process, ProcessState.READY, 3)
-                delattr(process, 'ready_suspended_time')
+            if self.clock.now - process.ready_suspended_time >= self.clock.ticks(self.TRANSITION_DELAY):
+                self.schedule_transition(process, ProcessState.READY, self.TRANSITION_DELAY)
+                process.ready_suspended_time = None
 
 
     def schedule_transition(self, process, target_state, delay):
         """
         Schedule a process to transition to another state after a delay.
         """
-        if not hasattr(process, "scheduled") or process.scheduled is False:
-            process.scheduled = True
-            threading.Timer(delay, lambda: self.set_process_state(process, target_state)).start()
+        if process.transition is None:
+            process.transition = self.call_later(delay, self.set_process_state, process, target_state)
+
+
+    def call_later(self, delay, callback, *args):
+        """
+        Call a function after a delay in seconds. The call is queued on the timer queue
+        at the matching tick and run by the main loop, so no thread is created per timer.
+
+        :return: TimerHandle that can be cancelled or rescheduled
+        """
+        return self.timers.schedule(self.clock.now + self.clock.ticks(delay), callback, *args)
+
+
+    def cancel_timers(self, process):
+        """
+        Cancel the pending scheduled transition and READY release of a process.
+        """
+        for handle in (process.transition, process.release):
+            if handle is not None:
+                self.timers.cancel(handle)
+        process.transition = None
+        process.release = None
 
 
     def get_priority_value(self, priority):
         """
         Convert priority string to a numeric value for comparison.
         """
-        priority_values = {
-            'High': 4,
-            'Medium High': 3,
-            'Medium Low': 2,
-            'Low': 1
-        }
-        return priority_values.get(priority, 0)
+        return Process.PRIORITY_VALUES.get(priority, 0)
     
     
     def set_process_state(self, process, state):
         """
-        Set the state of a process and reset its scheduled flag.
+        Set the state of a process and clear its pending transition.
         """
         process.state = state
-        process.scheduled = False
+        process.transition = None
+
+
+    # PRIMITIVES USED BY THE SCHEDULING POLICIES
+    def running_processes(self):
+        """Return the set of RUNNING processes."""
+        return self.table.by_state[ProcessState.RUNNING]
+
+
+    def free_cores(self):
+        """Return the number of cores without a RUNNING process."""
+        return self.num_cores - self.table.count(ProcessState.RUNNING)
+
+
+    def dispatch(self, process, core=None):
+        """Start running a process on a free core (by default its last core if free, see CoreSet.choose)."""
+        process.queued = False
+        if core is None:
+            core = self.cores.choose(process)
+        if core is not None:
+            self.cores.take(process, core)
+        process.state = ProcessState.RUNNING
+        process.dispatched_at = self.clock.now
+
+
+    def enqueue(self, process):
+        """Keep a READY process waiting in the ready queue of the scheduler."""
+        process.state = ProcessState.READY
+        process.queued = True
+
+
+    def dequeue(self, process):
+        """Take a process out of the ready queue of the scheduler without changing its state."""
+        if process.queued:
+            process.queued = False
+            process.token += 1  # Invalidate its entry in the ready queue
+
+
+    def requeue(self, process):
+        """Preempt a RUNNING process and put it back in the ready queue of the scheduler."""
+        self.enqueue(process)
+        process.ready_time = None
+
+
+    def suspend(self, process):
+        """Preempt or hold back a process by moving it to BLOCKED_SUSPENDED."""
+        process.queued = False
+        process.state = ProcessState.BLOCKED_SUSPENDED
+
+
+    def complete_process(self, process):
+        """
+        Terminate a process whose progress reached its execution time.
+        """
+        process.state = ProcessState.TERMINATED
+        self.scheduler.forget(process)
+        self.schedule_reap(process)
+        self.handle_process_completion()  # Handle process completion (free resources)
 
 
     def handle_process_completion(self):
         """
         Called when a process completes (TERMINATED). Move a suspended process to READY_SUSPENDED if available.
         """
-        for process in self.processes:
-            if process.state == ProcessState.BLOCKED_SUSPENDED:
-                self.schedule_transition(process, ProcessState.READY_SUSPENDED, 3)
-                break
+        process = self.table.first_suspended()
+        if process is not None:
+            self.schedule_transition(process, ProcessState.READY_SUSPENDED, self.TRANSITION_DELAY)
 
 
     def remove_terminated_process(self, process):
@@ -171,28 +729,80 @@ class OS:
         Remove a process from the OS once it has been in the TERMINATED 
         """
         if process.state == ProcessState.TERMINATED:
-            self.processes.remove(process)
+            self.table.remove(process)
+            self.pids.free(process.pid)
+            self.store.free(process.row)
+
+
+    # REAPING OF TERMINATED PROCESSES
+    def schedule_reap(self, process):
+        """
+        Queue a process that just became TERMINATED for archival after the reap delay.
+        """
+        if self.reap_delay is None and self.reap_backlog is None:
+            return
+        now = self.clock.now
+        due = None if self.reap_delay is None else now + self.clock.ticks(self.reap_delay)
+        self.reap_queue.append((due, process.token, process, now))
+
+
+    def next_reap(self):
+        """
+        Return the tick at which reap() will next remove a process, or None.
+        """
+        if not self.reap_queue:
+            return None
+        if self.reap_backlog is not None and len(self.reap_queue) > self.reap_backlog:
+            return self.clock.now + 1
+        return self.reap_queue[0][0]
+
+
+    def reap(self):
+        """
+        Archive and remove the TERMINATED processes whose reap delay expired, and the oldest
+        ones beyond the reap backlog. Processes changed manually since they terminated are skipped.
+        """
+        now = self.clock.now
+        queue = self.reap_queue
+        while queue and ((queue[0][0] is not None and queue[0][0] <= now) or
+                         (self.reap_backlog is not None and len(queue) > self.reap_backlog)):
+            _, token, process, completion = queue.popleft()
+            if process.table is None or process.token != token or process.state != ProcessState.TERMINATED:
+                continue
+            self.archive.append(process, completion)
+            self.cancel_timers(process)
+            self.remove_terminated_process(process)
 
 
     def start(self):
         """
         Start the OS simulation in a background thread.
         """
-        self.running = True 
-        self.killed = False 
-        if self.thread is None or not self.thread.is_alive():
-            self.thread = threading.Thread(target=self.run, daemon=True) # Start the OS run loop in a separate thread
-            self.thread.start()
+        with self.wakeup:
+            self.running = True
+            self.killed = False
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, daemon=True) # Start the OS run loop in a separate thread
+                self.thread.start()
 
 
     def stop(self):
         """
-        Stop the OS simulation and wait for the thread to terminate.
+        Stop the OS simulation and wait (at most a second) for the thread to terminate. If it is
+        still busy, e.g. in a publish listener, it is left to apply the queued commands itself and
+        its handle is kept, so only that thread ever writes the processes and start() does not
+        run a second loop.
         """
-        self.running = False 
-        if self.thread:
-            self.thread.join(timeout=1.0) 
-        self.thread = None
+        with self.wakeup:
+            self.running = False
+            self.wakeup.notify()
+        thread = self.thread
+        if thread is not None:
+            thread.join(timeout=1.0)
+        if thread is None or not thread.is_alive():
+            self.thread = None
+            self.process_commands()  # Apply the commands that arrived while the thread was stopping
+            self.publish()
 
 
     def kill(self):
@@ -213,28 +823,94 @@ class OS:
         """
         Manually change the state of a process based on user input.
         """
-        for process in self.processes:
-            if process.pid == pid:
-                # Manually set the state to TERMINATED if requested
-                if new_state == ProcessState.TERMINATED:
-                    process.state = ProcessState.TERMINATED
-                    process.manual_state = ProcessState.TERMINATED
-                # Set the state to BLOCKED
-                elif new_state == ProcessState.BLOCKED:
-                    process.state = ProcessState.BLOCKED
-                    process.manual_state = ProcessState.BLOCKED
-                # Set the state to READY and release after a delay
-                elif new_state == ProcessState.READY:
-                    process.state = ProcessState.READY
-                    process.manual_state = ProcessState.READY
-                    threading.Timer(3.0, self.release_ready_state, args=[process]).start()
-                break
+        process = self.table.get(pid)
+        if process is None:
+            return
+
+        cause, self.cause = self.cause, 'manual'
+        # A manual change overrides any pending automatic transition
+        if process.transition is not None:
+            self.timers.cancel(process.transition)
+            process.transition = None
+
+        # A manual change also takes the process out of the ready queue of the scheduler
+        self.dequeue(process)
+
+        # Manually set the state to TERMINATED if requested
+        if new_state == ProcessState.TERMINATED:
+            process.state = ProcessState.TERMINATED
+            process.manual_state = ProcessState.TERMINATED
+            self.scheduler.forget(process)
+            self.schedule_reap(process)
+        # Set the state to BLOCKED
+        elif new_state == ProcessState.BLOCKED:
+            process.state = ProcessState.BLOCKED
+            process.manual_state = ProcessState.BLOCKED
+        # Set the state to READY and release after a delay
+        elif new_state == ProcessState.READY:
+            process.state = ProcessState.READY
+            process.manual_state = ProcessState.READY
+            if process.release is not None and process.release.active:
+                self.timers.reschedule(process.release, self.clock.now + self.clock.ticks(self.TRANSITION_DELAY))
+            else:
+                process.release = self.call_later(self.TRANSITION_DELAY, self.release_ready_state, process)
+
+        if new_state != ProcessState.READY:
+            self.cancel_timers(process)
+        self.cause = cause
         
             
+    def change_states(self, pids, new_state):
+        """
+        Manually change the state of many processes at once, as change_process_state does for one.
+        PIDs of processes that are no longer in the OS are skipped.
+
+        :return: Number of processes changed
+        """
+        changed = 0
+        for pid in pids:
+            if self.table.get(pid) is not None:
+                self.change_process_state(pid, new_state)
+                changed += 1
+        return changed
+
+
+    def detach_process(self, pid):
+        """
+        Take a process out of the OS without terminating it, e.g. to migrate it to another OS.
+        Its pending transitions are cancelled and its PID and store row are freed.
+
+        :return: Dict with the priority, execution_time, progress, arrival, affinity (list of cores
+                 or None), io_profile (BurstProfile or None) and next_io of the process, or None if
+                 there is no such process
+        """
+        process = self.table.get(pid)
+        if process is None:
+            return None
+        record = {
+            'priority': process.priority,
+            'execution_time': process.execution_time,
+            'progress': process.progress,
+            'arrival': process.arrival,
+            'affinity': self.cores.mask_cores_of(process),
+            'io_profile': None if process.io_profile is None else self.devices.profiles[process.io_profile],
+            'next_io': process.next_io,
+        }
+        self.dequeue(process)
+        self.cancel_timers(process)
+        self.scheduler.forget(process)
+        self.cores.release(process)
+        self.devices.forget(process)
+        self.table.remove(process)
+        self.pids.free(pid)
+        self.store.free(process.row)
+        return record
+
+
     def release_ready_state(self, process):
         """
         Release the process from the READY state after 
         """
+        process.release = None
         if process.state == ProcessState.READY and process.manual_state == ProcessState.READY:
             process.manual_state = None  # Continue regular process
-            print(f"Process {process.pid} released from READY state")
\ No newline at end of file
@@ -1,4 +1,5 @@
 from enum import Enum
+import numpy as np
 
 
 # DEFINE THE POSSIBLE STATES OF A PROCESS
@@ -9,12 +10,165 @@ class ProcessState(Enum):
     BLOCKED = "Blocked"         # The execution of the process is stopped
     TERMINATED = "Terminated"   # Process has completed
     ZOMBIE = "Zombie"           # State to represent zombie mode
-    BLOCKED_SUSPENDED = "Blocked Suspended"  # Process that has to wait to be executed 
-    READY_SUSPENDED = "Ready Suspended"      # Process that is getting ready to be executed 
+    BLOCKED_SUSPENDED = "Blocked Suspended"  # Process that has to wait to be executed
+    READY_SUSPENDED = "Ready Suspended"      # Process that is getting ready to be executed
 
 
+# NUMERIC CODES USED TO STORE STATES IN THE PROCESS STORE
+STATES = list(ProcessState)
+STATE_CODES = {state: code for code, state in enumerate(STATES)}
+NO_VALUE = -1  # Stored in place of None (no state, unset time, free row)
 
-# CLASS TO REPRESENT THE OS PROCESS
+
+
+# ARRAY-BACKED STORAGE FOR THE ATTRIBUTES OF MANY PROCESSES (ONE ROW PER PROCESS)
+class ProcessStore:
+    COLUMNS = {
+        'pid': np.int64,
+        'state': np.int8,
+        'priority': np.int8,
+        'progress': np.int64,
+        'execution_time': np.int64,
+        'manual_state': np.int8,
+        'pre_zombie_state': np.int8,
+        'ready_time': np.int64,             # Tick at which the process was first seen READY
+        'ready_suspended_time': np.int64,   # Tick at which the process was first seen READY_SUSPENDED
+        'order': np.int64,                  # Position in the process table
+        'token': np.int64,                  # Bumped on every state change to invalidate stale heap entries
+        'queued': np.int8,                  # 1 while the process waits READY in the ready queue of the scheduler
+        'dispatched_at': np.int64,          # Tick at which the process last started RUNNING
+        'arrival': np.int64,                # Tick at which the process was added to the OS
+        'core': np.int32,                   # Core the process runs on, or last ran on
+        'affinity': np.int32,               # Index of its affinity mask in the CoreSet of the OS (NO_VALUE: any core)
+        'io_profile': np.int32,             # Index of its burst profile in the DeviceSet of the OS (NO_VALUE: CPU bound)
+        'next_io': np.int64,                # Progress at which it issues its next I/O request
+    }
+
+
+    def __init__(self, capacity=1024):
+        """
+        Initialize an empty store.
+
+        :param capacity: Number of rows allocated up front (the store grows by doubling)
+        """
+        self.columns = {name: np.full(capacity, NO_VALUE, dtype) for name, dtype in self.COLUMNS.items()}
+        self.size = 0          # Number of rows in use or freed (rows past it were never handed out)
+        self.free_rows = []    # Rows released by removed processes, reused first
+        self.views = []        # Process view of each row, or None for free rows
+
+
+    def allocate(self):
+        """
+        Reserve a row for a new process.
+
+        :return: Index of the row
+        """
+        if self.free_rows:
+            return self.free_rows.pop()
+        if self.size == len(self.columns['pid']):
+            self._grow(2 * self.size)
+        self.size += 1
+        self.views.append(None)
+        return self.size - 1
+
+
+    def allocate_many(self, count):
+        """
+        Reserve rows for several new processes, growing the columns at most once.
+
+        :return: NumPy array of the row indexes
+        """
+        reused = [self.free_rows.pop() for _ in range(min(count, len(self.free_rows)))]
+        new = count - len(reused)
+        if self.size + new > len(self.columns['pid']):
+            self._grow(max(2 * len(self.columns['pid']), self.size + new))
+        rows = np.concatenate([np.array(reused, dtype=np.int64), np.arange(self.size, self.size + new, dtype=np.int64)])
+        self.size += new
+        self.views.extend([None] * new)
+        return rows
+
+
+    def free(self, row):
+        """
+        Release the row of a removed process so it can be reused.
+        """
+        for column in self.columns.values():
+            column[row] = NO_VALUE
+        self.views[row] = None
+        self.free_rows.append(row)
+
+
+    def column(self, name):
+        """
+        Return the used part of a column as a NumPy array view.
+        """
+        return self.columns[name][:self.size]
+
+
+    def mask(self, state):
+        """
+        Return a boolean array selecting the rows of processes in the given state.
+        """
+        return self.column('state') == STATE_CODES[state]
+
+
+    def _grow(self, capacity):
+        for name, column in self.columns.items():
+            grown = np.full(max(capacity, 1), NO_VALUE, column.dtype)
+            grown[:len(column)] = column
+            self.columns[name] = grown
+
+
+
+# DESCRIPTOR EXPOSING ONE COLUMN OF THE PROCESS STORE AS A PROCESS ATTRIBUTE
+class Column:
+    def __init__(self, encode=None, decode=None):
+        self.encode = encode
+        self.decode = decode
+
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+
+    def __get__(self, process, owner=None):
+        if process is None:
+            return self
+        value = int(process.store.columns[self.name][process.row])
+        return self.decode(value) if self.decode else value
+
+
+    def __set__(self, process, value):
+        process.store.columns[self.name][process.row] = self.encode(value) if self.encode else value
+
+
+
+def _encode_state(state):
+    return NO_VALUE if state is None else STATE_CODES[state]
+
+
+def _decode_state(code):
+    return None if code == NO_VALUE else STATES[code]
+
+
+def _encode_time(tick):
+    return NO_VALUE if tick is None else tick
+
+
+def _decode_time(tick):
+    return None if tick == NO_VALUE else tick
+
+
+def _encode_index(index):
+    return NO_VALUE if index is None else index
+
+
+def _decode_index(index):
+    return None if index == NO_VALUE else index
+
+
+
+# CLASS TO REPRESENT THE OS PROCESS (A THIN VIEW OVER ONE ROW OF A PROCESS STORE)
 class Process:
     # MAPPING PRIORITY LEVELS TO EXECUTION TIMES (LONGER EXECUTION TIMES FOR LOWER PRIORITIES)
     PRIORITY_EXECUTION_TIMES = {
@@ -24,19 +178,108 @@ class Process:
         'Low': 400,           # Low priority gets the longest execution time
     }
 
+    # NUMERIC VALUES USED TO COMPARE PRIORITIES (HIGHER VALUE MEANS HIGHER PRIORITY)
+    PRIORITY_VALUES = {
+        'High': 4,
+        'Medium High': 3,
+        'Medium Low': 2,
+        'Low': 1,
+    }
+
+    PRIORITIES = list(PRIORITY_EXECUTION_TIMES)
 
-    def __init__(self, pid, priority):
+    __slots__ = ('store', 'row', 'table', 'transition', 'release')
+
+    pid = Column()
+    priority = Column(encode=PRIORITIES.index, decode=PRIORITIES.__getitem__)
+    progress = Column()
+    execution_time = Column()
+    manual_state = Column(encode=_encode_state, decode=_decode_state)
+    pre_zombie_state = Column(encode=_encode_state, decode=_decode_state)
+    ready_time = Column(encode=_encode_time, decode=_decode_time)
+    ready_suspended_time = Column(encode=_encode_time, decode=_decode_time)
+    order = Column()
+    token = Column()
+    queued = Column(encode=int, decode=bool)
+    dispatched_at = Column(encode=_encode_time, decode=_decode_time)
+    arrival = Column(encode=_encode_time, decode=_decode_time)
+    core = Column(encode=_encode_index, decode=_decode_index)
+    affinity = Column(encode=_encode_index, decode=_decode_index)
+    io_profile = Column(encode=_encode_index, decode=_decode_index)
+    next_io = Column(encode=_encode_time, decode=_decode_time)
+
+
+    def __init__(self, pid, priority, store=None, execution_time=None):
         """
         Initialize a new process with a given priority.
-        
+
         :param pid: Process ID
         :param priority: Priority level ('High', 'Medium High', 'Medium Low', 'Low')
+        :param store: ProcessStore holding the attributes (a private one is created if omitted)
+        :param execution_time: Ticks of work needed to complete (defaults to the time of the priority level)
         """
+        self.store = store if store is not None else ProcessStore(capacity=1)
+        self.row = self.store.allocate()
+        self.store.views[self.row] = self
+        self.table = None  # Process table tracking this process, set when it is added to the OS
+        self.transition = None  # Pending scheduled state transition (TimerHandle)
+        self.release = None  # Pending release from a manual READY state (TimerHandle)
+
         self.pid = pid
-        self.state = ProcessState.NEW  # Start in the NEW state
+        self.token = 0
+        self.order = 0
+        self.store.columns['state'][self.row] = STATE_CODES[ProcessState.NEW]  # Start in the NEW state
         self.priority = priority  # Priority of the process
-        # Assign execution time based on the priority level
-        self.execution_time = Process.PRIORITY_EXECUTION_TIMES[priority]
+        # Assign execution time based on the priority level unless one is given
+        self.execution_time = execution_time or Process.PRIORITY_EXECUTION_TIMES[priority]
         self.progress = 0  # Progress starts at 0
         self.manual_state = None  # No manual state change initially
-        self.pre_zombie_state = None  # To track the state before entering Zombie mode
\ No newline at end of file
+        self.pre_zombie_state = None  # To track the state before entering Zombie mode
+        self.ready_time = None
+        self.ready_suspended_time = None
+        self.queued = False
+        self.dispatched_at = None
+        self.arrival = None
+        self.core = None
+        self.affinity = None
+        self.io_profile = None
+        self.next_io = None
+
+
+    @classmethod
+    def view(cls, store, row):
+        """
+        Create the view of a row whose columns were already filled in (see OS.add_processes).
+        """
+        process = cls.__new__(cls)
+        process.store = store
+        process.row = row
+        process.table = None
+        process.transition = None
+        process.release = None
+        store.views[row] = process
+        return process
+
+
+    @property
+    def priority_value(self):
+        """
+        Numeric value of the priority, higher means more important.
+        """
+        return Process.PRIORITY_VALUES[self.priority]
+
+
+    @property
+    def state(self):
+        """
+        Current state of the process.
+        """
+        return STATES[self.store.columns['state'][self.row]]
+
+
+    @state.setter
+    def state(self, state):
+        old_state = self.state
+        self.store.columns['state'][self.row] = STATE_CODES[state]
+        if self.table is not None and old_state != state:
+            self.table.update(self, old_state, state)  # Keep the per-state indexes in sync
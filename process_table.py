@@ -0,0 +1,225 @@
+import heapq
+import itertools
+import numpy as np
+from process import ProcessState
+
+
+PID_MAX_LIMIT = 4194304  # Largest pid_max accepted by Linux on 64-bit systems
+
+
+# BITMAP PID ALLOCATOR THAT HANDS OUT INCREASING PIDS AND WRAPS AROUND AT PID_MAX
+class PidAllocator:
+    CHUNK = 4096  # Bitmap entries searched at a time
+
+    def __init__(self, pid_max=PID_MAX_LIMIT):
+        """
+        :param pid_max: Largest PID handed out before wrapping around to 1
+        """
+        self.pid_max = pid_max
+        self.used = np.zeros(min(pid_max + 1, 1024), dtype=bool)  # Grows by doubling up to pid_max + 1
+        self.used[0] = True  # PID 0 is never handed out
+        self.last = 0        # Last PID handed out, the search for the next one starts after it
+        self.count = 0
+
+
+    def allocate(self):
+        """
+        Return the first free PID after the last one handed out, wrapping around at pid_max.
+        """
+        if self.count >= self.pid_max:
+            raise RuntimeError(f"No free PID (pid_max is {self.pid_max})")
+        pid = self._find(self.last + 1, self.pid_max + 1)
+        if pid is None:
+            pid = self._find(1, self.last + 1)
+        if pid >= len(self.used):
+            grown = np.zeros(min(max(2 * len(self.used), pid + 1), self.pid_max + 1), dtype=bool)
+            grown[:len(self.used)] = self.used
+            self.used = grown
+        self.used[pid] = True
+        self.last = pid
+        self.count += 1
+        return pid
+
+
+    def allocate_many(self, count):
+        """
+        Hand out several PIDs in one pass, the same ones that as many calls to allocate would return.
+
+        :return: NumPy array of the PIDs
+        """
+        if self.count + count > self.pid_max:
+            raise RuntimeError(f"No free PID (pid_max is {self.pid_max})")
+        pids = self._find_many(self.last + 1, self.pid_max + 1, count)
+        if len(pids) < count:
+            pids = np.concatenate([pids, self._find_many(1, self.last + 1, count - len(pids))])
+        if len(pids) == 0:
+            return pids
+        highest = int(pids.max())
+        if highest >= len(self.used):
+            grown = np.zeros(min(max(2 * len(self.used), highest + 1), self.pid_max + 1), dtype=bool)
+            grown[:len(self.used)] = self.used
+            self.used = grown
+        self.used[pids] = True
+        self.last = int(pids[-1])
+        self.count += count
+        return pids
+
+
+    def free(self, pid):
+        """
+        Release a PID so it can be handed out again after the next wraparound.
+        """
+        if self.used[pid]:
+            self.used[pid] = False
+            self.count -= 1
+
+
+    def _find(self, start, stop):
+        end = min(stop, len(self.used))
+        for chunk in range(start, end, self.CHUNK):
+            window = self.used[chunk:min(chunk + self.CHUNK, end)]
+            free = int(window.argmin())
+            if not window[free]:
+                return chunk + free
+        # PIDs past the end of the bitmap were never handed out, so they are free
+        unmapped = max(start, len(self.used))
+        return unmapped if unmapped < stop else None
+
+
+    def _find_many(self, start, stop, count):
+        found = []
+        end = min(stop, len(self.used))
+        position = start
+        while count and position < end:
+            window_end = min(position + max(self.CHUNK, count), end)
+            free = np.flatnonzero(~self.used[position:window_end])[:count] + position
+            found.append(free)
+            count -= len(free)
+            position = window_end
+        if count:
+            unmapped = max(start, len(self.used))
+            found.append(np.arange(unmapped, min(unmapped + count, stop)))
+        return np.concatenate(found).astype(np.int64) if found else np.empty(0, dtype=np.int64)
+
+
+
+# INDEX OF PROCESSES BY PID AND BY STATE, KEPT UP TO DATE ON EVERY STATE CHANGE
+class ProcessTable:
+    def __init__(self):
+        """
+        Initialize an empty table with one set per process state and the heaps
+        used to find preemption victims and suspended processes in O(log n).
+        """
+        self.by_pid = {}                 # Process of each PID, in insertion order
+        self.by_state = {state: set() for state in ProcessState}
+        self._order = itertools.count()  # Insertion order, used to break ties like a list scan would
+        self._running_heap = []          # (priority value, order, token, process) of RUNNING processes
+        self._suspended_heap = []        # (order, token, process) of BLOCKED_SUSPENDED processes
+        self.listeners = []              # Called as listener(process, old_state, new_state) on every state change
+
+
+    def __len__(self):
+        return len(self.by_pid)
+
+
+    def get(self, pid):
+        """
+        Return the process with the given PID, or None.
+        """
+        return self.by_pid.get(pid)
+
+
+    def add(self, process):
+        """
+        Register a process and attach the table to it so its state changes are tracked.
+        """
+        if process.pid in self.by_pid:
+            raise ValueError(f"PID {process.pid} is already in use")
+        self.by_pid[process.pid] = process
+        process.order = next(self._order)
+        process.table = self
+        self.by_state[process.state].add(process)
+        self._push(process, process.state)
+
+
+    def add_many(self, store, rows):
+        """
+        Register the NEW processes of several store rows in one pass.
+
+        :param store: ProcessStore holding the processes
+        :param rows: Rows of the processes, in the order they are added
+        """
+        if len(rows) == 0:
+            return
+        pids = store.columns['pid'][rows].tolist()
+        if len(set(pids)) != len(pids) or not self.by_pid.keys().isdisjoint(pids):
+            raise ValueError("PID already in use")
+        processes = [store.views[row] for row in rows]
+        start = next(self._order)
+        store.columns['order'][rows] = np.arange(start, start + len(rows))
+        self._order = itertools.count(start + len(rows))
+        for process in processes:
+            process.table = self
+        self.by_pid.update(zip(pids, processes))
+        self.by_state[ProcessState.NEW].update(processes)
+
+
+    def remove(self, process):
+        """
+        Unregister a process. Stale heap entries are discarded lazily.
+        """
+        del self.by_pid[process.pid]
+        self.by_state[process.state].discard(process)
+        process.table = None
+        process.token += 1
+
+
+    def update(self, process, old_state, new_state):
+        """
+        Move a process between state sets. Called by Process whenever its state changes.
+        """
+        self.by_state[old_state].discard(process)
+        self.by_state[new_state].add(process)
+        process.token += 1  # Invalidates the heap entry pushed for the previous state
+        self._push(process, new_state)
+        for listener in self.listeners:
+            listener(process, old_state, new_state)
+
+
+    def count(self, state):
+        """
+        Return the number of processes currently in the given state.
+        """
+        return len(self.by_state[state])
+
+
+    def lowest_priority_running(self):
+        """
+        Return the RUNNING process with the lowest priority (the first one added on ties), or None.
+        """
+        return self._peek(self._running_heap, ProcessState.RUNNING)
+
+
+    def first_suspended(self):
+        """
+        Return the first added process in BLOCKED_SUSPENDED state, or None.
+        """
+        return self._peek(self._suspended_heap, ProcessState.BLOCKED_SUSPENDED)
+
+
+    def _push(self, process, state):
+        if state == ProcessState.RUNNING:
+            entry = (process.priority_value, process.order, process.token, process)
+            heapq.heappush(self._running_heap, entry)
+        elif state == ProcessState.BLOCKED_SUSPENDED:
+            heapq.heappush(self._suspended_heap, (process.order, process.token, process))
+
+
+    def _peek(self, heap, state):
+        # Drop entries whose process has changed state since they were pushed
+        while heap:
+            process = heap[0][-1]
+            if process.table is self and process.state == state and process.token == heap[0][-2]:
+                return process
+            heapq.heappop(heap)
+        return None
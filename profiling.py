@@ -0,0 +1,269 @@
+import collections
+import os
+import sys
+import threading
+import time
+
+
+# PHASES OF THE SIMULATOR TIMED BY A PROFILER, AS (PHASE, OS METHOD)
+OS_PHASES = (
+    ('commands', 'process_commands'),
+    ('reap', 'reap'),
+    ('timers', 'fire_timers'),
+    ('io', 'complete_io'),
+    ('update', 'update_processes'),
+    ('update_process_state', 'update_process_state'),
+    ('schedule', 'run_scheduler'),
+    ('zombify', 'zombify_processes'),
+    ('publish', 'publish'),
+    ('skip', 'skip_ticks'),
+)
+STEP_PHASE = 'step'  # Whole tick, also used for the overrun detection
+
+_MISSING = object()
+
+
+# ACCUMULATED TIMINGS OF ONE PHASE
+class PhaseStats:
+    __slots__ = ('calls', 'total', 'max')
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+
+
+    def add(self, seconds):
+        self.calls += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+
+
+# SWITCHABLE INSTRUMENTATION OF THE SIMULATOR HOT PATH
+class Profiler:
+    """
+    Times the phases of every tick by wrapping the matching methods of the OS (and of any other
+    object, such as the GUI) while it is enabled. Disabling removes the wrappers, so a simulator
+    that is not being profiled runs exactly the same code as one that never was.
+
+    A tick that takes longer than the tick period of the clock counts as an overrun. An optional
+    sampling profiler records the call stack of the simulator thread at a fixed interval.
+    """
+
+    def __init__(self, os_, history=100):
+        """
+        :param os_: OS to profile
+        :param history: Number of recent overruns kept, as (tick, seconds)
+        """
+        self.os = os_
+        self.phases = {}            # PhaseStats of each phase, by name
+        self.wrapped = []           # (object, attribute, original instance attribute or _MISSING)
+        self.overruns = 0
+        self.recent_overruns = collections.deque(maxlen=history)
+        self.sampler = None
+        self.enabled = False
+
+
+    def enable(self, sample_interval=None, thread=None):
+        """
+        Start timing the phases of the OS.
+
+        :param sample_interval: Seconds between two stack samples, or None to not sample
+        :param thread: Thread to sample (by default the simulator thread if it runs, else the calling thread)
+        """
+        if self.enabled:
+            return
+        self.enabled = True
+        for phase, name in OS_PHASES:
+            self.instrument(self.os, name, phase)
+        self._instrument_step()
+        if sample_interval:
+            if thread is None:
+                thread = self.os.thread if self.os.thread is not None and self.os.thread.is_alive() else threading.current_thread()
+            self.sampler = StackSampler(thread.ident, sample_interval)
+            self.sampler.start()
+
+
+    def disable(self):
+        """
+        Remove every wrapper and stop the sampler. The collected timings are kept.
+        """
+        for obj, name, original in reversed(self.wrapped):
+            if original is _MISSING:
+                delattr(obj, name)
+            else:
+                setattr(obj, name, original)
+        self.wrapped = []
+        if self.sampler is not None:
+            self.sampler.stop()
+        self.enabled = False
+
+
+    def reset(self):
+        """
+        Forget the collected timings, overruns and samples.
+        """
+        for stats in self.phases.values():
+            stats.calls, stats.total, stats.max = 0, 0.0, 0.0
+        self.overruns = 0
+        self.recent_overruns.clear()
+        if self.sampler is not None:
+            self.sampler.reset()
+
+
+    def instrument(self, obj, name, phase):
+        """
+        Time every call of a method of an object as a phase, until disable is called.
+        Used by the OS phases and by the GUI for its own refresh methods.
+        """
+        original = obj.__dict__.get(name, _MISSING)
+        method = getattr(obj, name)
+        stats = self.phases.setdefault(phase, PhaseStats())
+        clock = time.perf_counter
+
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                stats.add(clock() - start)
+
+        setattr(obj, name, timed)
+        self.wrapped.append((obj, name, original))
+
+
+    def _instrument_step(self):
+        os_ = self.os
+        original = os_.__dict__.get('step', _MISSING)
+        step = os_.step
+        stats = self.phases.setdefault(STEP_PHASE, PhaseStats())
+        clock = time.perf_counter
+
+        def timed_step():
+            tick = os_.clock.now
+            start = clock()
+            try:
+                step()
+            finally:
+                elapsed = clock() - start
+                stats.add(elapsed)
+                if elapsed > os_.clock.tick_seconds:
+                    self.overruns += 1
+                    self.recent_overruns.append((tick, elapsed))
+
+        os_.step = timed_step
+        self.wrapped.append((os_, 'step', original))
+
+
+    def report(self):
+        """
+        Return the cost of every phase as a dict of plain numbers (JSON serializable).
+        Nested phases (update_process_state and schedule run inside update) are included in their parent.
+        """
+        ticks = self.phases.get(STEP_PHASE)
+        tick_total = ticks.total if ticks is not None and ticks.total else None
+        phases = {}
+        for phase, stats in self.phases.items():
+            phases[phase] = {
+                'calls': stats.calls,
+                'total_seconds': round(stats.total, 6),
+                'mean_us': round(stats.total / stats.calls * 1e6, 2) if stats.calls else None,
+                'max_us': round(stats.max * 1e6, 2),
+                'share': round(stats.total / tick_total, 4) if tick_total and phase != STEP_PHASE else None,
+            }
+        return {
+            'ticks': ticks.calls if ticks is not None else 0,
+            'tick_seconds': self.os.clock.tick_seconds,
+            'overruns': self.overruns,
+            'recent_overruns': [{'tick': tick, 'seconds': round(seconds, 6)} for tick, seconds in self.recent_overruns],
+            'phases': phases,
+            'hot_functions': self.sampler.top() if self.sampler is not None else [],
+        }
+
+
+    def format_report(self):
+        """
+        Return the report as a text table (see format_report).
+        """
+        return format_report(self.report())
+
+
+
+def format_report(report):
+    """
+    Format a Profiler report as a text table, most expensive phase first.
+    """
+    lines = [f"{report['ticks']} ticks, {report['overruns']} over the {report['tick_seconds'] * 1000:g} ms period",
+             f"{'phase':<24}{'calls':>10}{'total s':>10}{'mean us':>10}{'max us':>10}{'share':>7}"]
+    for phase, stats in sorted(report['phases'].items(), key=lambda item: -item[1]['total_seconds']):
+        mean = '-' if stats['mean_us'] is None else f"{stats['mean_us']:.1f}"
+        share = '' if stats['share'] is None else f"{stats['share']:.0%}"
+        lines.append(f"{phase:<24}{stats['calls']:>10}{stats['total_seconds']:>10.3f}{mean:>10}{stats['max_us']:>10.0f}{share:>7}")
+    if report['hot_functions']:
+        lines.append("hottest functions (share of samples):")
+        for function, share in report['hot_functions']:
+            lines.append(f"  {share:6.1%}  {function}")
+    return "\n".join(lines)
+
+
+
+# SAMPLING PROFILER OF ONE THREAD
+class StackSampler:
+    """
+    A daemon thread that reads the current stack of the profiled thread at a fixed interval
+    and counts, for every function, the samples in which it was running (self) or on the stack.
+    """
+
+    def __init__(self, thread_id, interval=0.005):
+        """
+        :param thread_id: Identifier (Thread.ident) of the thread to sample
+        :param interval: Seconds between two samples
+        """
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = 0
+        self.self_counts = collections.Counter()
+        self.stacks = collections.Counter()  # Collapsed stacks ("outer;...;inner"), for flame graphs
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+
+    def start(self):
+        self._thread.start()
+
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+    def reset(self):
+        self.samples = 0
+        self.self_counts.clear()
+        self.stacks.clear()
+
+
+    def top(self, count=10):
+        """
+        Return the functions that were running in the most samples, as (function, share) pairs.
+        """
+        if not self.samples:
+            return []
+        return [(function, hits / self.samples) for function, hits in self.self_counts.most_common(count)]
+
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            functions = []
+            while frame is not None:
+                code = frame.f_code
+                functions.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            self.samples += 1
+            self.self_counts[functions[0]] += 1
+            self.stacks[";".join(reversed(functions))] += 1
@@ -0,0 +1,642 @@
+import heapq
+import itertools
+import random
+from collections import deque
+from process import Process, ProcessState
+
+
+# BASE CLASS OF THE SCHEDULING POLICIES
+class Scheduler:
+    """
+    A scheduling policy decides what happens to a process once it has waited its transition
+    delay in READY state, and which waiting process gets a core when one is free.
+
+    Policies act through their host (the OS) with host.dispatch (run a process), host.enqueue
+    (keep it READY in the policy's ready queue), host.requeue (move a RUNNING process back to
+    the ready queue) and host.suspend (move it to BLOCKED_SUSPENDED). Queue entries are
+    validated lazily: an entry is stale once its process changed state or left the queue.
+    """
+    name = None
+
+    def __init__(self):
+        self._order = itertools.count()  # Breaks ties between equal keys in FIFO order
+
+
+    def __getstate__(self):
+        # Saved with the processes of the queues replaced by their PIDs (see checkpoint.py)
+        state = self.__dict__.copy()
+        state['_order'] = next(self._order)
+        self._order = itertools.count(state['_order'])
+        return state
+
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._order = itertools.count(state['_order'])
+
+
+    def admit(self, host, process):
+        """
+        Called when a READY process has waited its transition delay.
+        """
+        raise NotImplementedError
+
+
+    def schedule(self, host):
+        """
+        Called at the end of every tick: preempt the processes whose time slice expired and
+        give the free cores to waiting processes.
+        """
+        self.fill_cores(host)
+
+
+    def next_decision(self, host):
+        """
+        Return the tick at which schedule() will next change a process state on its own, or None.
+        """
+        return None
+
+
+    def forget(self, process):
+        """
+        Called when a process terminates, to drop the per-process data kept by the policy.
+        """
+
+
+    def block(self, host, process):
+        """
+        Called when a RUNNING process is about to block on an I/O request.
+        """
+
+
+    def fill_cores(self, host):
+        """
+        Dispatch waiting processes while there are free cores.
+        """
+        while host.free_cores() > 0:
+            process = self.pop_waiting()
+            if process is None:
+                return
+            host.dispatch(process)
+
+
+    def pop_waiting(self):
+        """
+        Remove and return the next process of the ready queue, or None if it is empty.
+        """
+        return None
+
+
+    @staticmethod
+    def running_in_order(host):
+        """
+        Return the RUNNING processes, longest running first (ties in table order).
+        """
+        return sorted(host.running_processes(), key=lambda process: (process.dispatched_at, process.order))
+
+
+    def _entry(self, process):
+        return (next(self._order), process.token, process)
+
+
+    @staticmethod
+    def _valid(entry):
+        process = entry[-1]
+        return process.table is not None and process.queued and process.token == entry[-2]
+
+
+
+# PRIORITY PREEMPTION WITH SUSPENSION (THE ORIGINAL BEHAVIOR OF THE EMULATOR)
+class PriorityScheduler(Scheduler):
+    """
+    Run the process if a core is free, otherwise preempt the lowest priority RUNNING process
+    if it has a lower priority, otherwise suspend the process. The lowest priority RUNNING
+    process comes from the priority heap of the process table (O(log n)).
+    """
+    name = "Priority"
+
+    def admit(self, host, process):
+        if host.free_cores() > 0:
+            host.dispatch(process)
+            return
+
+        # Preempt a lower priority process if necessary
+        lowest_priority_process = host.table.lowest_priority_running()
+        if process.priority_value > lowest_priority_process.priority_value:
+            host.suspend(lowest_priority_process)
+            host.dispatch(process)
+        else:
+            host.suspend(process)
+
+
+
+# ROUND ROBIN WITH A FIXED TIME QUANTUM
+class RoundRobinScheduler(Scheduler):
+    """
+    Waiting processes form a FIFO queue (deque). A RUNNING process that used up its quantum
+    goes back to the end of the queue if another process is waiting. O(1) per decision.
+    """
+    name = "Round Robin"
+
+    def __init__(self, quantum=20):
+        """
+        :param quantum: Length of a time slice in ticks
+        """
+        super().__init__()
+        self.quantum = quantum
+        self.queue = deque()
+
+
+    def admit(self, host, process):
+        host.enqueue(process)
+        self.queue.append(self._entry(process))
+        self.fill_cores(host)
+
+
+    def schedule(self, host):
+        now = host.clock.now
+        for process in self.running_in_order(host):
+            if now - process.dispatched_at >= self.quantum_of(process) and self.has_waiting():
+                self.expire(host, process)
+                host.requeue(process)
+                self.push(process)
+        self.fill_cores(host)
+
+
+    def next_decision(self, host):
+        if not self.has_waiting():
+            return None
+        return min((process.dispatched_at + self.quantum_of(process) for process in host.running_processes()), default=None)
+
+
+    def quantum_of(self, process):
+        return self.quantum
+
+
+    def expire(self, host, process):
+        """
+        Called when a RUNNING process used up its time slice and is about to be preempted.
+        """
+
+
+    def push(self, process):
+        self.queue.append(self._entry(process))
+
+
+    def has_waiting(self):
+        while self.queue and not self._valid(self.queue[0]):
+            self.queue.popleft()
+        return bool(self.queue)
+
+
+    def pop_waiting(self):
+        return self.queue.popleft()[-1] if self.has_waiting() else None
+
+
+
+# MULTILEVEL FEEDBACK QUEUE
+class MLFQScheduler(RoundRobinScheduler):
+    """
+    One FIFO queue (deque) per level; level 0 is served first. A process that uses up its time
+    slice moves one level down, and the quantum doubles at each level. O(levels) per decision.
+    """
+    name = "MLFQ"
+
+    def __init__(self, quantum=10, levels=3):
+        """
+        :param quantum: Time slice of the top level in ticks
+        :param levels: Number of levels
+        """
+        super().__init__(quantum)
+        self.queues = [deque() for _ in range(levels)]
+        self.levels = {}  # Level of each process, keyed by PID
+
+
+    def admit(self, host, process):
+        host.enqueue(process)
+        self.push(process)
+        self.fill_cores(host)
+
+
+    def quantum_of(self, process):
+        return self.quantum * 2 ** self.levels.get(process.pid, 0)
+
+
+    def expire(self, host, process):
+        self.levels[process.pid] = min(self.levels.get(process.pid, 0) + 1, len(self.queues) - 1)
+
+
+    def push(self, process):
+        self.queues[self.levels.get(process.pid, 0)].append(self._entry(process))
+
+
+    def forget(self, process):
+        self.levels.pop(process.pid, None)
+
+
+    def has_waiting(self):
+        for queue in self.queues:
+            while queue and not self._valid(queue[0]):
+                queue.popleft()
+            if queue:
+                return True
+        return False
+
+
+    def pop_waiting(self):
+        if not self.has_waiting():
+            return None
+        return next(queue for queue in self.queues if queue).popleft()[-1]
+
+
+
+# SHORTEST REMAINING TIME FIRST
+class SRTScheduler(Scheduler):
+    """
+    Waiting processes sit in a min-heap keyed on their remaining time (execution_time - progress).
+    A new process preempts the RUNNING process with the most remaining time if it needs less.
+    RUNNING processes sit in a max-heap keyed on their completion tick, which stays constant
+    while they run. O(log n) per decision.
+    """
+    name = "SRT"
+
+    def __init__(self):
+        super().__init__()
+        self.waiting = []  # (remaining, order, token, process)
+        self.running = []  # (-completion tick, order, token, process)
+
+
+    def admit(self, host, process):
+        if host.free_cores() == 0:
+            victim = self.longest_running(host)
+            if victim is not None and self.remaining(victim) > self.remaining(process):
+                host.requeue(victim)
+                self.push(victim)
+                self.start(host, process)
+                return
+        host.enqueue(process)
+        self.push(process)
+        self.fill_cores(host)
+
+
+    def fill_cores(self, host):
+        while host.free_cores() > 0:
+            process = self.pop_waiting()
+            if process is None:
+                return
+            self.start(host, process)
+
+
+    def start(self, host, process):
+        host.dispatch(process)
+        completion = host.clock.now + self.remaining(process)
+        heapq.heappush(self.running, (-completion, next(self._order), process.token, process))
+
+
+    def push(self, process):
+        heapq.heappush(self.waiting, (self.remaining(process),) + self._entry(process))
+
+
+    def pop_waiting(self):
+        while self.waiting:
+            entry = heapq.heappop(self.waiting)
+            if self._valid(entry):
+                return entry[-1]
+        return None
+
+
+    def longest_running(self, host):
+        while self.running:
+            process = self.running[0][-1]
+            if process.table is not None and process.state == ProcessState.RUNNING and process.token == self.running[0][-2]:
+                return process
+            heapq.heappop(self.running)
+        return None
+
+
+    @staticmethod
+    def remaining(process):
+        return process.execution_time - process.progress
+
+
+
+# COMPLETELY FAIR SCHEDULER (CFS-STYLE, WEIGHTED BY PRIORITY)
+class FairScheduler(Scheduler):
+    """
+    Every process accumulates virtual runtime (ticks run divided by its priority weight).
+    Waiting processes sit in a min-heap keyed on virtual runtime; a RUNNING process is
+    preempted once its virtual runtime exceeds the smallest waiting one by the granularity.
+    O(log n) per decision.
+    """
+    name = "Fair (CFS)"
+
+    def __init__(self, granularity=10):
+        """
+        :param granularity: Virtual runtime lead (in ticks of a weight-1 process) before preemption
+        """
+        super().__init__()
+        self.granularity = granularity
+        self.waiting = []       # (vruntime, order, token, process)
+        self.vruntime = {}      # Virtual runtime of each process when it last stopped, keyed by PID
+        self.min_vruntime = 0.0  # Virtual runtime of the last dispatched process, given to newcomers
+
+
+    def admit(self, host, process):
+        self.vruntime[process.pid] = max(self.vruntime.get(process.pid, 0.0), self.min_vruntime)
+        host.enqueue(process)
+        self.push(process)
+        self.fill_cores(host)
+
+
+    def schedule(self, host):
+        now = host.clock.now
+        for process in self.running_in_order(host):
+            lowest = self.lowest_waiting()
+            if lowest is not None and self.current(process, now) > lowest + self.granularity:
+                self.vruntime[process.pid] = self.current(process, now)
+                host.requeue(process)
+                self.push(process)
+        self.fill_cores(host)
+
+
+    def next_decision(self, host):
+        lowest = self.lowest_waiting()
+        if lowest is None:
+            return None
+        ticks = []
+        for process in host.running_processes():
+            # Rounded down so that float error can only make the answer early, never late
+            lead = lowest + self.granularity - self.vruntime.get(process.pid, 0.0)
+            ticks.append(process.dispatched_at + max(int(lead * self.weight(process)), 0))
+        return min(ticks, default=None)
+
+
+    def fill_cores(self, host):
+        while host.free_cores() > 0:
+            process = self.pop_waiting()
+            if process is None:
+                return
+            self.min_vruntime = max(self.min_vruntime, self.vruntime.get(process.pid, 0.0))
+            host.dispatch(process)
+
+
+    def push(self, process):
+        heapq.heappush(self.waiting, (self.vruntime.get(process.pid, 0.0),) + self._entry(process))
+
+
+    def lowest_waiting(self):
+        while self.waiting and not self._valid(self.waiting[0]):
+            heapq.heappop(self.waiting)
+        return self.waiting[0][0] if self.waiting else None
+
+
+    def pop_waiting(self):
+        if self.lowest_waiting() is None:
+            return None
+        return heapq.heappop(self.waiting)[-1]
+
+
+    def forget(self, process):
+        self.vruntime.pop(process.pid, None)
+
+
+    def block(self, host, process):
+        # Charge the ticks run before blocking; the process comes back through admit
+        self.vruntime[process.pid] = self.current(process, host.clock.now)
+
+
+    def current(self, process, now):
+        return self.vruntime.get(process.pid, 0.0) + (now - process.dispatched_at) / self.weight(process)
+
+
+    @staticmethod
+    def weight(process):
+        return Process.PRIORITY_VALUES[process.priority]
+
+
+
+# PER-CORE RUN QUEUES WITH AFFINITY AND WORK STEALING
+class PerCoreScheduler(Scheduler):
+    """
+    Every core has its own FIFO run queue (deque), served round robin with a fixed quantum.
+    A process is queued on the least loaded of its last core and two random cores of its
+    affinity mask (power of two choices), so it tends to stay where its cache is warm. A free
+    core whose queue is empty steals from the tail of the longer queue of two random cores,
+    and scans the non-empty queues only if that fails. Decisions look at a few cores whatever
+    their number; affinity masks are never violated. A process pinned only to cores that do
+    not exist is parked until one of them is added (or its mask changes).
+    """
+    name = "Per-Core"
+
+    def __init__(self, quantum=20, seed=0):
+        """
+        :param quantum: Length of a time slice in ticks
+        :param seed: Seed of the random core choices
+        """
+        super().__init__()
+        self.quantum = quantum
+        self.random = random.Random(seed)
+        self.salt = random.Random(seed).getrandbits(64)  # Mixed into the choice of steal victims
+        self.queues = []       # Run queue of each core: (order, token, process)
+        self.nonempty = set()  # Cores whose run queue has entries (some may be stale)
+        self.parked = []       # Entries of the processes none of whose allowed cores exists
+
+
+    def admit(self, host, process):
+        host.enqueue(process)
+        self.place_or_park(host, process)
+        self.fill_cores(host)
+
+
+    def schedule(self, host):
+        now = host.clock.now
+        cores = host.cores
+        if self.parked:
+            self.unpark(host)
+        for core in sorted(self.nonempty):  # Only a core with a waiting process preempts
+            process = cores.running[core] if core < cores.num_cores else None
+            if process is not None and now - process.dispatched_at >= self.quantum and self.has_waiting(host, core):
+                host.requeue(process)
+                self.push(host, core, process)
+                process = self.pop_local(host, core)
+                if process is not None:
+                    host.dispatch(process, core)
+        self.fill_cores(host)
+
+
+    def next_decision(self, host):
+        cores = host.cores
+        return min((cores.running[core].dispatched_at + self.quantum for core in list(self.nonempty)
+                    if core < cores.num_cores and cores.running[core] is not None and self.has_waiting(host, core)),
+                   default=None)
+
+
+    def fill_cores(self, host):
+        if not self.nonempty:
+            return
+        for core in host.cores.free_cores():
+            if host.free_cores() <= 0:
+                return
+            process = (self.pop_local(host, core) if self.has_waiting(host, core) else None) or self.steal(host, core)
+            if process is not None:
+                host.dispatch(process, core)
+
+
+    def place(self, host, process):
+        """
+        Return the core whose run queue receives a process, which must have an allowed core.
+        """
+        cores = host.cores
+        allowed = cores.allowed_cores(process)
+        candidates = [allowed[self.random.randrange(len(allowed))] for _ in range(2)]
+        if process.core is not None and process.core < cores.num_cores and cores.allows(process, process.core):
+            candidates.insert(0, process.core)  # Wins ties: its cache may still be warm
+        return min(candidates, key=lambda core: self.load(host, core))
+
+
+    def load(self, host, core):
+        """
+        Return the number of processes running on or queued for a core (stale entries behind
+        the head of its run queue included).
+        """
+        return len(self.prune(host, core)) + (host.cores.running[core] is not None)
+
+
+    def reserve(self, host):
+        """
+        Make sure every core, including those added since the last decision, has a run queue.
+        """
+        while len(self.queues) < len(host.cores.running):
+            self.queues.append(deque())
+
+
+    def place_or_park(self, host, process):
+        """
+        Queue a process on one of its allowed cores, or park it if none of them exists.
+        """
+        if host.cores.allowed_cores(process):
+            self.push(host, self.place(host, process), process)
+        else:
+            self.parked.append(self._entry(process))
+
+
+    def unpark(self, host):
+        """
+        Queue the parked processes that have an allowed core again, e.g. after cores were added.
+        """
+        parked, self.parked = self.parked, []
+        for entry in parked:
+            if not self._valid(entry):
+                continue
+            if host.cores.allowed_cores(entry[-1]):
+                self.push(host, self.place(host, entry[-1]), entry[-1])
+            else:
+                self.parked.append(entry)
+
+
+    def push(self, host, core, process):
+        self.reserve(host)
+        self.queues[core].append(self._entry(process))
+        self.nonempty.add(core)
+
+
+    def has_waiting(self, host, core):
+        """
+        Return whether the run queue of a core has a valid entry.
+        """
+        return bool(self.prune(host, core))
+
+
+    def prune(self, host, core):
+        """
+        Drop the stale entries at the head of the run queue of a core and return the queue.
+        A stale entry never becomes valid again, so what is left does not depend on when the
+        queue was last pruned, and a fast-forwarded run sees the same loads as a run stepped
+        tick by tick.
+        """
+        if core >= len(self.queues):
+            self.reserve(host)
+        queue = self.queues[core]
+        while queue and not self._valid(queue[0]):
+            queue.popleft()
+        if not queue:
+            self.nonempty.discard(core)
+        return queue
+
+
+    def pop_local(self, host, core):
+        """
+        Remove and return the next process of the run queue of a core, or None. Processes
+        whose affinity no longer allows the core are moved to an allowed one, or parked.
+        """
+        self.reserve(host)
+        queue = self.queues[core]
+        while queue:
+            entry = queue.popleft()
+            self.discard_empty(core)
+            if not self._valid(entry):
+                continue
+            process = entry[-1]
+            if host.cores.allows(process, core):
+                return process
+            self.place_or_park(host, process)  # Never back onto this core, which the process may not use
+        return None
+
+
+    def steal(self, host, thief):
+        """
+        Take a process that may run on a free core from the run queue of another core, or return None.
+        The tail of the longer queue of two pseudo-random cores is tried first, and the other queues
+        are only scanned if that fails (e.g. for processes whose affinity excludes the thief). The two
+        cores are mixed from the seed, the tick and the thief instead of being drawn from the random
+        stream, and a failed attempt changes nothing, so the ticks a fast-forwarded run skips make no
+        difference.
+        """
+        cores = len(self.queues)
+        mix = (self.salt + host.clock.now * 0x9E3779B97F4A7C15 + thief * 0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF
+        mix = (mix ^ mix >> 31) * 0x94D049BB133111EB & 0xFFFFFFFFFFFFFFFF
+        mix ^= mix >> 29
+        victims = sorted((mix % cores, mix // cores % cores), key=lambda core: -len(self.prune(host, core)))
+        for victim in victims:
+            queue = self.queues[victim]
+            if victim != thief and queue and self._valid(queue[-1]) and host.cores.allows(queue[-1][-1], thief):
+                process = queue.pop()[-1]
+                break
+        else:
+            # Last resort: the first waiting process allowed on the thief, in any queue
+            found = self.find_stealable(host, thief)
+            if found is None:
+                return None
+            victim, index = found
+            queue = self.queues[victim]
+            process = queue[index][-1]
+            del queue[index]
+        self.discard_empty(victim)
+        host.cores.steals += 1
+        return process
+
+
+    def find_stealable(self, host, thief):
+        """
+        Return (core, index in its run queue) of the first waiting process allowed on the thief, or None.
+        """
+        for victim in sorted(self.nonempty):
+            if victim == thief:
+                continue
+            for index, entry in enumerate(self.queues[victim]):
+                if self._valid(entry) and host.cores.allows(entry[-1], thief):
+                    return victim, index
+        return None
+
+
+    def discard_empty(self, core):
+        if not self.queues[core]:
+            self.nonempty.discard(core)
+
+
+
+# POLICIES SELECTABLE BY NAME (E.G. FROM THE GUI)
+SCHEDULERS = {
+    scheduler.name: scheduler
+    for scheduler in (PriorityScheduler, RoundRobinScheduler, MLFQScheduler, SRTScheduler, FairScheduler, PerCoreScheduler)
+}
@@ -0,0 +1,94 @@
+import numpy as np
+from process import NO_VALUE, STATE_CODES, STATES, Process, ProcessState
+
+
+TERMINATED = STATE_CODES[ProcessState.TERMINATED]
+RUNNING = STATE_CODES[ProcessState.RUNNING]
+
+
+# IMMUTABLE COPY OF THE PROCESS TABLE PUBLISHED BY THE SIMULATOR ONCE PER TICK
+class Snapshot:
+    COLUMNS = ('pid', 'state', 'priority', 'progress', 'execution_time', 'core')
+
+    def __init__(self, tick, killed, num_cores, columns, metrics=None):
+        """
+        Initialize a snapshot. Use Snapshot.take to build one from a running OS.
+
+        :param tick: Tick at which the snapshot was taken
+        :param killed: Whether the OS was in zombie mode
+        :param num_cores: Number of CPU cores at that tick
+        :param columns: Read-only arrays, one per name in COLUMNS, indexed by store row
+        :param metrics: Summary of the metrics collector of the OS, or None if it has none
+        """
+        self.tick = tick
+        self.killed = killed
+        self.num_cores = num_cores
+        self.pid = columns['pid']
+        self.state = columns['state']
+        self.priority = columns['priority']
+        self.progress = columns['progress']
+        self.execution_time = columns['execution_time']
+        self.core = columns['core']  # Core each process runs on or last ran on (NO_VALUE if none)
+        self.metrics = metrics
+
+
+    @classmethod
+    def take(cls, os_):
+        """
+        Copy the current state of an OS. Only the simulator thread should call this.
+        """
+        columns = {}
+        for name in cls.COLUMNS:
+            column = np.array(os_.store.column(name))
+            column.setflags(write=False)
+            columns[name] = column
+        metrics = os_.metrics.summary() if os_.metrics is not None else None
+        return cls(os_.clock.now, os_.killed, os_.num_cores, columns, metrics)
+
+
+    def __len__(self):
+        return len(self.pid)
+
+
+    def holds(self, row, pid):
+        """
+        Return whether the given row still holds the process with the given PID.
+        """
+        return row < len(self.pid) and self.pid[row] == pid
+
+
+    def process_state(self, row):
+        """
+        Return the ProcessState of the process in a row.
+        """
+        return STATES[self.state[row]]
+
+
+    def process_priority(self, row):
+        """
+        Return the priority name of the process in a row.
+        """
+        return Process.PRIORITIES[self.priority[row]]
+
+
+    def changes_since(self, previous):
+        """
+        Compare with an older snapshot.
+
+        :param previous: Older snapshot, or None to treat every process as new
+        :return: (added, terminated) arrays of rows: processes that appeared since the older snapshot,
+                 sorted by PID, and processes that became TERMINATED since then
+        """
+        size = len(self)
+        common = 0 if previous is None else min(size, len(previous))
+        new = np.ones(size, dtype=bool)
+        was_terminated = np.zeros(size, dtype=bool)
+        if common:
+            new[:common] = self.pid[:common] != previous.pid[:common]
+            was_terminated[:common] = previous.state[:common] == TERMINATED
+
+        live = self.pid != NO_VALUE
+        added = np.flatnonzero(new & live)
+        added = added[np.argsort(self.pid[added], kind='stable')]
+        terminated = np.flatnonzero(live & (self.state == TERMINATED) & (new | ~was_terminated))
+        return added, terminated
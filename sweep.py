@@ -0,0 +1,141 @@
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from batch import run_batch
+from benchmark import PRIORITY_MIXES, generate_workload
+from scheduler import SCHEDULERS
+
+
+SWEEP_KEYS = ('processes', 'cores', 'mix', 'scheduler', 'interventions', 'replicate', 'seed', 'max_ticks')
+SUMMARY_FIELDS = SWEEP_KEYS + ('completed', 'terminated', 'unfinished', 'transitions', 'ticks',
+                               'mean_turnaround', 'p50_turnaround', 'p95_turnaround', 'max_turnaround',
+                               'throughput', 'meets_target')
+
+
+# COLLECTS THE TURNAROUND OF EVERY COMPLETED PROCESS OF ONE RUN
+class TurnaroundCollector:
+    def __init__(self):
+        self.turnarounds = []
+
+
+    def write(self, result):
+        if result['outcome'] == 'completed':
+            self.turnarounds.append(result['turnaround'])
+
+
+
+# RUN ONE CONFIGURATION OF A SWEEP (EXECUTED IN A WORKER PROCESS)
+def run_config(config, target=None):
+    """
+    Simulate one configuration and summarize it.
+
+    :param config: Dict with the keys of SWEEP_KEYS
+    :param target: 95th percentile turnaround (in ticks) that the configuration should stay under, or None
+    :return: Dict with the keys of SUMMARY_FIELDS
+    """
+    workload = generate_workload(config['processes'], config['mix'], config['interventions'], config['seed'])
+    collector = TurnaroundCollector()
+    summary = run_batch(workload, collector, config['cores'], until=config['max_ticks'],
+                        scheduler=SCHEDULERS[config['scheduler']]())
+
+    turnarounds = np.array(collector.turnarounds, dtype=np.int64)
+    row = dict(config)
+    row.update({name: summary[name] for name in ('completed', 'terminated', 'unfinished', 'transitions', 'ticks')})
+    if len(turnarounds):
+        row.update({
+            'mean_turnaround': round(float(turnarounds.mean()), 2),
+            'p50_turnaround': round(float(np.percentile(turnarounds, 50)), 2),
+            'p95_turnaround': round(float(np.percentile(turnarounds, 95)), 2),
+            'max_turnaround': int(turnarounds.max()),
+        })
+    else:
+        row.update(dict.fromkeys(('mean_turnaround', 'p50_turnaround', 'p95_turnaround', 'max_turnaround')))
+    row['throughput'] = round(summary['completed'] / summary['ticks'], 6) if summary['ticks'] else 0.0
+    if target is None:
+        row['meets_target'] = None
+    else:
+        row['meets_target'] = row['p95_turnaround'] is not None and row['unfinished'] == 0 and row['p95_turnaround'] <= target
+    return row
+
+
+def build_configs(processes, cores, mixes, schedulers, interventions, replicates, seed, max_ticks):
+    """
+    Expand the sweep parameters into the list of configurations. Replicate r of every
+    configuration uses the workload seed seed + r, so all configurations are compared on
+    the same workloads and a sweep gives the same results on every run.
+    """
+    configs = []
+    for count, core_count, mix, scheduler, rate, replicate in itertools.product(
+            processes, cores, mixes, schedulers, interventions, range(replicates)):
+        configs.append({
+            'processes': count,
+            'cores': core_count,
+            'mix': mix,
+            'scheduler': scheduler,
+            'interventions': rate,
+            'replicate': replicate,
+            'seed': seed + replicate,
+            'max_ticks': max_ticks,
+        })
+    return configs
+
+
+# RUN A WHOLE SWEEP IN PARALLEL
+def run_sweep(configs, target=None, jobs=None):
+    """
+    Run independent configurations on a pool of worker processes, one simulation per task.
+
+    :param configs: Configurations, as returned by build_configs
+    :param target: 95th percentile turnaround target in ticks, or None
+    :param jobs: Number of worker processes (defaults to the number of CPUs)
+    :return: Generator of summary rows, in the order of the configurations
+    """
+    if jobs == 1:
+        for config in configs:
+            yield run_config(config, target)
+        return
+
+    jobs = jobs or os.cpu_count() or 1
+    chunksize = max(1, len(configs) // (jobs * 4))
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        yield from executor.map(run_config, configs, itertools.repeat(target), chunksize=chunksize)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a parameter sweep of the OS emulator on all CPU cores.")
+    parser.add_argument('--processes', type=int, nargs='+', default=[1000], help="Process counts (default: 1000)")
+    parser.add_argument('--cores', type=int, nargs='+', default=[1, 2, 4, 8], help="Simulated core counts (default: 1 2 4 8)")
+    parser.add_argument('--mix', choices=sorted(PRIORITY_MIXES), nargs='+', default=['uniform'], help="Priority mixes (default: uniform)")
+    parser.add_argument('--scheduler', choices=list(SCHEDULERS), nargs='+', default=['Priority'], help="Scheduling policies (default: Priority)")
+    parser.add_argument('--interventions', type=float, nargs='+', default=[0.0], help="Manual intervention rates (default: 0)")
+    parser.add_argument('--replicates', type=int, default=1, help="Runs per configuration, each on its own workload seed (default: 1)")
+    parser.add_argument('--seed', type=int, default=1, help="Seed of the first replicate (default: 1)")
+    parser.add_argument('--max-ticks', type=int, default=20000, help="Simulated ticks per run (default: 20000)")
+    parser.add_argument('--target', type=float, help="95th percentile turnaround target in ticks")
+    parser.add_argument('-j', '--jobs', type=int, help="Worker processes (default: number of CPUs)")
+    parser.add_argument('-o', '--output', default='sweep.csv', help="Summary table (.csv or .json, default: sweep.csv)")
+    args = parser.parse_args(argv)
+
+    configs = build_configs(args.processes, args.cores, args.mix, args.scheduler, args.interventions,
+                            args.replicates, args.seed, args.max_ticks)
+    rows = []
+    for number, row in enumerate(run_sweep(configs, args.target, args.jobs), start=1):
+        rows.append(row)
+        print(f"[{number}/{len(configs)}] {json.dumps(row)}", file=sys.stderr)
+
+    with open(args.output, 'w', newline='') as file:
+        if args.output.endswith('.json'):
+            json.dump(rows, file, indent=2)
+        else:
+            writer = csv.DictWriter(file, SUMMARY_FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+import heapq
+from collections import deque, namedtuple
+
+
+DETAIL_TICKS = 600      # Most recent ticks kept at full resolution, one segment per run of a process
+BUCKET_TICKS = 50       # Width of one coarse cell of the older history
+HISTORY_TICKS = 36000   # Ticks of history kept at all
+
+
+# ONE UNINTERRUPTED RUN OF A PROCESS ON A LANE (CORE) OF THE TIMELINE
+class Segment:
+    __slots__ = ('lane', 'pid', 'start', 'end', 'item')
+
+    def __init__(self, lane, pid, start):
+        self.lane = lane
+        self.pid = pid
+        self.start = start  # First tick of the run
+        self.end = None     # Tick at which the run ended, or None while it goes on
+        self.item = None    # Drawing of the segment, owned by the view
+
+
+
+# OLDER HISTORY OF ONE LANE OVER BUCKET_TICKS TICKS, MERGED FROM THE SEGMENTS THAT COVERED IT
+class Cell:
+    __slots__ = ('lane', 'bucket', 'ticks', 'item')
+
+    def __init__(self, lane, bucket):
+        self.lane = lane
+        self.bucket = bucket  # Index of the cell on its lane; it covers [bucket, bucket + 1) * bucket_ticks
+        self.ticks = {}       # Ticks each process ran in the cell, by PID
+        self.item = None      # Drawing of the cell, owned by the view
+
+
+    def busy(self):
+        """
+        Return the number of ticks during which the lane was running a process.
+        """
+        return sum(self.ticks.values())
+
+
+    def dominant(self):
+        """
+        Return the PID of the process that ran the longest in the cell.
+        """
+        return max(self.ticks, key=self.ticks.get)
+
+
+
+# CHANGES OF ONE TIMELINE UPDATE, FOR THE VIEW TO APPLY TO ITS DRAWING
+TimelineChanges = namedtuple('TimelineChanges', ('opened', 'closed', 'aged', 'cells', 'expired'))
+
+
+
+# PER-CORE HISTORY OF THE RUNNING PROCESSES, WITH BOUNDED SIZE
+class Timeline:
+    """
+    Keeps which process ran on which lane (core) and when, built from the RUNNING processes
+    of successive snapshots. Every update only reports what changed: segments that opened or
+    closed, closed segments that grew older than detail_ticks and were merged into coarse
+    cells, and cells that fell out of the history. So a view that applies the changes never
+    redraws the history, and the number of drawn items is bounded by the length of the
+    history instead of the number of processes or ticks.
+    """
+
+    def __init__(self, detail_ticks=DETAIL_TICKS, bucket_ticks=BUCKET_TICKS, history_ticks=HISTORY_TICKS):
+        """
+        :param detail_ticks: Ticks of recent history kept as individual segments
+        :param bucket_ticks: Width in ticks of the cells of the older history
+        :param history_ticks: Ticks of history kept in total
+        """
+        self.detail_ticks = detail_ticks
+        self.bucket_ticks = bucket_ticks
+        self.history_ticks = history_ticks
+        self.now = 0
+        self.lanes = []          # Open segment of each lane, or None if the lane is idle
+        self.lane_of = {}        # Lane of each running process
+        self.closed = deque()    # Closed segments at full resolution, in the order they closed
+        self.cells = {}          # Cells of the older history by bucket, then by lane
+        self.buckets = []        # Heap of the buckets that have cells, oldest first
+        self.kept_from = 0       # First tick still kept in the cells
+
+
+    def update(self, tick, running_pids, num_lanes, cores=None):
+        """
+        Move the timeline to a tick.
+
+        :param tick: Current tick
+        :param running_pids: PIDs of the processes RUNNING at that tick
+        :param num_lanes: Number of lanes (cores); the timeline never loses lanes it had
+        :param cores: Core of each running process (negative if unknown), or None to put
+                      each process that starts running on the first idle lane
+        :return: TimelineChanges
+        """
+        changes = TimelineChanges([], [], [], {}, [])
+        self.now = tick
+        running = dict(zip(running_pids, cores if cores is not None else [-1] * len(running_pids)))
+
+        # Close the runs of the processes that stopped running or moved to another core
+        for lane, segment in enumerate(self.lanes):
+            if segment is None:
+                continue
+            core = running.get(segment.pid)
+            if core is None or core not in (lane, -1):
+                segment.end = tick
+                self.lanes[lane] = None
+                del self.lane_of[segment.pid]
+                self.closed.append(segment)
+                changes.closed.append(segment)
+
+        # Open a run for every process that started running, on its core or the first idle lane
+        while len(self.lanes) < max(num_lanes, max(running.values(), default=-1) + 1):
+            self.lanes.append(None)
+        for pid, core in running.items():
+            if pid in self.lane_of:
+                continue
+            lane = core if core >= 0 and self.lanes[core] is None else self._idle_lane()
+            segment = Segment(lane, pid, tick)
+            self.lanes[lane] = segment
+            self.lane_of[pid] = lane
+            changes.opened.append(segment)
+
+        # Merge the segments that left the detailed history into cells
+        cutoff = tick - self.detail_ticks
+        while self.closed and self.closed[0].end <= cutoff:
+            segment = self.closed.popleft()
+            changes.aged.append(segment)
+            self._merge(segment, changes.cells)
+
+        # Forget the cells that left the history
+        horizon = tick - self.history_ticks
+        while self.buckets and (self.buckets[0] + 1) * self.bucket_ticks <= horizon:
+            bucket = heapq.heappop(self.buckets)
+            for cell in self.cells.pop(bucket).values():
+                changes.cells.pop((cell.lane, bucket), None)
+                changes.expired.append(cell)
+        self.kept_from = max(self.kept_from, horizon)
+        return changes
+
+
+    def _idle_lane(self):
+        for lane, segment in enumerate(self.lanes):
+            if segment is None:
+                return lane
+        self.lanes.append(None)  # More processes running than lanes, e.g. right after a core change
+        return len(self.lanes) - 1
+
+
+    def _merge(self, segment, changed):
+        # Add the ticks of a segment to the cells it covers
+        start = max(segment.start, self.kept_from)
+        if segment.end <= start:
+            return  # Ran only before the kept history
+        size = self.bucket_ticks
+        for bucket in range(start // size, (segment.end - 1) // size + 1):
+            cells = self.cells.get(bucket)
+            if cells is None:
+                cells = self.cells[bucket] = {}
+                heapq.heappush(self.buckets, bucket)
+            cell = cells.get(segment.lane)
+            if cell is None:
+                cell = cells[segment.lane] = Cell(segment.lane, bucket)
+            ticks = min(segment.end, (bucket + 1) * size) - max(start, bucket * size)
+            cell.ticks[segment.pid] = cell.ticks.get(segment.pid, 0) + ticks
+            changed[(segment.lane, bucket)] = cell
+
+
+    def open_segments(self):
+        """
+        Return the segments still running; their drawing ends at the current tick.
+        """
+        return [segment for segment in self.lanes if segment is not None]
+
+
+    def __len__(self):
+        """
+        Return the number of segments and cells held, i.e. of items a view draws.
+        """
+        return len(self.lane_of) + len(self.closed) + sum(len(cells) for cells in self.cells.values())
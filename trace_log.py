@@ -0,0 +1,272 @@
+import argparse
+import json
+import struct
+import sys
+import numpy as np
+from os_simulator import CAUSES
+from process import NO_VALUE, STATE_CODES, Process, ProcessState
+from snapshot import Snapshot
+
+
+MAGIC = b'OSEMUTR2'
+HEADER = struct.Struct('<8sdqq')          # Magic, tick length in seconds, keyframe interval, number of cores
+RECORD = struct.Struct('<qqbbbbii')       # Tick, PID, old state, new state, cause, priority, progress, execution time
+RECORD_DTYPE = np.dtype([
+    ('tick', '<i8'), ('pid', '<i8'), ('old', 'i1'), ('new', 'i1'), ('cause', 'i1'),
+    ('priority', 'i1'), ('progress', '<i4'), ('execution_time', '<i4'),
+])
+KEYFRAME = struct.Struct('<qqq')          # Tick, number of records before the keyframe, number of processes
+TRACE_CAUSES = CAUSES + ('add',)          # 'add' marks the first record of each process
+CAUSE_CODES = {cause: code for code, cause in enumerate(TRACE_CAUSES)}
+
+NEW = STATE_CODES[ProcessState.NEW]
+RUNNING = STATE_CODES[ProcessState.RUNNING]
+TERMINATED = STATE_CODES[ProcessState.TERMINATED]
+ZOMBIE = STATE_CODES[ProcessState.ZOMBIE]
+RESUME = CAUSE_CODES['resume']
+
+
+# RECORDER APPENDING EVERY STATE TRANSITION OF AN OS TO A BINARY TRACE
+class TraceWriter:
+    """
+    The trace file is a header followed by fixed-width records, one per transition, in the
+    order they happen. Every keyframe_interval ticks, the last record of every process that
+    has not terminated is appended to the index file (path + '.idx'), so a reader can rebuild
+    the state at any tick from the nearest keyframe instead of from the start of the trace.
+    """
+
+    def __init__(self, os_, path, keyframe_interval=600):
+        """
+        Start recording the transitions of an OS.
+
+        :param os_: OS to record
+        :param path: Path of the trace file (overwritten)
+        :param keyframe_interval: Ticks between two keyframes
+        """
+        self.os = os_
+        self.keyframe_interval = keyframe_interval
+        self.file = open(path, 'wb')
+        self.index = open(path + '.idx', 'wb')
+        self.file.write(HEADER.pack(MAGIC, os_.clock.tick_seconds, keyframe_interval, os_.num_cores))
+        self.records = 0
+        self.latest = {}  # Last record of every process that has not terminated, keyed by PID
+        self.next_keyframe = os_.clock.now
+        os_.add_listener(self.on_transition)
+
+
+    def on_transition(self, process, old_state, new_state):
+        now = self.os.clock.now
+        if now >= self.next_keyframe:
+            self.write_keyframe(now)
+        if process.pid not in self.latest and old_state == ProcessState.NEW:
+            self.write(now, process, None, ProcessState.NEW, 'add')
+        self.write(now, process, old_state, new_state, self.os.cause)
+
+
+    def write(self, tick, process, old_state, new_state, cause):
+        record = RECORD.pack(tick, process.pid, NO_VALUE if old_state is None else STATE_CODES[old_state],
+                             STATE_CODES[new_state], CAUSE_CODES[cause], Process.PRIORITIES.index(process.priority),
+                             process.progress, process.execution_time)
+        self.file.write(record)
+        self.records += 1
+        if new_state == ProcessState.TERMINATED:
+            self.latest.pop(process.pid, None)
+        else:
+            self.latest[process.pid] = record
+
+
+    def write_keyframe(self, tick):
+        tick -= (tick - self.next_keyframe) % self.keyframe_interval
+        self.index.write(KEYFRAME.pack(tick, self.records, len(self.latest)))
+        self.index.write(b''.join(self.latest[pid] for pid in sorted(self.latest)))
+        self.next_keyframe = tick + self.keyframe_interval
+
+
+    def flush(self):
+        self.file.flush()
+        self.index.flush()
+
+
+    def close(self):
+        self.file.close()
+        self.index.close()
+        if self.on_transition in self.os.table.listeners:
+            self.os.table.listeners.remove(self.on_transition)
+
+
+
+# MEMORY-MAPPED READER AND REPLAY ENGINE FOR A TRACE
+class Trace:
+    def __init__(self, path):
+        """
+        Open a trace written by TraceWriter. Records are memory-mapped, not loaded.
+        """
+        with open(path, 'rb') as file:
+            magic, self.tick_seconds, self.keyframe_interval, self.num_cores = HEADER.unpack(file.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a trace file")
+        self.records = np.memmap(path, RECORD_DTYPE, mode='r', offset=HEADER.size)
+        if len(self.records) * RECORD_DTYPE.itemsize + HEADER.size != self._file_size(path):
+            # A trace cut short while recording ends with a partial record
+            self.records = self.records[:(self._file_size(path) - HEADER.size) // RECORD_DTYPE.itemsize]
+
+        # Keyframes: (tick, number of records before it, array of the last record of each live process)
+        self.keyframes = []
+        index = np.memmap(path + '.idx', np.uint8, mode='r') if self._file_size(path + '.idx') else np.zeros(0, np.uint8)
+        offset = 0
+        while offset + KEYFRAME.size <= len(index):
+            tick, records, count = KEYFRAME.unpack_from(index, offset)
+            offset += KEYFRAME.size
+            self.keyframes.append((tick, records, np.frombuffer(index, RECORD_DTYPE, count, offset)))
+            offset += count * RECORD_DTYPE.itemsize
+        self.keyframe_ticks = np.array([tick for tick, _, _ in self.keyframes], dtype=np.int64)
+
+
+    @staticmethod
+    def _file_size(path):
+        with open(path, 'rb') as file:
+            return file.seek(0, 2)
+
+
+    def __len__(self):
+        return len(self.records)
+
+
+    @property
+    def last_tick(self):
+        return int(self.records['tick'][-1]) if len(self.records) else 0
+
+
+    def state_at(self, tick, linger=30):
+        """
+        Rebuild the processes as they were at the end of a tick, from the nearest keyframe.
+
+        :param tick: Tick to rebuild
+        :param linger: Terminated processes stay listed for this many ticks after terminating
+        :return: Records (RECORD_DTYPE array, sorted by PID) of the last transition of each process,
+                 with the progress of RUNNING processes brought up to the tick
+        """
+        # Start from the last keyframe that precedes every termination still listed at the tick
+        start, base = 0, np.zeros(0, RECORD_DTYPE)
+        position = int(np.searchsorted(self.keyframe_ticks, tick - linger, side='right')) - 1
+        if position >= 0:
+            _, start, base = self.keyframes[position]
+        end = int(np.searchsorted(self.records['tick'], tick, side='right'))
+
+        # Keep the last record of every process
+        records = np.concatenate([base, self.records[start:max(start, end)]])
+        reversed_pids = records['pid'][::-1]
+        _, last = np.unique(reversed_pids, return_index=True)
+        state = records[len(records) - 1 - last]
+        state = state[(state['new'] != TERMINATED) | (state['tick'] > tick - linger)]
+
+        # RUNNING processes gained one tick of progress per tick since their last transition
+        # (and one more on the tick they were restored from zombie mode, before the progress update)
+        running = state['new'] == RUNNING
+        gained = tick - state['tick'][running] + (state['cause'][running] == RESUME)
+        state['progress'][running] = np.minimum(state['progress'][running] + gained, state['execution_time'][running])
+        return state
+
+
+    def snapshot_at(self, tick, linger=30):
+        """
+        Rebuild a Snapshot of the simulation at a tick (rows are positions in PID order).
+        """
+        state = self.state_at(tick, linger)
+        columns = {
+            'pid': state['pid'].astype(np.int64),
+            'state': state['new'].astype(np.int8),
+            'priority': state['priority'].astype(np.int8),
+            'progress': state['progress'].astype(np.int64),
+            'execution_time': state['execution_time'].astype(np.int64),
+            'core': np.full(len(state), NO_VALUE, dtype=np.int32),  # Not recorded in traces
+        }
+        for column in columns.values():
+            column.setflags(write=False)
+        return Snapshot(tick, bool(np.any(state['new'] == ZOMBIE)), self.num_cores, columns)
+
+
+    def transitions(self, start_tick=0, end_tick=None):
+        """
+        Return the records of the transitions made between two ticks (inclusive).
+        """
+        ticks = self.records['tick']
+        start = int(np.searchsorted(ticks, start_tick, side='left'))
+        end = len(ticks) if end_tick is None else int(np.searchsorted(ticks, end_tick, side='right'))
+        return self.records[start:end]
+
+
+
+def describe(record):
+    """
+    Convert a trace record to a dict with state, cause and priority names.
+    """
+    return {
+        'tick': int(record['tick']),
+        'pid': int(record['pid']),
+        'from': None if record['old'] == NO_VALUE else list(ProcessState)[record['old']].value,
+        'to': list(ProcessState)[record['new']].value,
+        'cause': TRACE_CAUSES[record['cause']],
+        'priority': Process.PRIORITIES[record['priority']],
+        'progress': int(record['progress']),
+        'execution_time': int(record['execution_time']),
+    }
+
+
+# COMPARE TWO TRACES RECORD BY RECORD
+def diff_traces(first, second, limit=None):
+    """
+    Find the records that differ between two traces.
+
+    :param first: Trace
+    :param second: Trace
+    :param limit: Maximum number of differences to return, or None for all of them
+    :return: List of (index, first record or None, second record or None)
+    """
+    common = min(len(first), len(second))
+    different = np.flatnonzero(first.records[:common] != second.records[:common])
+    indices = np.concatenate([different, np.arange(common, max(len(first), len(second)))])
+    if limit is not None:
+        indices = indices[:limit]
+    return [(int(index),
+             first.records[index] if index < len(first) else None,
+             second.records[index] if index < len(second) else None) for index in indices]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect, replay and compare OS emulator traces.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    show = commands.add_parser('show', help="Print the processes at a tick")
+    show.add_argument('trace')
+    show.add_argument('--tick', type=int, help="Tick to rebuild (default: last recorded tick)")
+    log = commands.add_parser('log', help="Print the transitions between two ticks")
+    log.add_argument('trace')
+    log.add_argument('--start', type=int, default=0)
+    log.add_argument('--end', type=int)
+    diff = commands.add_parser('diff', help="Compare two traces record by record")
+    diff.add_argument('first')
+    diff.add_argument('second')
+    diff.add_argument('--limit', type=int, default=20, help="Differences to print (default: 20)")
+    args = parser.parse_args(argv)
+
+    if args.command == 'show':
+        trace = Trace(args.trace)
+        tick = trace.last_tick if args.tick is None else args.tick
+        for record in trace.state_at(tick):
+            print(json.dumps(describe(record)))
+    elif args.command == 'log':
+        for record in Trace(args.trace).transitions(args.start, args.end):
+            print(json.dumps(describe(record)))
+    else:
+        first, second = Trace(args.first), Trace(args.second)
+        differences = diff_traces(first, second, args.limit)
+        for index, a, b in differences:
+            print(json.dumps({'record': index,
+                              'first': None if a is None else describe(a),
+                              'second': None if b is None else describe(b)}))
+        if differences:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()